@@ -12,9 +12,9 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(CategoryAnalytics)
 class CategoryAnalyticsAdmin(admin.ModelAdmin):
-    list_display=('category_name','views','impressions','clicks','click_through_rate','avg_time_on_page')
+    list_display=('category_name','views','impressions','clicks','click_through_rate','avg_time_on_page','time_on_page_samples')
     search_fields=('category__name',)
-    readonly_fields=('category','views','impressions','clicks','click_through_rate','avg_time_on_page')
+    readonly_fields=('category','views','impressions','clicks','click_through_rate','avg_time_on_page','time_on_page_samples')
     
     def category_name(self,obj):
         return obj.category.name
@@ -24,12 +24,17 @@ class CategoryAnalyticsAdmin(admin.ModelAdmin):
 
 
 class HeadingInline(admin.TabularInline):
+    # Los headings se extraen del contenido al guardar el post: solo se muestran
     model=Heading
-    extra=1
+    extra=0
+    can_delete=False
     fields=('title','level','order','slug')
-    prepopulated_fields={"slug":("title",)}
+    readonly_fields=fields
     ordering=('order',)
 
+    def has_add_permission(self, request, obj=None):
+        return False
+
 # class MediaInline(admin.TabularInline):
 #     model=Post.media
 #     fields=('media',)
@@ -84,9 +89,9 @@ class PostAdmin(admin.ModelAdmin):
 
 @admin.register(PostAnalytics)
 class PostAnalyticsAdmin(admin.ModelAdmin):
-    list_display=('post_title','views','impressions','clicks','click_through_rate','avg_time_on_page')
+    list_display=('post_title','views','impressions','clicks','click_through_rate','avg_time_on_page','time_on_page_samples')
     search_fields=('post__title',)
-    readonly_fields=('views','impressions','clicks','click_through_rate','avg_time_on_page')
+    readonly_fields=('views','impressions','clicks','click_through_rate','avg_time_on_page','time_on_page_samples')
     
     def post_title(self,obj):
         return obj.post.title
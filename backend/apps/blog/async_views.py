@@ -0,0 +1,212 @@
+"""
+Variantes async de las vistas de lectura del blog para servir con ASGI.
+
+Usan el mismo caché y las mismas claves que las vistas sync, asi que las
+respuestas cacheadas se sirven sin ocupar un thread por request: el caché y
+los contadores se leen con el cliente de redis.asyncio compartido de
+core.redis_client. Las consultas usan el ORM async, tambien para construir
+los listados paginados que no estan en caché.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from core.instrumentation import timed
+from core.redis_client import get_async_redis
+from core.renderers import FastJSONRenderer
+from .buffers import arecord_impressions, arecord_post_view, CATEGORY_IMPRESSIONS_KEY, POST_IMPRESSIONS_KEY
+from .caching import (
+    acache_get,
+    acache_set,
+    apost_detail_key,
+    apost_headings_key,
+    aread_through,
+    astore,
+    aversioned_key,
+    CATEGORY_LIST_NAMESPACE,
+    CATEGORY_POSTS_NAMESPACE,
+    POST_LIST_NAMESPACE,
+)
+from .fast_serializers import category_list_serializer, category_tree_serializer, heading_serializer, post_list_serializer
+from .models import Category, Heading, Post
+from .serializers import PostSerializer
+from .tasks import adispatch_flush, post_detail_queryset, refresh_post_detail_cache_task
+from .utils import get_client_ip
+from .pagination import PostCursorPagination, PostPagination
+from .views import CategoryListView, category_list_params, category_list_queryset, post_list_params, post_list_queryset
+
+
+def render_json(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def not_found(detail):
+    # Mismo cuerpo que NotFound de DRF en las vistas sync
+    return render_json({"detail": detail}, status=404)
+
+
+class AsyncPostListView(View):
+
+    async def get(self, request):
+        try:
+            params = post_list_params(request.GET)
+        except ValueError:
+            return render_json({"detail": "Invalid page number"}, status=400)
+
+        cache_key = await aversioned_key(POST_LIST_NAMESPACE, *params["cache_parts"])
+        cached_data = await acache_get(cache_key)
+        if cached_data:
+            return render_json(cached_data)
+
+        # Mismo listado que PostListView, con el ORM async y la misma entrada de caché
+        try:
+            drf_request = Request(request)
+            posts = post_list_queryset(params)
+            if params["pagination"] == "cursor":
+                paginator = PostCursorPagination()
+                paginated_posts = await paginator.apaginate_queryset(posts, drf_request, ordering=params["sort"])
+                first_page = paginator.is_first_page
+            else:
+                paginator = PostPagination()
+                paginated_posts = await paginator.apaginate_queryset(posts.order_by(*params["ordering"]), drf_request)
+                first_page = params["page"] == 1
+
+            if paginated_posts is None:
+                raise NotFound(detail="Pagination error")
+            if not paginated_posts and first_page:
+                raise NotFound(detail="No posts found")
+
+            data = paginator.get_paginated_response(post_list_serializer.serialize(paginated_posts)).data
+            await acache_set(cache_key, data, settings.BLOG_CACHE_TIMEOUT)
+            return render_json(data)
+        except NotFound as nf:
+            return not_found(str(nf.detail))
+        except Exception as e:
+            return render_json({"detail": f"Internal server error: {str(e)}"}, status=500)
+
+
+async def abuild_post_detail(slug):
+    post = await post_detail_queryset().aget(slug=slug)
+    with timed("serialize"):
+        data = PostSerializer(post).data
+    await astore(await apost_headings_key(slug), data["headings"])
+    return data
+
+
+async def abuild_post_headings(slug):
+    rows = heading_serializer.values(Heading.objects.filter(post__slug=slug))
+    return heading_serializer.serialize([row async for row in rows])
+
+
+class AsyncPostDetailView(View):
+
+    async def get(self, request):
+        slug = request.GET.get("slug")
+        try:
+            serializer_post = await aread_through(
+                await apost_detail_key(slug),
+                lambda: abuild_post_detail(slug),
+                refresh=lambda: sync_to_async(refresh_post_detail_cache_task.delay)(slug),
+            )
+            await adispatch_flush(await arecord_post_view(get_async_redis(), serializer_post["id"], get_client_ip(request)))
+        except Post.DoesNotExist:
+            return not_found("the requested post does not exist")
+        except Exception as e:
+            # Mismo cuerpo que el APIException de PostDetailView
+            return render_json({"detail": f"An unexpected error ocurred: {str(e)}"}, status=500)
+
+        return render_json(serializer_post)
+
+
+class AsyncPostHeadingsView(View):
+
+    async def get(self, request):
+        slug = request.GET.get("slug")
+        return render_json(await aread_through(await apost_headings_key(slug), lambda: abuild_post_headings(slug)))
+
+
+class AsyncCategoryListView(View):
+
+    async def get(self, request):
+        page, page_size, ordering, sorting, search, parent_slug = params = category_list_params(request.GET)
+        cache_key = await aversioned_key(CATEGORY_LIST_NAMESPACE, *params)
+        cached_response = await acache_get(cache_key)
+        if cached_response:
+            body, category_ids = cached_response
+            await adispatch_flush(await arecord_impressions(get_async_redis(), CATEGORY_IMPRESSIONS_KEY, category_ids), len(category_ids))
+            return HttpResponse(body, content_type="application/json")
+
+        # Mismo listado que CategoryListView, con el ORM async y la misma entrada de caché
+        try:
+            categories = [row async for row in category_list_queryset(ordering, sorting, search, parent_slug)]
+            if not categories:
+                return not_found("No categories found.")
+            serialized_categories = await category_list_serializer.aserialize(categories)
+            category_ids = [str(category.id) for category in categories]
+
+            # La paginacion de StandardAPIView trabaja sobre la lista, sin consultas
+            response = CategoryListView().paginate(Request(request), serialized_categories)
+            if response.status_code != 200:
+                return render_json(response.data, status=response.status_code)
+
+            body = FastJSONRenderer().render(response.data)
+            await acache_set(cache_key, (body, category_ids), settings.BLOG_CACHE_TIMEOUT)
+            await adispatch_flush(await arecord_impressions(get_async_redis(), CATEGORY_IMPRESSIONS_KEY, category_ids), len(category_ids))
+            return HttpResponse(body, content_type="application/json")
+        except Exception as e:
+            return render_json({"detail": f"An unexpected error occurred: {str(e)}"}, status=500)
+
+
+class AsyncCategoryTreeView(View):
+
+    async def get(self, request):
+        slug = request.GET.get("slug", None)
+
+        async def build():
+            rows = category_tree_serializer.values(Category.objects.subtree(slug))
+            return category_tree_serializer.serialize([row async for row in rows])
+
+        tree = await aread_through(await aversioned_key(CATEGORY_LIST_NAMESPACE, "tree", slug), build)
+        if not tree:
+            return not_found("No categories found.")
+        return render_json({"success": True, "status": 200, "results": tree})
+
+
+class AsyncCategoryDetailView(View):
+
+    async def get(self, request):
+        slug = request.GET.get("slug", None)
+        page = request.GET.get("p", "1")
+        descendants = request.GET.get("descendants") == "true"
+        if not slug:
+            return render_json({"success": False, "status": 400, "error": "Missing slug parameter"}, status=400)
+
+        cache_key = await aversioned_key(CATEGORY_POSTS_NAMESPACE.format(slug), page, descendants)
+        cached_response = await acache_get(cache_key)
+        if cached_response:
+            body, post_ids = cached_response
+            await adispatch_flush(await arecord_impressions(get_async_redis(), POST_IMPRESSIONS_KEY, post_ids), len(post_ids))
+            return HttpResponse(body, content_type="application/json")
+
+        try:
+            category = await Category.objects.only("id", "name", "path").aget(slug=slug)
+        except Category.DoesNotExist:
+            return not_found("No Category matches the given query.")
+
+        if descendants:
+            posts = Post.postobjects.for_list().filter(category__path__startswith=category.path)
+        else:
+            posts = Post.postobjects.for_list().filter(category=category)
+        posts = [row async for row in post_list_serializer.values(posts)]
+        if not posts:
+            return not_found(f"No posts found for category '{category.name}'")
+
+        body = FastJSONRenderer().render(post_list_serializer.serialize(posts))
+        post_ids = [str(post.id) for post in posts]
+        await acache_set(cache_key, (body, post_ids), settings.BLOG_CACHE_TIMEOUT)
+        await adispatch_flush(await arecord_impressions(get_async_redis(), POST_IMPRESSIONS_KEY, post_ids), len(post_ids))
+        return HttpResponse(body, content_type="application/json")
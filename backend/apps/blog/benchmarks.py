@@ -0,0 +1,152 @@
+"""
+Benchmark de latencia de los endpoints calientes del blog: p50/p95/p99 y
+consultas por request, con el caché frio (namespaces invalidados antes de
+cada request) y caliente. Los requests van de a uno por un solo Client en
+el mismo proceso, asi que no mide throughput bajo carga: sequential_rps es
+1 / latencia media. Para carga concurrente contra un servidor real esta
+benchmark_async_views --base-url. Los resultados son un dict serializable a
+JSON para comparar corridas con compare().
+"""
+
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .caching import (
+    bump_namespaces,
+    CATEGORY_LIST_NAMESPACE,
+    CATEGORY_POSTS_NAMESPACE,
+    POST_LIST_NAMESPACE,
+    POST_NAMESPACE,
+)
+
+
+CACHE_COLD = "cold"
+CACHE_WARM = "warm"
+# Los endpoints de escritura no leen del caché
+CACHE_NONE = "none"
+
+
+def endpoints(post_slug, category_slug, include_writes=False):
+    """
+    (nombre, metodo, url, datos, modos de caché) de cada endpoint medido. Los
+    de escritura suman clicks reales en la base y en los rollups de redis,
+    por eso solo se incluyen si se piden explicitamente
+    """
+    read = (CACHE_COLD, CACHE_WARM)
+    measured = [
+        ("posts", "get", reverse("post-list"), None, read),
+        ("post", "get", reverse("post-detail"), {"slug": post_slug}, read),
+        ("post_headings", "get", reverse("post-headings"), {"slug": post_slug}, read),
+        ("categories", "get", reverse("category-list"), None, read),
+        ("category_posts", "get", reverse("category-posts"), {"slug": category_slug}, read),
+    ]
+    if include_writes:
+        measured += [
+            ("increment_post_clicks", "post", reverse("increment-post-click"), {"slug": post_slug}, (CACHE_NONE,)),
+            ("increment_category_clicks", "post", reverse("increment-category-click"), {"slug": category_slug}, (CACHE_NONE,)),
+        ]
+    return measured
+
+
+def percentile(values, percent):
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def summarize(latencies, queries, query_times, elapsed, statuses):
+    """
+    Estadisticas de una serie de requests secuenciales. Latencias en
+    segundos, se reportan en milisegundos. sequential_rps es requests /
+    tiempo total medido, no throughput con clientes concurrentes
+    """
+    milliseconds = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(latencies),
+        "sequential_rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(percentile(milliseconds, 50), 3),
+        "p95_ms": round(percentile(milliseconds, 95), 3),
+        "p99_ms": round(percentile(milliseconds, 99), 3),
+        "mean_ms": round(statistics.fmean(milliseconds), 3),
+        "queries": max(queries),
+        "queries_mean": round(statistics.fmean(queries), 2),
+        "db_ms_mean": round(statistics.fmean(query_times) * 1000, 3),
+        "statuses": sorted(set(statuses)),
+    }
+
+
+def run_endpoint(client, method, url, data, cache_mode, requests, namespaces):
+    """
+    Medir `requests` requests secuenciales. En frio se invalidan los
+    `namespaces` antes de cada request (fuera de la medicion); en caliente
+    un primer request llena el caché. Las consultas se cuentan con
+    CaptureQueriesContext, asi que la latencia incluye ese registro
+    """
+    def send():
+        if method == "post":
+            return client.post(url, data, content_type="application/json")
+        return client.get(url, data)
+
+    if cache_mode == CACHE_WARM:
+        send()
+
+    latencies, queries, query_times, statuses = [], [], [], []
+    elapsed = 0
+    for _ in range(requests):
+        if cache_mode == CACHE_COLD:
+            bump_namespaces(*namespaces)
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = send()
+            latency = time.perf_counter() - start
+        elapsed += latency
+        latencies.append(latency)
+        queries.append(len(context.captured_queries))
+        query_times.append(sum(float(query["time"]) for query in context.captured_queries))
+        statuses.append(response.status_code)
+    return summarize(latencies, queries, query_times, elapsed, statuses)
+
+
+def run(client, post_slug, category_slug, requests, include_writes=False):
+    namespaces = [
+        POST_LIST_NAMESPACE,
+        CATEGORY_LIST_NAMESPACE,
+        POST_NAMESPACE.format(post_slug),
+        CATEGORY_POSTS_NAMESPACE.format(category_slug),
+    ]
+    results = {}
+    for name, method, url, data, cache_modes in endpoints(post_slug, category_slug, include_writes):
+        for cache_mode in cache_modes:
+            results[f"{name}:{cache_mode}"] = run_endpoint(
+                client, method, url, data, cache_mode, requests, namespaces
+            )
+    return results
+
+
+def compare(baseline, current, tolerance=0.2, noise_ms=1.0):
+    """
+    Regresiones de `current` contra `baseline` (los "results" de dos
+    corridas): p95 mas de `tolerance` por encima (y por mas de `noise_ms`,
+    para ignorar el ruido de endpoints de menos de un milisegundo), mas
+    consultas por request, codigos de respuesta nuevos o un endpoint que
+    desaparecio
+    """
+    regressions = []
+    for name, before in baseline.items():
+        after = current.get(name)
+        if after is None:
+            regressions.append(f"{name}: missing from the current run")
+            continue
+        limit = max(before["p95_ms"] * (1 + tolerance), before["p95_ms"] + noise_ms)
+        if after["p95_ms"] > limit:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} ms -> {after['p95_ms']:.2f} ms")
+        if after["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries per request {before['queries']} -> {after['queries']}")
+        new_statuses = set(after["statuses"]) - set(before["statuses"])
+        if new_statuses:
+            regressions.append(f"{name}: new response statuses {sorted(new_statuses)}")
+    return regressions
@@ -0,0 +1,385 @@
+import time
+import uuid
+
+from django.conf import settings
+
+from core.redis_client import pipeline_execute
+from .utils import valid_ip_address
+
+
+POST_IMPRESSIONS_KEY = "post:impressions:{}"
+CATEGORY_IMPRESSIONS_KEY = "category:impressions:{}"
+# Clicks pendientes de agregar a los rollups (el contador de la base ya esta al dia)
+POST_CLICKS_KEY = "post:clicks:{}"
+CATEGORY_CLICKS_KEY = "category:clicks:{}"
+VIEW_PENDING_KEY = "post:views:pending:{}"
+VIEW_SEEN_KEY = "post:views:seen:{}"
+
+# Eventos pendientes de volcar, para decidir cuando sincronizar
+PENDING_EVENTS_KEY = "analytics:pending_events"
+SYNC_LOCK_KEY = "analytics:sync:lock"
+SYNC_METRICS_KEY = "analytics:sync:metrics"
+# Claves pendientes por buffer al empezar el ultimo volcado (campo por buffer)
+PENDING_KEYS_METRICS_KEY = "analytics:sync:pending_keys"
+
+# Deltas para el feed en vivo (campo "<tipo>:<metrica>:<id>"), se vacia en cada tick
+LIVE_DELTAS_KEY = "analytics:live"
+LIVE_METRICS = ("views", "impressions", "clicks")
+
+# Tiempo en pagina pendiente de volcar: campos "<tipo>:sum:<id>" (segundos) y
+# "<tipo>:count:<id>" (mediciones), suficientes para la media
+TIME_ON_PAGE_KEY = "analytics:time_on_page"
+
+VIEW_DEDUP_EXACT = "exact"
+VIEW_DEDUP_APPROXIMATE = "approximate"
+
+# Solo encola la IP si el HyperLogLog cambio, es decir si probablemente es
+# nueva. El HyperLogLog vence a los BLOG_RAW_VIEW_RETENTION_DAYS de creado,
+# igual que las PostView con las que deduplica el modo exact (las claves
+# anteriores sin TTL lo reciben en la proxima vista). Devuelve los eventos
+# pendientes, o 0 si no encolo nada
+_APPROXIMATE_VIEW_SCRIPT = """
+local added = redis.call('PFADD', KEYS[1], ARGV[1])
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+if added == 1 then
+    redis.call('SADD', KEYS[2], ARGV[1])
+    redis.call('HINCRBY', KEYS[4], ARGV[2], 1)
+    return redis.call('INCR', KEYS[3])
+end
+return 0
+"""
+
+_scripts = {}
+
+
+def _approximate_view_script(client):
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(_APPROXIMATE_VIEW_SCRIPT)
+    return script
+
+
+def _live_field(kind, metric, object_id):
+    return f"{kind}:{metric}:{object_id}"
+
+
+def _view_script_call(client, post_id, ip_address):
+    seen_key = VIEW_SEEN_KEY.format(post_id)
+    return _approximate_view_script(client)(
+        keys=[seen_key, VIEW_PENDING_KEY.format(post_id), PENDING_EVENTS_KEY, LIVE_DELTAS_KEY],
+        args=[
+            ip_address,
+            _live_field("post", "views", post_id),
+            settings.BLOG_RAW_VIEW_RETENTION_DAYS * 86400,
+        ],
+    )
+
+
+def _queue_view(pipe, post_id, ip_address):
+    # En modo exact el feed en vivo cuenta eventos: la deduplicacion por IP es al volcar
+    pipe.sadd(VIEW_PENDING_KEY.format(post_id), ip_address)
+    pipe.incr(PENDING_EVENTS_KEY)
+    pipe.hincrby(LIVE_DELTAS_KEY, _live_field("post", "views", post_id), 1)
+    return pipe
+
+
+def _queue_impressions(pipe, key_template, object_ids):
+    kind = key_template.split(":")[0]
+    for object_id in object_ids:
+        pipe.incr(key_template.format(object_id))
+        pipe.hincrby(LIVE_DELTAS_KEY, _live_field(kind, "impressions", object_id), 1)
+    pipe.incrby(PENDING_EVENTS_KEY, len(object_ids))
+    return pipe
+
+
+def record_post_view(client, post_id, ip_address):
+    """
+    Registrar una vista en redis en un solo round trip, sin tocar la base de
+    datos. Devuelve los eventos pendientes despues de sumarla (0 si no se encolo).
+    Las IPs invalidas no se encolan: harian fallar el INSERT del lote en la columna inet
+    """
+    ip_address = valid_ip_address(ip_address) if ip_address else None
+    if not ip_address:
+        return 0
+    if settings.BLOG_VIEW_DEDUP == VIEW_DEDUP_APPROXIMATE:
+        return _view_script_call(client, post_id, ip_address)
+    return _queue_view(client.pipeline(transaction=False), post_id, ip_address).execute()[1]
+
+
+def record_impressions(client, key_template, object_ids):
+    """
+    Sumar una impresion a cada objeto en un solo pipeline. Devuelve los
+    eventos pendientes despues de sumarlas
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return 0
+    return _queue_impressions(client.pipeline(transaction=False), key_template, object_ids).execute()[-1]
+
+
+def record_click(client, kind, object_id):
+    """
+    Sumar un click al feed en vivo y a los rollups del proximo volcado (el
+    contador de la base lo actualiza la vista). Devuelve los eventos pendientes
+    """
+    pipe = client.pipeline(transaction=False)
+    pipe.hincrby(LIVE_DELTAS_KEY, _live_field(kind, "clicks", object_id), 1)
+    pipe.incr((POST_CLICKS_KEY if kind == "post" else CATEGORY_CLICKS_KEY).format(object_id))
+    pipe.incr(PENDING_EVENTS_KEY)
+    return pipe.execute()[-1]
+
+
+def crossed_flush_threshold(pending, added=1):
+    """
+    Si sumar `added` eventos llevo el contador de pendientes a otro multiplo
+    de BLOG_SYNC_PENDING_THRESHOLD. Solo el productor que cruza el multiplo ve
+    True, asi que se encola un volcado cada N eventos y no uno por request.
+    `pending` es 0 cuando no se encolo nada (IP repetida o sin IP)
+    """
+    threshold = settings.BLOG_SYNC_PENDING_THRESHOLD
+    return pending > 0 and added > 0 and (pending - added) // threshold < pending // threshold
+
+
+def drain_live_deltas(client):
+    """
+    Leer y vaciar los deltas acumulados desde el tick anterior en una
+    transaccion. Devuelve {"posts": {id: {metrica: n}}, "categories": {...}}
+    """
+    pipe = client.pipeline(transaction=True)
+    pipe.hgetall(LIVE_DELTAS_KEY)
+    pipe.delete(LIVE_DELTAS_KEY)
+    fields, _ = pipe.execute()
+
+    deltas = {"posts": {}, "categories": {}}
+    for field, value in fields.items():
+        kind, metric, object_id = field.decode("utf-8").split(":", 2)
+        group = deltas["posts" if kind == "post" else "categories"]
+        counters = group.setdefault(object_id, dict.fromkeys(LIVE_METRICS, 0))
+        counters[metric] += int(value)
+    return deltas
+
+
+def record_time_on_page(client, events):
+    """
+    Acumular mediciones (tipo, id, segundos) de un beacon en un solo pipeline
+    """
+    if not events:
+        return
+    pipe = client.pipeline(transaction=False)
+    for kind, object_id, seconds in events:
+        pipe.hincrbyfloat(TIME_ON_PAGE_KEY, f"{kind}:sum:{object_id}", seconds)
+        pipe.hincrby(TIME_ON_PAGE_KEY, f"{kind}:count:{object_id}", 1)
+    pipe.incrby(PENDING_EVENTS_KEY, len(events))
+    pipe.execute()
+
+
+def drain_time_on_page(client):
+    """
+    Leer y vaciar las mediciones acumuladas en una transaccion. Devuelve
+    {"post": {id: (segundos, mediciones)}, "category": {...}}
+    """
+    pipe = client.pipeline(transaction=True)
+    pipe.hgetall(TIME_ON_PAGE_KEY)
+    pipe.delete(TIME_ON_PAGE_KEY)
+    fields, _ = pipe.execute()
+
+    totals = {"post": {}, "category": {}}
+    for field, value in fields.items():
+        kind, metric, object_id = field.decode("utf-8").split(":", 2)
+        aggregate = totals[kind].setdefault(uuid.UUID(object_id), [0.0, 0])
+        if metric == "sum":
+            aggregate[0] += float(value)
+        else:
+            aggregate[1] += int(value)
+    return {
+        kind: {object_id: (total, count) for object_id, (total, count) in aggregates.items() if count}
+        for kind, aggregates in totals.items()
+    }
+
+
+def restore_time_on_page(client, kind, samples):
+    """
+    Devolver a redis las mediciones de un volcado que fallo
+    """
+    def queue(pipe, item):
+        object_id, (total, count) = item
+        pipe.hincrbyfloat(TIME_ON_PAGE_KEY, f"{kind}:sum:{object_id}", total)
+        pipe.hincrby(TIME_ON_PAGE_KEY, f"{kind}:count:{object_id}", count)
+    pipeline_execute(queue, samples.items(), client=client)
+
+
+# Variantes para un cliente de redis.asyncio (vistas async), mismos comandos
+
+async def arecord_post_view(client, post_id, ip_address):
+    ip_address = valid_ip_address(ip_address) if ip_address else None
+    if not ip_address:
+        return 0
+    if settings.BLOG_VIEW_DEDUP == VIEW_DEDUP_APPROXIMATE:
+        return await _view_script_call(client, post_id, ip_address)
+    return (await _queue_view(client.pipeline(transaction=False), post_id, ip_address).execute())[1]
+
+
+async def arecord_impressions(client, key_template, object_ids):
+    object_ids = list(object_ids)
+    if not object_ids:
+        return 0
+    return (await _queue_impressions(client.pipeline(transaction=False), key_template, object_ids).execute())[-1]
+
+
+def pending_events(client):
+    return int(client.get(PENDING_EVENTS_KEY) or 0)
+
+
+# Buffers pendientes de volcar: patron de claves o hash con un campo por objeto
+PENDING_KEY_PATTERNS = {
+    "post_views": VIEW_PENDING_KEY.format("*"),
+    "post_impressions": POST_IMPRESSIONS_KEY.format("*"),
+    "category_impressions": CATEGORY_IMPRESSIONS_KEY.format("*"),
+    "post_clicks": POST_CLICKS_KEY.format("*"),
+    "category_clicks": CATEGORY_CLICKS_KEY.format("*"),
+}
+PENDING_HASHES = {
+    "live_deltas": LIVE_DELTAS_KEY,
+    "time_on_page": TIME_ON_PAGE_KEY,
+}
+
+
+def pending_keys(client, batch_size=1000):
+    """
+    Claves (o campos de hash) esperando el proximo volcado, por buffer. Cuenta
+    con SCAN, asi que el costo crece con el tamaño de la base de redis: lo
+    llama el volcado (record_pending_keys), no cada scrape de metricas
+    """
+    counts = {
+        buffer: sum(len(keys) for keys in scan_batches(client, pattern, batch_size))
+        for buffer, pattern in PENDING_KEY_PATTERNS.items()
+    }
+    pipe = client.pipeline(transaction=False)
+    for key in PENDING_HASHES.values():
+        pipe.hlen(key)
+    counts.update(zip(PENDING_HASHES, pipe.execute()))
+    return counts
+
+
+def record_pending_keys(client):
+    # Guardar el conteo para el gauge de metricas, que solo lee el hash
+    counts = pending_keys(client)
+    client.hset(PENDING_KEYS_METRICS_KEY, mapping=counts)
+    return counts
+
+
+def last_pending_keys(client):
+    """
+    Claves pendientes por buffer al empezar el ultimo volcado, sin SCAN
+    """
+    return {
+        buffer.decode("utf-8"): int(count)
+        for buffer, count in client.hgetall(PENDING_KEYS_METRICS_KEY).items()
+    }
+
+
+def get_sync_metrics(client):
+    """
+    Metricas del ultimo volcado. `flush_lag` son los segundos desde el ultimo
+    volcado completo, es decir la edad maxima de un evento todavia en redis
+    """
+    metrics = {
+        key.decode("utf-8"): float(value)
+        for key, value in client.hgetall(SYNC_METRICS_KEY).items()
+    }
+    last_flush_at = metrics.get("last_flush_at")
+    metrics["pending_events"] = pending_events(client)
+    metrics["flush_lag"] = time.time() - last_flush_at if last_flush_at else None
+    return metrics
+
+
+def scan_batches(client, match, batch_size=500):
+    """
+    Recorrer las claves con SCAN (no bloquea redis como KEYS) en listas de hasta `batch_size`
+    """
+    keys = []
+    for key in client.scan_iter(match=match, count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            yield keys
+            keys = []
+    if keys:
+        yield keys
+
+
+def _key_id(key):
+    try:
+        return uuid.UUID(key.decode("utf-8").split(":")[-1])
+    except ValueError:
+        return None
+
+
+def drain_counters(client, match, batch_size=500):
+    """
+    Vaciar contadores (p.ej. post:impressions:<id>) por lotes.
+
+    Cada clave se lee y se borra con GETDEL, que es atomico, asi que los INCR
+    que lleguen despues simplemente crean una clave nueva para el siguiente
+    volcado. Devuelve diccionarios {id: incremento}.
+    """
+    for keys in scan_batches(client, match, batch_size):
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.getdel(key)
+        counters = {}
+        for key, value in zip(keys, pipe.execute()):
+            object_id = _key_id(key)
+            if object_id is not None and value and int(value) > 0:
+                counters[object_id] = int(value)
+        yield counters
+
+
+def restore_counters(client, key_template, counters):
+    """
+    Devolver a redis los incrementos de un lote que no se pudo guardar
+    """
+    pipeline_execute(
+        lambda pipe, item: pipe.incrby(key_template.format(item[0]), item[1]),
+        counters.items(),
+        client=client,
+    )
+
+
+def restore_post_views(client, pending):
+    """
+    Devolver a los sets de redis las IPs de un lote de vistas que no se pudo guardar
+    """
+    pipeline_execute(
+        lambda pipe, item: pipe.sadd(VIEW_PENDING_KEY.format(item[0]), *item[1]),
+        [(post_id, ips) for post_id, ips in pending.items() if ips],
+        client=client,
+    )
+
+
+def drain_post_views(client, batch_size=500):
+    """
+    Vaciar los sets de vistas pendientes por lotes.
+
+    Cada lote se lee y se borra en una transaccion MULTI para no perder las IPs
+    que lleguen entre la lectura y el borrado. Devuelve diccionarios
+    {post_id: set(ips)} de hasta `batch_size` posts.
+    """
+    for keys in scan_batches(client, VIEW_PENDING_KEY.format("*"), batch_size):
+        yield _pop_view_sets(client, keys)
+
+
+def _pop_view_sets(client, keys):
+    pipe = client.pipeline(transaction=True)
+    for key in keys:
+        pipe.smembers(key)
+        pipe.delete(key)
+    results = pipe.execute()
+
+    pending = {}
+    for key, members in zip(keys, results[::2]):
+        post_id = _key_id(key)
+        if post_id is not None and members:
+            pending[post_id] = {member.decode("utf-8") for member in members}
+    return pending
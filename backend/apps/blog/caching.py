@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django_redis.cache import RedisCache
+
+from core.instrumentation import record_cache
+from core.redis_client import get_async_redis
+
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE_VERSION_KEY = "cache_version:{}"
+
+# Namespaces de caché. Los de posts y categorias se acotan por slug para que
+# invalidar un objeto no vacie el caché de los demas
+POST_LIST_NAMESPACE = "post_list"
+CATEGORY_LIST_NAMESPACE = "category_list"
+POST_NAMESPACE = "post:{}"
+CATEGORY_POSTS_NAMESPACE = "category_posts:{}"
+
+REBUILD_LOCK_TIMEOUT = 30
+REBUILD_WAIT_TIMEOUT = 2
+REBUILD_WAIT_INTERVAL = 0.05
+
+
+def version_timeout():
+    """
+    TTL de las claves de version: lo que vive una entrada (con su periodo
+    vencido). Las versiones son time_ns() y nunca se repiten, asi que una
+    version que expira no puede revivir entradas viejas. Con TTL, los slugs
+    que no existen no dejan claves para siempre
+    """
+    return settings.BLOG_CACHE_TIMEOUT + settings.BLOG_CACHE_STALE_TIMEOUT
+
+
+def namespace_version(namespace):
+    version_key = NAMESPACE_VERSION_KEY.format(namespace)
+    version = cache.get(version_key)
+    if version is None:
+        # Nunca reiniciar a una version fija: podria revivir entradas viejas
+        cache.add(version_key, time.time_ns(), timeout=version_timeout())
+        version = cache.get(version_key)
+    return version
+
+
+def versioned_key(namespace, *parts):
+    """
+    Clave de caché dentro de la version actual del namespace, p.ej.
+    versioned_key("post_list", search, sort) -> "post_list:v<version>:<search>:<sort>"
+    """
+    return ":".join([namespace, f"v{namespace_version(namespace)}", *map(str, parts)])
+
+
+def bump_namespaces(*namespaces):
+    """
+    Invalidar namespaces cambiando su version en una sola escritura. Las
+    entradas anteriores quedan huerfanas y expiran solas por TTL
+    """
+    version = time.time_ns()
+    cache.set_many(
+        {NAMESPACE_VERSION_KEY.format(namespace): version for namespace in set(namespaces)},
+        timeout=version_timeout(),
+    )
+
+
+def post_detail_key(slug):
+    # El detalle incluye la categoria anidada: depende tambien de la version de
+    # las categorias, asi guardar una categoria no invalida post por post
+    return versioned_key(POST_NAMESPACE.format(slug), "detail", f"c{namespace_version(CATEGORY_LIST_NAMESPACE)}")
+
+
+def post_headings_key(slug):
+    # Tabla de contenidos, junto al detalle: se invalidan con el mismo namespace
+    return versioned_key(POST_NAMESPACE.format(slug), "headings")
+
+
+def rebuild_lock_key(key):
+    return f"{key}:lock"
+
+
+def store(key, value, timeout=None):
+    """
+    Guardar `value` con su vencimiento. La entrada vive BLOG_CACHE_STALE_TIMEOUT
+    segundos mas para poder servirla vencida mientras se recalcula
+    """
+    timeout = timeout or settings.BLOG_CACHE_TIMEOUT
+    cache.set(key, (value, time.time() + timeout), timeout=timeout + settings.BLOG_CACHE_STALE_TIMEOUT)
+
+
+def read_through(key, build, timeout=None, refresh=None):
+    """
+    Leer `key` del caché y construirla con `build()` si falta.
+
+    Solo un worker reconstruye una clave a la vez (lock con cache.add); los
+    demas esperan hasta REBUILD_WAIT_TIMEOUT a que aparezca el valor. Si la
+    entrada esta vencida se sirve igual y el worker que toma el lock llama a
+    `refresh()` para recalcularla en segundo plano, que debe liberar el lock.
+    Si `refresh()` falla (p.ej. el broker no responde) se libera el lock y se
+    sirve igual el valor vencido.
+    """
+    entry = cache.get(key)
+    lock_key = rebuild_lock_key(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() >= fresh_until and refresh and cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+            try:
+                refresh()
+            except Exception as e:
+                logger.warning(f"error scheduling cache refresh for {key}:{str(e)}")
+                cache.delete(lock_key)
+        return value
+
+    if cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        try:
+            value = build()
+            store(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # Otro worker esta reconstruyendo la clave: esperar su resultado
+    deadline = time.time() + REBUILD_WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(REBUILD_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return build()
+
+
+# Variantes async (vistas ASGI): mismas claves y formato de entrada que las sync.
+#
+# Los metodos async del backend de django_redis (aget, aset...) son los de
+# BaseCache: sync_to_async del metodo sync, todos en el mismo thread. Para no
+# pasar por ese thread en cada hit se habla directo con redis.asyncio, con la
+# construccion de claves y el serializer del backend, asi que las entradas son
+# las mismas que leen y escriben las vistas sync. Con otro backend (p.ej.
+# LocMemCache en los tests) se usan sus metodos async.
+
+def _redis_cache():
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if not isinstance(backend, RedisCache):
+        return None, None
+    location = settings.CACHES[DEFAULT_CACHE_ALIAS]["LOCATION"]
+    if not isinstance(location, str):
+        location = location[0]
+    return backend.client, get_async_redis(location)
+
+
+def _milliseconds(timeout):
+    return None if timeout is None else max(int(timeout * 1000), 1)
+
+
+async def acache_get(key, default=None):
+    backend, client = _redis_cache()
+    if backend is None:
+        return await cache.aget(key, default)
+    start = time.perf_counter()
+    value = await client.get(backend.make_key(key))
+    record_cache([key], {key} if value is not None else set(), time.perf_counter() - start)
+    return default if value is None else backend.decode(value)
+
+
+async def acache_set(key, value, timeout):
+    backend, client = _redis_cache()
+    if backend is None:
+        return await cache.aset(key, value, timeout=timeout)
+    await client.set(backend.make_key(key), backend.encode(value), px=_milliseconds(timeout))
+
+
+async def acache_add(key, value, timeout):
+    backend, client = _redis_cache()
+    if backend is None:
+        return await cache.aadd(key, value, timeout=timeout)
+    return bool(await client.set(backend.make_key(key), backend.encode(value), px=_milliseconds(timeout), nx=True))
+
+
+async def acache_delete(key):
+    backend, client = _redis_cache()
+    if backend is None:
+        return await cache.adelete(key)
+    await client.delete(backend.make_key(key))
+
+
+async def anamespace_version(namespace):
+    version_key = NAMESPACE_VERSION_KEY.format(namespace)
+    version = await acache_get(version_key)
+    if version is None:
+        await acache_add(version_key, time.time_ns(), version_timeout())
+        version = await acache_get(version_key)
+    return version
+
+
+async def aversioned_key(namespace, *parts):
+    return ":".join([namespace, f"v{await anamespace_version(namespace)}", *map(str, parts)])
+
+
+async def apost_detail_key(slug):
+    return await aversioned_key(
+        POST_NAMESPACE.format(slug), "detail", f"c{await anamespace_version(CATEGORY_LIST_NAMESPACE)}"
+    )
+
+
+async def apost_headings_key(slug):
+    return await aversioned_key(POST_NAMESPACE.format(slug), "headings")
+
+
+async def astore(key, value, timeout=None):
+    timeout = timeout or settings.BLOG_CACHE_TIMEOUT
+    await acache_set(key, (value, time.time() + timeout), timeout + settings.BLOG_CACHE_STALE_TIMEOUT)
+
+
+async def aread_through(key, build, timeout=None, refresh=None):
+    """
+    read_through para corrutinas: `build` y `refresh` son async y la espera
+    a otro worker no bloquea el event loop
+    """
+    entry = await acache_get(key)
+    lock_key = rebuild_lock_key(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() >= fresh_until and refresh and await acache_add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+            try:
+                await refresh()
+            except Exception as e:
+                logger.warning(f"error scheduling cache refresh for {key}:{str(e)}")
+                await acache_delete(lock_key)
+        return value
+
+    if await acache_add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        try:
+            value = await build()
+            await astore(key, value, timeout)
+            return value
+        finally:
+            await acache_delete(lock_key)
+
+    deadline = time.time() + REBUILD_WAIT_TIMEOUT
+    while time.time() < deadline:
+        await asyncio.sleep(REBUILD_WAIT_INTERVAL)
+        entry = await acache_get(key)
+        if entry is not None:
+            return entry[0]
+    return await build()
@@ -0,0 +1,40 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+
+# Grupo de channels al que push_live_analytics_task manda un mensaje por tick
+ANALYTICS_DASHBOARD_GROUP = "analytics_dashboard"
+
+
+class AnalyticsDashboardConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Feed en vivo para el dashboard: cada BLOG_LIVE_TICK segundos recibe un
+    solo mensaje con los deltas de vistas, impresiones y clicks por post y
+    categoria acumulados en redis, sin consultar la base de datos.
+    Solo para staff (sesion del admin) o clientes con una API-Key valida.
+    """
+
+    async def connect(self):
+        if not self.is_authorized():
+            await self.close(code=4403)
+            return
+        await self.channel_layer.group_add(ANALYTICS_DASHBOARD_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(ANALYTICS_DASHBOARD_GROUP, self.channel_name)
+
+    def is_authorized(self):
+        user = self.scope.get("user")
+        if user is not None and user.is_staff:
+            return True
+        headers = dict(self.scope.get("headers", []))
+        api_key = headers.get(b"api-key", b"").decode("latin-1")
+        return bool(api_key) and api_key in getattr(settings, "VALID_API_KEYS", [])
+
+    async def analytics_delta(self, event):
+        await self.send_json({
+            "tick": event["tick"],
+            "posts": event["posts"],
+            "categories": event["categories"],
+        })
@@ -0,0 +1,165 @@
+"""
+Serializadores de solo lectura para los endpoints de listas.
+
+Trabajan sobre las tuplas de values_list() en lugar de instancias del
+modelo: las columnas y la funcion que convierte cada una se resuelven una
+sola vez al importar el modulo, asi que serializar una fila es solo recorrer
+la tupla. La salida es la misma que la de PostListSerializer,
+CategoryListSerializer y HeadingSerializer.
+"""
+
+from collections import defaultdict
+
+from core.instrumentation import timed
+from .models import Category, Post
+
+
+def _uuid(value):
+    return None if value is None else str(value)
+
+
+def _image(model, name):
+    # Igual que ImageField de DRF sin request en el contexto: la url del storage o None
+    storage = model._meta.get_field(name).storage
+
+    def to_representation(value):
+        return storage.url(value) if value else None
+    return to_representation
+
+
+class FastSerializer:
+    """
+    Cada campo es (clave en el JSON, columna de values_list, conversion).
+    Las columnas extra (p.ej. la del orden para el cursor) se piden pero no
+    se emiten.
+    """
+    fields = ()
+    extra_columns = ()
+
+    def __init__(self):
+        self.columns = tuple(column for _, column, _ in self.fields) + tuple(self.extra_columns)
+        self.mappers = tuple(
+            (key, index, mapper) for index, (key, _, mapper) in enumerate(self.fields)
+        )
+
+    def values(self, queryset):
+        # named=True para que la paginacion por cursor pueda leer row.created_at y row.id
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, row):
+        return {
+            key: row[index] if mapper is None else mapper(row[index])
+            for key, index, mapper in self.mappers
+        }
+
+    @timed("serialize")
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+class CategoryFastSerializer(FastSerializer):
+    # Mismo orden de campos que CategorySerializer (sin search_vector, path ni las fechas)
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.fields = tuple(
+            (key, prefix + column, mapper) for key, column, mapper in (
+                ("id", "id", _uuid),
+                ("name", "name", None),
+                ("title", "title", None),
+                ("description", "description", None),
+                ("thumbnail", "thumbnail", _image(Category, "thumbnail")),
+                ("slug", "slug", None),
+                ("parent", "parent", _uuid),
+            )
+        )
+        super().__init__()
+
+
+class PostListFastSerializer(FastSerializer):
+    fields = (
+        ("id", "id", _uuid),
+        ("title", "title", None),
+        ("description", "description", None),
+        ("thumbnail", "thumbnail", _image(Post, "thumbnail")),
+        ("slug", "slug", None),
+    )
+    extra_columns = ("created_at",)
+
+    def __init__(self):
+        super().__init__()
+        self.category = CategoryFastSerializer(prefix="category__")
+        self.category_start = len(self.columns)
+        self.columns += self.category.columns + ("view_count",)
+        self.view_count_index = len(self.columns) - 1
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        category = row[self.category_start:self.view_count_index]
+        # El post sin categoria se serializa como null, igual que CategorySerializer
+        data["category"] = None if category[0] is None else self.category.to_representation(category)
+        data["view_count"] = row[self.view_count_index]
+        return data
+
+
+class CategoryListFastSerializer(FastSerializer):
+    fields = (
+        ("name", "name", None),
+        ("slug", "slug", None),
+    )
+    extra_columns = ("id",)
+
+    def children(self, rows):
+        # Los ids de los hijos de todas las categorias en una sola consulta
+        return Category.objects.filter(parent_id__in=[row.id for row in rows]).values_list("parent_id", "id")
+
+    @timed("serialize")
+    def serialize(self, rows, children=None):
+        by_parent = defaultdict(list)
+        for parent_id, child_id in self.children(rows) if children is None else children:
+            by_parent[parent_id].append(str(child_id))
+
+        data = super().serialize(rows)
+        for row, item in zip(rows, data):
+            item["children"] = by_parent[row.id]
+        return data
+
+    async def aserialize(self, rows):
+        # Para las vistas async: la consulta de los hijos con el ORM async
+        return self.serialize(rows, [pair async for pair in self.children(rows)])
+
+
+class CategoryTreeFastSerializer(CategoryFastSerializer):
+
+    @timed("serialize")
+    def serialize(self, rows):
+        """
+        Arbol anidado a partir de las filas ordenadas por path: cada padre
+        llega antes que sus hijos, asi que basta una pasada. Las filas cuyo
+        padre no esta en el resultado son raices (p.ej. la de un subarbol)
+        """
+        nodes = {}
+        roots = []
+        for row in rows:
+            node = self.to_representation(row)
+            node["children"] = []
+            nodes[row.id] = node
+            parent = nodes.get(row.parent)
+            (parent["children"] if parent else roots).append(node)
+        return roots
+
+
+class HeadingFastSerializer(FastSerializer):
+    fields = (
+        ("title", "title", None),
+        ("slug", "slug", None),
+        ("level", "level", None),
+        ("order", "order", None),
+    )
+
+
+post_list_serializer = PostListFastSerializer()
+category_list_serializer = CategoryListFastSerializer()
+category_tree_serializer = CategoryTreeFastSerializer()
+heading_serializer = HeadingFastSerializer()
@@ -0,0 +1,99 @@
+"""
+Tabla de contenidos de un post a partir del HTML de CKEditor.
+
+El HTML se recorre una sola vez con html.parser (por eventos, sin armar un
+arbol). Cada heading usa como anchor su id si ya tiene uno; si no, el slug
+de su texto, sin repetir los ids del documento. Los ids generados se escriben
+en el contenido, asi el anchor no cambia aunque despues se edite el titulo.
+"""
+
+from html.parser import HTMLParser
+
+from django.utils.text import slugify
+
+
+HEADING_TAGS = {f"h{level}": level for level in range(1, 7)}
+TITLE_MAX_LENGTH = 255
+
+
+class HeadingParser(HTMLParser):
+    """
+    Junta los headings con su nivel, id, texto y la posicion de su tag de
+    apertura en el HTML
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.headings = []
+        self.current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HEADING_TAGS and self.current is None:
+            self.current = {
+                "level": HEADING_TAGS[tag],
+                "tag": tag,
+                "id": dict(attrs).get("id") or "",
+                "text": [],
+                "position": self.getpos(),
+                "start_tag": self.get_starttag_text(),
+            }
+
+    def handle_endtag(self, tag):
+        if self.current is not None and tag == self.current["tag"]:
+            self.headings.append(self.current)
+            self.current = None
+
+    def handle_data(self, data):
+        if self.current is not None:
+            self.current["text"].append(data)
+
+
+def _line_starts(content):
+    # html.parser cuenta las lineas solo por "\n"
+    starts = [0]
+    index = content.find("\n")
+    while index != -1:
+        starts.append(index + 1)
+        index = content.find("\n", index + 1)
+    return starts
+
+
+def extract_headings(content):
+    """
+    Headings de `content` y el contenido con los ids que faltaban. Devuelve
+    (contenido, [{"title", "slug", "level", "order"}]) en orden de aparicion
+    """
+    content = content or ""
+    parser = HeadingParser()
+    parser.feed(content)
+    parser.close()
+
+    headings = []
+    for heading in parser.headings:
+        title = " ".join("".join(heading["text"]).split())[:TITLE_MAX_LENGTH]
+        if title:
+            headings.append((heading, title))
+
+    used = {heading["id"] for heading, _ in headings if heading["id"]}
+    line_starts = _line_starts(content)
+
+    toc = []
+    insertions = []
+    for order, (heading, title) in enumerate(headings):
+        slug = heading["id"]
+        if not slug:
+            base = slugify(title)[:TITLE_MAX_LENGTH - 8] or f"section-{order}"
+            slug, suffix = base, 2
+            while slug in used:
+                slug, suffix = f"{base}-{suffix}", suffix + 1
+            used.add(slug)
+            # Antes del ">" (o "/>") que cierra el tag de apertura
+            start_tag = heading["start_tag"]
+            lineno, column = heading["position"]
+            end = line_starts[lineno - 1] + column + len(start_tag)
+            insertions.append((end - (2 if start_tag.endswith("/>") else 1), f' id="{slug}"'))
+        toc.append({"title": title, "slug": slug, "level": heading["level"], "order": order})
+
+    for index, text in reversed(insertions):
+        content = content[:index] + text + content[index:]
+    return content, toc
@@ -0,0 +1,123 @@
+import json
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+from django.test import Client
+from django.utils import timezone
+
+from apps.blog import benchmarks
+from apps.blog.models import Category, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95/p99) y consultas por request de los endpoints calientes del "
+        "blog con el caché frio y caliente, con un solo cliente secuencial en el mismo proceso "
+        "(para carga concurrente usar benchmark_async_views --base-url), y emite los resultados "
+        "en JSON. Con --baseline falla si hay regresiones respecto de una corrida anterior"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests por endpoint y modo de caché")
+        parser.add_argument(
+            "--seed-posts", type=int, default=None,
+            help="Generar (una sola vez) un dataset de este tamaño con seed_blog antes de medir",
+        )
+        parser.add_argument("--output", default=None, help="Archivo JSON de salida (por defecto stdout)")
+        parser.add_argument("--baseline", default=None, help="JSON de una corrida anterior para comparar")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Aumento de p95 tolerado (0.2 = 20%%)")
+        parser.add_argument("--noise-ms", type=float, default=1.0, help="Aumento de p95 en ms que se ignora siempre")
+        parser.add_argument(
+            "--include-writes", action="store_true",
+            help="Medir tambien los endpoints de clicks, que escriben clicks reales en la base y en redis",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed_posts"]:
+            self.seed(options["seed_posts"])
+        post_slug, category_slug = self.targets()
+
+        results = benchmarks.run(
+            Client(), post_slug, category_slug, options["requests"], options["include_writes"]
+        )
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "commit": self.commit(),
+                "python": platform.python_version(),
+                "database": settings.DATABASES["default"]["ENGINE"],
+                "cache": settings.CACHES["default"]["BACKEND"],
+                "posts": Post.objects.count(),
+                "categories": Category.objects.count(),
+                "requests": options["requests"],
+                "include_writes": options["include_writes"],
+                "post": post_slug,
+                "category": category_slug,
+            },
+            "results": results,
+        }
+
+        body = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(body + "\n")
+            self.print_table(results)
+        else:
+            self.stdout.write(body)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline:
+                regressions = benchmarks.compare(
+                    json.load(baseline)["results"], results, options["tolerance"], options["noise_ms"]
+                )
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+            self.stderr.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def seed(self, posts):
+        # Un dataset por tamaño: corridas sucesivas reutilizan el mismo
+        prefix = f"bench{posts}"
+        if Category.objects.filter(slug__startswith=f"{prefix}-").exists():
+            return
+        call_command(
+            "seed_blog",
+            posts=posts,
+            categories=max(10, posts // 200),
+            prefix=prefix,
+            seed=0,
+            stdout=self.stderr,
+        )
+
+    def targets(self):
+        # El post mas visto y la categoria con mas posts publicados: los casos mas pesados
+        post_slug = (
+            Post.postobjects.order_by("-post_analytics__views", "id").values_list("slug", flat=True).first()
+        )
+        category_slug = (
+            Category.objects.annotate(published=Count("post", filter=Q(post__status="published")))
+            .order_by("-published", "id")
+            .values_list("slug", flat=True)
+            .first()
+        )
+        if not post_slug or not category_slug:
+            raise CommandError("No published posts found, use --seed-posts or seed_blog first")
+        return post_slug, category_slug
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_table(self, results):
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:34} p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f}  p99 {stats['p99_ms']:8.2f} ms  "
+                f"{stats['sequential_rps']:8.1f} req/s (secuencial)  {stats['queries']:3} queries"
+            )
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+
+from apps.blog.benchmarks import percentile
+from apps.blog.models import Category, Post
+
+
+class HTTPConnection:
+    """
+    Conexion HTTP/1.1 keep-alive minima con asyncio.open_connection para
+    medir un servidor ASGI real (uvicorn, daphne) sin dependencias extra
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: keep-alive\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise CommandError(f"{self.host}:{self.port} closed the connection")
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(status_line.split()[1])
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.reader = self.writer = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara las vistas sync y async del blog con requests concurrentes, con el caché "
+        "ya caliente. Sin --base-url usa el AsyncClient de Django en el mismo proceso (mide el "
+        "handler ASGI, no un servidor); con --base-url mide un servidor ASGI real por HTTP"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests por endpoint")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests simultaneos")
+        parser.add_argument(
+            "--base-url",
+            default=None,
+            help="Servidor ASGI a medir, por ejemplo http://127.0.0.1:8000 (uvicorn core.asgi:application)",
+        )
+
+    def handle(self, *args, **options):
+        post = Post.postobjects.order_by("-created_at").values_list("slug", flat=True).first()
+        category = Category.objects.filter(post__status="published").values_list("slug", flat=True).first()
+        if not post or not category:
+            raise CommandError("No published posts found, generate some data first")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        base_url = options["base_url"]
+        if base_url:
+            parts = urlsplit(base_url)
+            if parts.scheme != "http" or not parts.hostname:
+                raise CommandError("--base-url must be an http:// URL")
+            base_url = (parts.hostname, parts.port or 80)
+
+        endpoints = [
+            "posts/",
+            f"post/?slug={post}",
+            f"post/headings/?slug={post}",
+            "categories/",
+            "categories/tree/",
+            f"category/posts/?slug={category}",
+        ]
+        asyncio.run(self.run(endpoints, options["requests"], options["concurrency"], base_url))
+
+    async def run(self, endpoints, total, concurrency, base_url):
+        if base_url:
+            # Una conexion keep-alive por request simultaneo
+            connections = [HTTPConnection(*base_url) for _ in range(concurrency)]
+        else:
+            client = AsyncClient()
+            connections = [client]
+
+        try:
+            for endpoint in endpoints:
+                for variant, prefix in (("sync", "/api/blog/"), ("async", "/api/blog/async/")):
+                    url = prefix + endpoint
+                    # El primer request llena el caché
+                    status = await self.fetch(connections[0], url)
+                    if status != 200:
+                        raise CommandError(f"{url} returned {status}")
+                    elapsed, latencies, errors = await self.load(connections, url, total, concurrency)
+                    self.stdout.write(
+                        f"{variant:5} {endpoint:40} {total / elapsed:8.1f} req/s  "
+                        f"p50 {percentile(latencies, 50):7.2f} ms  p95 {percentile(latencies, 95):7.2f} ms"
+                        + (f"  {errors} errors" if errors else "")
+                    )
+        finally:
+            if base_url:
+                await asyncio.gather(*(connection.close() for connection in connections))
+
+    async def fetch(self, connection, url):
+        if isinstance(connection, HTTPConnection):
+            return await connection.get(url)
+        return (await connection.get(url)).status_code
+
+    async def load(self, connections, url, total, concurrency):
+        # Con el AsyncClient los workers comparten el cliente, con --base-url cada uno usa su conexion
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+        latencies = []
+        errors = 0
+
+        async def worker(connection):
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                status = await self.fetch(connection, url)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if status != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(connections[index % len(connections)]) for index in range(concurrency)))
+        return time.perf_counter() - start, latencies, errors
@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+from apps.blog.fast_serializers import category_list_serializer, heading_serializer, post_list_serializer
+from apps.blog.models import Category, Heading, Post
+from apps.blog.serializers import CategoryListSerializer, HeadingSerializer, PostListSerializer
+
+
+class Command(BaseCommand):
+    help = "Compara los serializers de DRF con los de values_list() + orjson sobre los datos de la base"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=50, help="Filas por respuesta")
+        parser.add_argument("--repeat", type=int, default=200, help="Repeticiones de cada caso")
+
+    def handle(self, *args, **options):
+        size, repeat = options["size"], options["repeat"]
+        if not Post.objects.exists():
+            raise CommandError("No posts found, generate some data first")
+
+        cases = [
+            (
+                "posts",
+                lambda: PostListSerializer(list(Post.postobjects.for_list().order_by("-created_at", "id")[:size]), many=True).data,
+                lambda: post_list_serializer.serialize(post_list_serializer.values(Post.postobjects.for_list().order_by("-created_at", "id")[:size])),
+            ),
+            (
+                "categories",
+                lambda: CategoryListSerializer(list(Category.objects.prefetch_related("children").order_by("slug")[:size]), many=True).data,
+                lambda: category_list_serializer.serialize(list(category_list_serializer.values(Category.objects.order_by("slug")[:size]))),
+            ),
+            (
+                "headings",
+                lambda: HeadingSerializer(Heading.objects.order_by("post_id", "order")[:size], many=True).data,
+                lambda: heading_serializer.serialize(heading_serializer.values(Heading.objects.order_by("post_id", "order")[:size])),
+            ),
+        ]
+        for name, drf, fast in cases:
+            drf_body, drf_time = self.measure(lambda: JSONRenderer().render(drf()), repeat)
+            fast_body, fast_time = self.measure(lambda: FastJSONRenderer().render(fast()), repeat)
+            if drf_body != fast_body:
+                raise CommandError(f"{name}: fast path output differs from the DRF serializer")
+            self.stdout.write(
+                f"{name}: drf {drf_time * 1000:.3f} ms, fast {fast_time * 1000:.3f} ms, "
+                f"speedup x{drf_time / fast_time:.2f} ({len(fast_body)} bytes)"
+            )
+
+    def measure(self, render, repeat):
+        # Mediana de las repeticiones, incluyendo la consulta a la base
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = render()
+            timings.append(time.perf_counter() - start)
+        return body, statistics.median(timings)
@@ -0,0 +1,285 @@
+import io
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from faker import Faker
+
+from apps.blog.caching import bump_namespaces, CATEGORY_LIST_NAMESPACE, POST_LIST_NAMESPACE
+from apps.blog.models import (
+    rollup_buckets,
+    Category,
+    CategoryAnalytics,
+    CategoryAnalyticsRollup,
+    Heading,
+    Post,
+    PostAnalytics,
+    PostAnalyticsRollup,
+    PostView,
+    CATEGORY_PATH_SEPARATOR,
+    ROLLUP_HOUR,
+)
+from apps.blog.search import category_search_vector, post_search_vector
+
+
+# Primera IP de las vistas generadas (10.0.0.0), cada vista de un post usa la siguiente
+FIRST_IP = 10 << 24
+
+
+def zipf_weights(size, skew):
+    # Peso del elemento en la posicion `rank`: 1 / rank^skew (skew 0 = uniforme)
+    return [1 / (rank ** skew) for rank in range(1, size + 1)]
+
+
+def ip_address(number):
+    return f"{number >> 24 & 255}.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}"
+
+
+def batches(items, size):
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def copy_value(value):
+    # Formato text de COPY: \N es NULL y se escapan barras, tabs y saltos de linea
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un dataset de prueba (categorias, posts con headings, vistas, analiticas y "
+        "rollups) con bulk_create por lotes o COPY, sin pasar por los signals de cada fila"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=10000, help="Posts a generar")
+        parser.add_argument("--categories", type=int, default=50, help="Categorias a generar")
+        parser.add_argument("--depth", type=int, default=3, help="Niveles del arbol de categorias")
+        parser.add_argument("--headings", type=int, default=4, help="Headings promedio por post")
+        parser.add_argument("--views", type=int, default=20, help="Vistas (PostView) promedio por post")
+        parser.add_argument(
+            "--skew", type=float, default=1.0,
+            help="Exponente de Zipf con que se reparten los posts entre categorias y las vistas entre posts (0 = uniforme)",
+        )
+        parser.add_argument("--published", type=float, default=0.9, help="Proporcion de posts publicados")
+        parser.add_argument("--days", type=int, default=365, help="Antiguedad maxima de los posts en dias")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Posts por lote (una transaccion por lote)")
+        parser.add_argument("--copy", action="store_true", help="Insertar con COPY de PostgreSQL en lugar de bulk_create")
+        parser.add_argument("--no-search-vector", action="store_true", help="No calcular el search_vector de los posts")
+        parser.add_argument("--seed", type=int, default=None, help="Semilla para repetir el mismo dataset")
+        parser.add_argument("--prefix", default="seed", help="Prefijo de los slugs generados")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.chunk_size = options["chunk_size"]
+        self.prefix = options["prefix"]
+        if options["posts"] < 1 or options["categories"] < 1 or options["depth"] < 1:
+            raise CommandError("--posts, --categories and --depth must be positive")
+        if Category.objects.filter(slug__startswith=f"{self.prefix}-").exists():
+            raise CommandError(f"Slugs with prefix '{self.prefix}' already exist, use another --prefix")
+
+        self.random = random.Random(options["seed"])
+        Faker.seed(options["seed"])
+        self.words = Faker().get_words_list()
+        self.now = timezone.now()
+        # Buckets por hora mas viejos que esto los borraria prune_analytics_task
+        self.hourly_cutoff = self.now - timedelta(days=settings.BLOG_HOURLY_ROLLUP_RETENTION_DAYS)
+        self.rows = Counter()
+        start = time.perf_counter()
+
+        categories = self.create_categories(options["categories"], options["depth"])
+        category_views, category_rollups = self.create_posts(categories, options["posts"])
+        with transaction.atomic():
+            self.insert(CategoryAnalytics, [
+                CategoryAnalytics(category_id=category.id, **self.analytics_counters(category_views[category.id]))
+                for category in categories
+            ])
+            self.insert(CategoryAnalyticsRollup, self.rollups(CategoryAnalyticsRollup, "category_id", category_rollups))
+
+        # Los listados cacheados ya no incluyen todo
+        bump_namespaces(POST_LIST_NAMESPACE, CATEGORY_LIST_NAMESPACE)
+
+        elapsed = time.perf_counter() - start
+        for model, count in self.rows.items():
+            self.stdout.write(f"{model:20} {count:>12,} rows")
+        total = sum(self.rows.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total:,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s, "
+            f"{'COPY' if options['copy'] else 'bulk_create'})"
+        ))
+
+    def sentence(self, words):
+        return " ".join(self.random.choices(self.words, k=words)).capitalize()
+
+    def create_categories(self, total, depth):
+        # Los padres se crean antes que los hijos, asi el path se arma en memoria
+        roots = max(1, round(total ** (1 / depth)))
+        categories = []
+        parents = []
+        for index in range(total):
+            name = self.sentence(2)
+            category = Category(
+                id=uuid.uuid4(),
+                name=name,
+                title=self.sentence(4),
+                description=self.sentence(12),
+                slug=f"{self.prefix}-{index}-{slugify(name)}",
+                created_at=self.now - timedelta(days=self.random.uniform(0, self.options["days"])),
+            )
+            parent, level = (None, 0) if index < roots else self.random.choice(parents)
+            category.parent = parent
+            category.path = f"{parent.path if parent else ''}{category.id.hex}{CATEGORY_PATH_SEPARATOR}"
+            if level + 1 < depth:
+                parents.append((category, level + 1))
+            categories.append(category)
+
+        with transaction.atomic():
+            self.insert(Category, categories, use_copy=False)
+            Category.objects.filter(slug__startswith=f"{self.prefix}-").update(search_vector=category_search_vector())
+        return categories
+
+    def create_posts(self, categories, total):
+        options = self.options
+        category_weights = zipf_weights(len(categories), options["skew"])
+        # Vistas de cada post segun su posicion (al azar) en el ranking de popularidad
+        view_weights = zipf_weights(total, options["skew"])
+        view_scale = options["views"] * total / sum(view_weights)
+        ranks = list(range(total))
+        self.random.shuffle(ranks)
+        category_views = Counter()
+        # Vistas por (categoria, periodo, bucket): las categorias reciben posts de todos los lotes
+        category_rollups = Counter()
+
+        for start in range(0, total, self.chunk_size):
+            posts, analytics, headings, post_views = [], [], [], []
+            post_rollups = Counter()
+            post_categories = self.random.choices(categories, weights=category_weights, k=min(self.chunk_size, total - start))
+            for offset, category in enumerate(post_categories):
+                index = start + offset
+                post, post_headings = self.build_post(index, category)
+                view_count = round(view_weights[ranks[index]] * view_scale)
+                posts.append(post)
+                headings.extend(post_headings)
+                analytics.append(PostAnalytics(post_id=post.id, **self.analytics_counters(view_count)))
+                category_views[category.id] += view_count
+                post_views.append((post, view_count))
+
+            with transaction.atomic():
+                self.insert(Post, posts)
+                self.insert(PostAnalytics, analytics)
+                self.insert(Heading, headings)
+                # Las vistas se generan a medida que se insertan, en lotes de chunk_size
+                views = (
+                    view
+                    for post, view_count in post_views
+                    for view in self.build_views(post, view_count, post_rollups, category_rollups)
+                )
+                for batch in batches(views, self.chunk_size):
+                    self.insert(PostView, batch)
+                self.insert(PostAnalyticsRollup, self.rollups(PostAnalyticsRollup, "post_id", post_rollups))
+                if not options["no_search_vector"]:
+                    Post.objects.filter(pk__in=[post.id for post in posts]).update(search_vector=post_search_vector())
+            self.stdout.write(f"{start + len(posts):,}/{total:,} posts")
+        return category_views, category_rollups
+
+    def build_views(self, post, view_count, post_rollups, category_rollups):
+        """
+        Vistas de `post` con timestamps posteriores a su creacion. Suma cada
+        vista a los buckets de hora y dia del post y de su categoria, como el
+        volcado de los buffers
+        """
+        age = (self.now - post.created_at).total_seconds()
+        for number in range(view_count):
+            timestamp = self.now - timedelta(seconds=self.random.uniform(0, age))
+            for period, bucket in rollup_buckets(timestamp).items():
+                if period == ROLLUP_HOUR and timestamp < self.hourly_cutoff:
+                    continue
+                post_rollups[(post.id, period, bucket)] += 1
+                category_rollups[(post.category_id, period, bucket)] += 1
+            yield PostView(post_id=post.id, ip_address=ip_address(FIRST_IP + number), timestamp=timestamp)
+
+    def rollups(self, model, related_field, views):
+        return [
+            model(**{related_field: object_id}, period=period, bucket=bucket, views=count)
+            for (object_id, period, bucket), count in views.items()
+        ]
+
+    def build_post(self, index, category):
+        title = self.sentence(6)
+        post = Post(
+            id=uuid.uuid4(),
+            title=title,
+            description=self.sentence(12),
+            keywords=", ".join(self.random.choices(self.words, k=5)),
+            slug=f"{self.prefix}-{index}-{slugify(title)}"[:128],
+            category=category,
+            thumbnail=f"blog/{self.prefix}/thumbnail.jpg",
+            status="published" if self.random.random() < self.options["published"] else "draft",
+            created_at=self.now - timedelta(days=self.random.uniform(0, self.options["days"])),
+        )
+        # Contenido con los mismos headings que la tabla Heading
+        headings = []
+        content = [f"<p>{self.sentence(40)}</p>"]
+        used_slugs = set()
+        for order in range(self.random.randint(0, self.options["headings"] * 2)):
+            heading_title = self.sentence(4)
+            level = self.random.choice((2, 2, 3))
+            slug = slugify(heading_title)
+            if slug in used_slugs:
+                slug = f"{slug}-{order}"
+            used_slugs.add(slug)
+            headings.append(Heading(post_id=post.id, title=heading_title, slug=slug, level=level, order=order))
+            content.append(f'<h{level} id="{slug}">{heading_title}</h{level}><p>{self.sentence(60)}</p>')
+        post.content = "".join(content)
+        return post, headings
+
+    def analytics_counters(self, views):
+        impressions = views * self.random.randint(2, 10) + self.random.randint(0, 50)
+        clicks = self.random.randint(0, views)
+        return {
+            "views": views,
+            "impressions": impressions,
+            "clicks": clicks,
+            "click_through_rate": clicks / impressions * 100 if impressions else 0,
+            "avg_time_on_page": round(self.random.uniform(10, 300), 2) if views else 0,
+            "time_on_page_samples": views,
+        }
+
+    def insert(self, model, objects, use_copy=None):
+        if not objects:
+            return
+        if self.options["copy"] if use_copy is None else use_copy:
+            self.copy(model, objects)
+        else:
+            model.objects.bulk_create(objects, batch_size=self.chunk_size)
+        self.rows[model.__name__] += len(objects)
+
+    def copy(self, model, objects):
+        """
+        COPY ... FROM STDIN con las mismas conversiones que usa bulk_create
+        (defaults, auto_now y get_db_prep_save de cada campo)
+        """
+        fields = list(model._meta.local_concrete_fields)
+        buffer = io.StringIO()
+        for obj in objects:
+            buffer.write("\t".join(
+                copy_value(field.get_db_prep_save(field.pre_save(obj, True), connection))
+                for field in fields
+            ))
+            buffer.write("\n")
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN", buffer)
@@ -0,0 +1,60 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def free_slug(Model, slug, index):
+    # Primer "<slug>-<n>" (desde `index`) que no use otra fila, dentro del max_length del campo
+    max_length = Model._meta.get_field("slug").max_length
+    while True:
+        suffix = f"-{index}"
+        candidate = f"{slug[:max_length - len(suffix)]}{suffix}"
+        if not Model.objects.filter(slug=candidate).exists():
+            return candidate, index + 1
+        index += 1
+
+
+def dedupe_slugs(apps, schema_editor):
+    # Sufijar slugs repetidos antes de volverlos unicos
+    for model_name in ("Category", "Post"):
+        Model = apps.get_model("blog", model_name)
+        duplicated = (
+            Model.objects.values("slug")
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .values_list("slug", flat=True)
+        )
+        for slug in list(duplicated):
+            index = 2
+            for obj in Model.objects.filter(slug=slug).order_by("pk")[1:]:
+                # "<slug>-2" puede ser el slug de otra fila: probar el siguiente
+                obj.slug, index = free_slug(Model, slug, index)
+                obj.save(update_fields=["slug"])
+
+
+def dedupe_views(apps, schema_editor):
+    # Conservar solo la primera vista de cada (objeto, ip)
+    for model_name, related_field in (("PostView", "post"), ("CategoryView", "category")):
+        Model = apps.get_model("blog", model_name)
+        duplicated = (
+            Model.objects.values(related_field, "ip_address")
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+        )
+        for row in list(duplicated):
+            views = Model.objects.filter(
+                **{related_field: row[related_field], "ip_address": row["ip_address"]}
+            ).order_by("timestamp")
+            first = views.values_list("id", flat=True).first()
+            views.exclude(id=first).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_categoryview_categoryanalytics'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.RunPython(dedupe_views, migrations.RunPython.noop),
+    ]
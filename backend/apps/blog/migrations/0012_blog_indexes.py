@@ -0,0 +1,47 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_dedupe_slugs_and_views'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.CharField(max_length=128, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='slug',
+            field=models.CharField(max_length=128, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='heading',
+            index=models.Index(fields=['post', 'order'], name='blog_heading_post_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-created_at', '-id'], name='blog_post_pub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['title', 'id'], name='blog_post_pub_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', 'status', '-created_at'], name='blog_post_cat_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoryview',
+            constraint=models.UniqueConstraint(fields=('category', 'ip_address'), name='blog_categoryview_unique_ip'),
+        ),
+        migrations.AddConstraint(
+            model_name='postview',
+            constraint=models.UniqueConstraint(fields=('post', 'ip_address'), name='blog_postview_unique_ip'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:11
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, TextField, Value
+
+
+def backfill_search_vectors(apps, schema_editor):
+    # Copia de los vectores de apps.blog.search al momento de la migracion, para
+    # que cambios posteriores en ese modulo no alteren esta migracion
+    config = settings.BLOG_SEARCH_CONFIG
+    content = Func(
+        F("content"), Value("<[^>]+>"), Value(" "), Value("g"),
+        function="regexp_replace", output_field=TextField(),
+    )
+    apps.get_model("blog", "Post").objects.update(
+        search_vector=SearchVector("title", weight="A", config=config)
+        + SearchVector("keywords", weight="B", config=config)
+        + SearchVector("description", weight="B", config=config)
+        + SearchVector(content, weight="D", config=config)
+    )
+    apps.get_model("blog", "Category").objects.update(
+        search_vector=SearchVector("name", weight="A", config=config)
+        + SearchVector("title", weight="A", config=config)
+        + SearchVector("slug", weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm es opcional (BLOG_SEARCH_TRIGRAM): solo se instala si el servidor lo trae
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS blog_post_title_trgm_idx ON blog_post USING gin (title gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS blog_category_name_trgm_idx ON blog_category USING gin (name gin_trgm_ops)"
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS blog_post_title_trgm_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS blog_category_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_blog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='blog_category_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='blog_post_search_idx'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    # Recorrer el arbol por niveles desde las raices: cada nivel usa el path del anterior
+    Category = apps.get_model("blog", "Category")
+    paths = {}
+    level = list(Category.objects.filter(parent__isnull=True))
+    while level:
+        for category in level:
+            category.path = f"{paths.get(category.parent_id, '')}{category.pk.hex}/"
+            paths[category.pk] = category.path
+        Category.objects.bulk_update(level, ["path"], batch_size=1000)
+        level = list(Category.objects.filter(parent_id__in=[category.pk for category in level]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.TextField(db_collation='C', default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='blog_category_path_idx'),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
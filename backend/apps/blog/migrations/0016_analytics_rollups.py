@@ -0,0 +1,94 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+# Agregar las vistas crudas que ya existen, para que la poda no pierda historia
+BACKFILL_SQL = """
+INSERT INTO {rollup} (id, {column}, period, bucket, views, impressions, clicks)
+SELECT gen_random_uuid(), {column}, %s, date_trunc(%s, timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', count(*), 0, 0
+FROM {views}
+GROUP BY 2, 4
+"""
+
+
+def backfill_rollups(apps, schema_editor):
+    for view_name, rollup_name, column in (
+        ("PostView", "PostAnalyticsRollup", "post_id"),
+        ("CategoryView", "CategoryAnalyticsRollup", "category_id"),
+    ):
+        views = apps.get_model("blog", view_name)._meta.db_table
+        rollup = apps.get_model("blog", rollup_name)._meta.db_table
+        sql = BACKFILL_SQL.format(rollup=rollup, views=views, column=column)
+        with schema_editor.connection.cursor() as cursor:
+            for period in ("hour", "day"):
+                cursor.execute(sql, [period, period])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_category_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryAnalyticsRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostAnalyticsRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='categoryview',
+            index=models.Index(fields=['timestamp'], name='blog_categoryview_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postview',
+            index=models.Index(fields=['timestamp'], name='blog_postview_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='postanalyticsrollup',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_rollups', to='blog.post'),
+        ),
+        migrations.AddField(
+            model_name='categoryanalyticsrollup',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_rollups', to='blog.category'),
+        ),
+        migrations.AddIndex(
+            model_name='postanalyticsrollup',
+            index=models.Index(fields=['period', 'bucket'], name='blog_postrollup_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postanalyticsrollup',
+            constraint=models.UniqueConstraint(fields=('post', 'period', 'bucket'), name='blog_postrollup_unique_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='categoryanalyticsrollup',
+            index=models.Index(fields=['period', 'bucket'], name='blog_catrollup_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoryanalyticsrollup',
+            constraint=models.UniqueConstraint(fields=('category', 'period', 'bucket'), name='blog_catrollup_unique_bucket'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
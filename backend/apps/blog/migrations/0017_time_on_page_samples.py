@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoryanalytics',
+            name='time_on_page_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='time_on_page_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
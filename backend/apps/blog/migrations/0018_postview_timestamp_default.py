@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_time_on_page_samples'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postview',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
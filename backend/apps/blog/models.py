@@ -1,11 +1,29 @@
-from django.db import models
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+from django.db import connections, models
+from django.core.exceptions import ValidationError
+from django.db.models import Case, F, FloatField, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, Substr
+from django.db.models.lookups import GreaterThan
+from django.db.models import sql
 from django.utils import timezone
 import uuid
 from django.utils.text import slugify
 from ckeditor.fields import RichTextField
-from .utils import get_client_ip
-from django.db.models.signals import post_save
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from .headings import extract_headings
+from .search import category_search_vector, post_search_vector
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from .caching import (
+    bump_namespaces,
+    CATEGORY_LIST_NAMESPACE,
+    CATEGORY_POSTS_NAMESPACE,
+    POST_LIST_NAMESPACE,
+    POST_NAMESPACE,
+)
 
 
 
@@ -16,6 +34,325 @@ def blog_thumbnail_directory(instance,filename):
 def category_thumbnail_directory(instance,filename):
     return "blog_categories/{0}/{1}".format(instance.name,filename)
 
+def click_through_rate_expression(clicks=0, impressions=0):
+    new_clicks = F("clicks") + clicks
+    new_impressions = F("impressions") + impressions
+    return Case(
+        When(
+            GreaterThan(new_impressions, 0),
+            then=Cast(new_clicks, FloatField()) * 100.0 / new_impressions,
+        ),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+class AnalyticsQuerySet(models.QuerySet):
+    
+    def increment(self, views=0, impressions=0, clicks=0, returning=()):
+        """
+        Incrementar contadores con un unico UPDATE atomico (clicks = clicks + 1)
+        recalculando el CTR en la misma sentencia. Con `returning` devuelve
+        esos campos de las filas actualizadas (UPDATE ... RETURNING) en lugar
+        de la cantidad, sin otra consulta para leerlos
+        """
+        fields = {}
+        if views:
+            fields["views"] = F("views") + views
+        if impressions:
+            fields["impressions"] = F("impressions") + impressions
+        if clicks:
+            fields["clicks"] = F("clicks") + clicks
+        if impressions or clicks:
+            fields["click_through_rate"] = click_through_rate_expression(clicks, impressions)
+        if not fields:
+            return [] if returning else 0
+        if not returning:
+            return self.update(**fields)
+
+        query = self.query.chain(sql.UpdateQuery)
+        query.add_update_values(fields)
+        update_sql, params = query.get_compiler(self.db).as_sql()
+        connection = connections[self.db]
+        columns = ", ".join(
+            connection.ops.quote_name(self.model._meta.get_field(name).column) for name in returning
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"{update_sql} RETURNING {columns}", params)
+            return cursor.fetchall()
+
+    def bulk_increment(self, related_field, deltas, field="impressions"):
+        """
+        Aplicar un incremento distinto por fila con un solo bulk_update.
+        `deltas` es {id del objeto relacionado: incremento}, p.ej. {post_id: 12}.
+        Las filas de analiticas que falten se crean ya con el incremento aplicado
+        """
+        if not deltas:
+            return 0
+        attname = self.model._meta.get_field(related_field).attname
+        rows = list(self.filter(**{f"{attname}__in": deltas.keys()}).only("pk", attname))
+
+        update_fields = [field]
+        if field in ("impressions", "clicks"):
+            update_fields.append("click_through_rate")
+        for row in rows:
+            delta = deltas[getattr(row, attname)]
+            setattr(row, field, F(field) + delta)
+            if "click_through_rate" in update_fields:
+                row.click_through_rate = click_through_rate_expression(**{field: delta})
+        if rows:
+            self.bulk_update(rows, update_fields, batch_size=len(rows))
+
+        missing = set(deltas) - {getattr(row, attname) for row in rows}
+        if missing:
+            related_model = self.model._meta.get_field(related_field).related_model
+            existing = related_model.objects.filter(pk__in=missing).values_list("pk", flat=True)
+            new_rows = [self.model(**{attname: pk, field: deltas[pk]}) for pk in existing]
+            for row in new_rows:
+                row._update_click_through_rate(save=False)
+            self.bulk_create(new_rows, ignore_conflicts=True)
+            return len(rows) + len(new_rows)
+        return len(rows)
+
+
+    def bulk_add_time_on_page(self, related_field, samples):
+        """
+        Incorporar mediciones de tiempo en pagina a la media de cada fila con
+        un solo bulk_update. `samples` es {id: (segundos totales, mediciones)};
+        la media se pondera por las mediciones ya promediadas
+        """
+        if not samples:
+            return 0
+        attname = self.model._meta.get_field(related_field).attname
+        rows = list(self.filter(**{f"{attname}__in": samples.keys()}).only("pk", attname))
+
+        for row in rows:
+            total, count = samples[getattr(row, attname)]
+            # Los dos SET leen los valores previos de la fila
+            row.avg_time_on_page = (
+                (F("avg_time_on_page") * F("time_on_page_samples") + total)
+                / (F("time_on_page_samples") + count)
+            )
+            row.time_on_page_samples = F("time_on_page_samples") + count
+        if rows:
+            self.bulk_update(rows, ["avg_time_on_page", "time_on_page_samples"], batch_size=len(rows))
+
+        missing = set(samples) - {getattr(row, attname) for row in rows}
+        if missing:
+            related_model = self.model._meta.get_field(related_field).related_model
+            existing = related_model.objects.filter(pk__in=missing).values_list("pk", flat=True)
+            new_rows = [
+                self.model(**{
+                    attname: pk,
+                    "avg_time_on_page": samples[pk][0] / samples[pk][1],
+                    "time_on_page_samples": samples[pk][1],
+                })
+                for pk in existing
+            ]
+            self.bulk_create(new_rows, ignore_conflicts=True)
+            return len(rows) + len(new_rows)
+        return len(rows)
+
+
+class ViewQuerySet(models.QuerySet):
+    
+    def record(self, related_field, pairs, batch_size=5000):
+        """
+        Guardar vistas (id del objeto, ip) con INSERT ... ON CONFLICT DO NOTHING
+        sobre la restriccion unica (objeto, ip). Devuelve un Counter
+        {id del objeto: vistas nuevas}, sin consultar antes las existentes
+        """
+        inserted = Counter()
+        pairs = list(pairs)
+        if not pairs:
+            return inserted
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        column = quote(self.model._meta.get_field(related_field).column)
+        now = timezone.now()
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(pairs), batch_size):
+                chunk = pairs[start:start + batch_size]
+                values = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+                params = []
+                for object_id, ip_address in chunk:
+                    params.extend([uuid.uuid4(), object_id, ip_address, now])
+                cursor.execute(
+                    f"INSERT INTO {table} (id, {column}, ip_address, timestamp) VALUES {values} "
+                    f"ON CONFLICT ({column}, ip_address) DO NOTHING RETURNING {column}",
+                    params,
+                )
+                inserted.update(row[0] for row in cursor.fetchall())
+        return inserted
+
+
+ROLLUP_HOUR = "hour"
+ROLLUP_DAY = "day"
+ROLLUP_METRICS = ("views", "impressions", "clicks")
+
+
+def rollup_buckets(at):
+    """
+    Inicio (UTC) de los buckets de hora y dia que contienen `at`
+    """
+    hour = at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return {ROLLUP_HOUR: hour, ROLLUP_DAY: hour.replace(hour=0)}
+
+
+class RollupQuerySet(models.QuerySet):
+    
+    def add(self, related_field, deltas, field="views", at=None, batch_size=1000):
+        """
+        Sumar {id del objeto: n} a `field` en los buckets de hora y dia de `at`
+        con INSERT ... ON CONFLICT DO UPDATE, una sentencia por lote de objetos.
+        Los objetos que ya no existen se descartan en la misma consulta
+        """
+        deltas = [(object_id, delta) for object_id, delta in deltas.items() if delta]
+        if not deltas:
+            return 0
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        related = self.model._meta.get_field(related_field)
+        column = quote(related.column)
+        related_table = quote(related.related_model._meta.db_table)
+        related_pk = quote(related.target_field.column)
+        counters = ", ".join("v.delta" if name == field else "0" for name in ROLLUP_METRICS)
+        field = quote(field)
+        row_sql = f"(%s::uuid, %s::{related.db_type(connection)}, %s, %s::timestamptz, %s::integer)"
+        buckets = rollup_buckets(at or timezone.now())
+
+        updated = 0
+        with connection.cursor() as cursor:
+            for start in range(0, len(deltas), batch_size):
+                params = []
+                for object_id, delta in deltas[start:start + batch_size]:
+                    for period, bucket in buckets.items():
+                        params.extend([uuid.uuid4(), object_id, period, bucket, delta])
+                values = ", ".join([row_sql] * (len(params) // 5))
+                cursor.execute(
+                    f"INSERT INTO {table} (id, {column}, period, bucket, views, impressions, clicks) "
+                    f"SELECT v.id, v.object_id, v.period, v.bucket, {counters} "
+                    f"FROM (VALUES {values}) AS v (id, object_id, period, bucket, delta) "
+                    f"WHERE EXISTS (SELECT 1 FROM {related_table} r WHERE r.{related_pk} = v.object_id) "
+                    f"ON CONFLICT ({column}, period, bucket) DO UPDATE SET {field} = {table}.{field} + EXCLUDED.{field}",
+                    params,
+                )
+                updated += cursor.rowcount // len(buckets)
+        return updated
+
+    def series(self, related_field, object_id, period, since, until):
+        """
+        Serie densa [{bucket, views, impressions, clicks}] entre `since` y
+        `until` (buckets alineados), con ceros en los buckets sin actividad
+        """
+        step = timedelta(hours=1) if period == ROLLUP_HOUR else timedelta(days=1)
+        start = rollup_buckets(since)[period]
+        rows = {
+            row["bucket"]: row
+            for row in self.filter(**{related_field: object_id}, period=period, bucket__gte=start, bucket__lte=until)
+            .values("bucket", "views", "impressions", "clicks")
+        }
+        series = []
+        bucket = start
+        while bucket <= until:
+            row = rows.get(bucket)
+            series.append({
+                "bucket": bucket,
+                "views": row["views"] if row else 0,
+                "impressions": row["impressions"] if row else 0,
+                "clicks": row["clicks"] if row else 0,
+            })
+            bucket += step
+        return series
+
+
+class AnalyticsCounters(models.Model):
+    
+    views=models.PositiveIntegerField(default=0)
+    impressions=models.PositiveIntegerField(default=0)
+    clicks=models.PositiveIntegerField(default=0)
+    click_through_rate=models.FloatField(default=0)
+    avg_time_on_page=models.FloatField(default=0)
+    # Cantidad de mediciones que promedia avg_time_on_page
+    time_on_page_samples=models.PositiveIntegerField(default=0)
+    
+    objects = AnalyticsQuerySet.as_manager()
+    
+    class Meta:
+        abstract = True
+    
+    def _update_click_through_rate(self, save=True):
+        if self.impressions > 0:
+            self.click_through_rate = (self.clicks / self.impressions) * 100
+        else:
+            self.click_through_rate = 0
+        if save:
+            self.save(update_fields=["click_through_rate"])
+    
+    def increment(self, refresh=True, **deltas):
+        # Con refresh los valores nuevos vuelven en el mismo UPDATE (RETURNING)
+        queryset = type(self).objects.filter(pk=self.pk)
+        if not refresh:
+            queryset.increment(**deltas)
+            return
+        fields = [*deltas, "click_through_rate"]
+        rows = queryset.increment(returning=fields, **deltas)
+        if rows:
+            for name, value in zip(fields, rows[0]):
+                setattr(self, name, value)
+    
+    def increment_clicks(self):
+        self.increment(clicks=1)
+    
+    def increment_impressions(self):
+        self.increment(impressions=1)
+
+
+# Cada nivel del path es el id en hex seguido de "/". Todos esos caracteres
+# son menores que "~", asi que el subarbol de un path P es el rango [P, P~)
+CATEGORY_PATH_SEPARATOR = "/"
+CATEGORY_PATH_END = "~"
+
+
+def category_path_ids(path):
+    return [uuid.UUID(part) for part in path.split(CATEGORY_PATH_SEPARATOR) if part]
+
+
+class CategoryQuerySet(models.QuerySet):
+
+    def subtree(self, slug=None):
+        """
+        La categoria `slug` y todos sus descendientes (o todo el arbol) en una
+        sola consulta por rango sobre el indice del path, ordenados de modo
+        que cada padre aparece antes que sus hijos
+        """
+        queryset = self
+        if slug is not None:
+            queryset = queryset.filter(subtree_condition(slug))
+        return queryset.order_by("path")
+
+    def ancestor_slugs(self, *paths):
+        # Slugs de las categorias que aparecen en los paths (cada una y sus ancestros)
+        ids = {pk for path in paths if path for pk in category_path_ids(path)}
+        return self.filter(pk__in=ids).values_list("slug", flat=True) if ids else []
+
+
+def subtree_condition(slug):
+    """
+    Condicion para el subarbol de la categoria `slug`. El path de la raiz se
+    resuelve en la misma consulta con un subquery y el rango usa el indice
+    blog_category_path_idx
+    """
+    root_path = Subquery(Category.objects.filter(slug=slug).values("path")[:1])
+    return Q(
+        path__gte=root_path,
+        path__lt=Concat(root_path, Value(CATEGORY_PATH_END), output_field=models.TextField()),
+    )
+
+
 class Category(models.Model):
     
     id=models.UUIDField(primary_key=True,default=uuid.uuid4, editable=False)
@@ -25,68 +362,111 @@ class Category(models.Model):
     title=models.CharField(max_length=255,blank=True,null=True)
     description=models.TextField(blank=True,null=True)
     thumbnail = models.ImageField(upload_to=category_thumbnail_directory,blank=True,null=True)
-    slug= models.CharField(max_length=128)
+    slug= models.CharField(max_length=128,unique=True)
+    
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    # Path materializado con los ids de los ancestros y el propio, lo mantienen los signals.
+    # Collation "C" para que el indice sirva a las busquedas por prefijo y por rango
+    path = models.TextField(default="", editable=False, db_collation="C")
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CategoryQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="blog_category_search_idx"),
+            models.Index(fields=["path"], name="blog_category_path_idx"),
+            # Modos de sorting/ordering de CategoryListView
+            models.Index(fields=["-created_at", "id"], name="blog_category_created_idx"),
+            models.Index(fields=["-updated_at", "id"], name="blog_category_updated_idx"),
+            models.Index(fields=["name", "id"], name="blog_category_name_idx"),
+        ]
     
     def __str__(self):
         return self.name
 
+    def clean(self):
+        # En clean() y no en el signal: el admin y los ModelForm la muestran como error del campo
+        super().clean()
+        if self.parent_id is None or self._state.adding:
+            return
+        paths = dict(Category.objects.filter(pk__in=[self.pk, self.parent_id]).values_list("pk", "path"))
+        path, parent_path = paths.get(self.pk), paths.get(self.parent_id) or ""
+        if path and parent_path.startswith(path):
+            raise ValidationError({"parent": "A category cannot be moved under itself or its descendants"})
+
 
 class CategoryView(models.Model):
     id=models.UUIDField(primary_key=True,default=uuid.uuid4, editable=False)
     category=models.ForeignKey(Category, on_delete=models.CASCADE,related_name='blog_category_view')
     ip_address=models.GenericIPAddressField()
     timestamp=models.DateTimeField(auto_now_add=True)
+    
+    objects = ViewQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["category", "ip_address"], name="blog_categoryview_unique_ip"),
+        ]
+        indexes = [
+            # Poda de vistas crudas ya agregadas
+            models.Index(fields=["timestamp"], name="blog_categoryview_ts_idx"),
+        ]
  
 
 
-class CategoryAnalytics(models.Model):
+class CategoryAnalytics(AnalyticsCounters):
     
     
     id=models.UUIDField(primary_key=True,default=uuid.uuid4, editable=False)
     category=models.OneToOneField(Category, on_delete=models.CASCADE,related_name='category_analytics')
     
-    views=models.PositiveIntegerField(default=0)
-    impressions=models.PositiveIntegerField(default=0)
-    clicks=models.PositiveIntegerField(default=0)
-    click_through_rate=models.FloatField(default=0)
-    avg_time_on_page=models.FloatField(default=0)
-    
-    def _update_click_through_rate(self):
-        if self.impressions > 0:
-            self.click_through_rate = (self.clicks / self.impressions) * 100
-        else:
-            self.click_through_rate = 0
-        self.save()
-    
-    def increment_clicks(self):
-        self.clicks += 1
-        self.save()
-        self._update_click_through_rate()
-
-    
-    def increment_impressions(self):
-        self.impressions += 1
-        self.save()
-        self._update_click_through_rate()
-        
+    class Meta:
+        indexes = [
+            # sorting=most_viewed de CategoryListView
+            models.Index(fields=["-views"], name="blog_catanalytics_views_idx"),
+        ]
         
     def increment_view(self,ip_address):
-        if not CategoryView.objects.filter(category=self.category,ip_address=ip_address).exists():
-            CategoryView.objects.create(category=self.category,ip_address=ip_address)
-            
-            self.views += 1
-            self.save()
+        with transaction.atomic():
+            if CategoryView.objects.record("category", [(self.category_id, ip_address)]):
+                self.increment(views=1)
+                CategoryAnalyticsRollup.objects.add("category", {self.category_id: 1})
+
 
 
 
 
 
+# Columnas que emite PostListSerializer (mas created_at, que usa la paginacion por keyset)
+POST_LIST_FIELDS = (
+    "id", "title", "description", "thumbnail", "slug", "created_at", "category",
+    "category__id", "category__name", "category__title", "category__description",
+    "category__thumbnail", "category__slug", "category__parent",
+)
+
 
 class Post(models.Model):
     
     class PostObjects(models.Manager):
         def get_queryset(self):
             return super().get_queryset().filter(status='published')    
+        
+        def for_list(self):
+            """
+            Posts listos para PostListSerializer en una sola consulta: categoria
+            con select_related, solo las columnas que se serializan y view_count
+            anotado en SQL
+            """
+            return (
+                self.get_queryset()
+                .select_related("category")
+                .only(*POST_LIST_FIELDS)
+                .annotate(view_count=Coalesce(F("post_analytics__views"), 0))
+            )
     
     status_options=(
         ("draft","Draft"),
@@ -100,7 +480,7 @@ class Post(models.Model):
     thumbnail = models.ImageField(upload_to=blog_thumbnail_directory)
     
     keywords = models.CharField(max_length=128)
-    slug = models.CharField(max_length=128)
+    slug = models.CharField(max_length=128,unique=True)
     
     category=models.ForeignKey(Category, on_delete=models.CASCADE)
     
@@ -111,11 +491,20 @@ class Post(models.Model):
     
     status = models.CharField(max_length=10, choices=status_options,default='draft')
     
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     objects = models.Manager()
     postobjects = PostObjects()
     
     class Meta:
         ordering = ("status", "-created_at")
+        indexes = [
+            # Listados publicados (PostObjects) ordenados por fecha o titulo, con id para el keyset
+            models.Index(fields=["-created_at", "-id"], name="blog_post_pub_created_idx", condition=Q(status="published")),
+            models.Index(fields=["title", "id"], name="blog_post_pub_title_idx", condition=Q(status="published")),
+            models.Index(fields=["category", "status", "-created_at"], name="blog_post_cat_created_idx"),
+            GinIndex(fields=["search_vector"], name="blog_post_search_idx"),
+        ]
     
     def __str__(self):
         return self.title
@@ -127,47 +516,84 @@ class PostView(models.Model):
     id=models.UUIDField(primary_key=True,default=uuid.uuid4, editable=False)
     post=models.ForeignKey(Post, on_delete=models.CASCADE,related_name='post_view')
     ip_address=models.GenericIPAddressField()
-    timestamp=models.DateTimeField(auto_now_add=True)
+    # default en lugar de auto_now_add: bulk_create respeta un timestamp explicito (seed_blog)
+    timestamp=models.DateTimeField(default=timezone.now)
+    
+    objects = ViewQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "ip_address"], name="blog_postview_unique_ip"),
+        ]
+        indexes = [
+            models.Index(fields=["timestamp"], name="blog_postview_ts_idx"),
+        ]
  
-class PostAnalytics(models.Model):
+class PostAnalytics(AnalyticsCounters):
     
     
     id=models.UUIDField(primary_key=True,default=uuid.uuid4, editable=False)
     post=models.OneToOneField(Post, on_delete=models.CASCADE,related_name='post_analytics')
+        
+    def increment_view(self,ip_address):
+        with transaction.atomic():
+            if PostView.objects.record("post", [(self.post_id, ip_address)]):
+                self.increment(views=1)
+                PostAnalyticsRollup.objects.add("post", {self.post_id: 1})
+        
+    
+class AnalyticsRollup(models.Model):
+    """
+    Contadores agregados por bucket de hora o dia. Se llenan al volcar los
+    buffers de redis, asi las series no dependen de las filas crudas de vistas
+    """
     
+    period_options = (
+        (ROLLUP_HOUR, "Hour"),
+        (ROLLUP_DAY, "Day"),
+    )
+    
+    id=models.UUIDField(primary_key=True,default=uuid.uuid4, editable=False)
+    period=models.CharField(max_length=4, choices=period_options)
+    bucket=models.DateTimeField()
     views=models.PositiveIntegerField(default=0)
     impressions=models.PositiveIntegerField(default=0)
     clicks=models.PositiveIntegerField(default=0)
-    click_through_rate=models.FloatField(default=0)
-    avg_time_on_page=models.FloatField(default=0)
     
-    def _update_click_through_rate(self):
-        if self.impressions > 0:
-            self.click_through_rate = (self.clicks / self.impressions) * 100
-        else:
-            self.click_through_rate = 0
-        self.save()
+    objects = RollupQuerySet.as_manager()
     
-    def increment_clicks(self):
-        self.clicks += 1
-        self.save()
-        self._update_click_through_rate()
+    class Meta:
+        abstract = True
 
+
+class PostAnalyticsRollup(AnalyticsRollup):
     
-    def increment_impressions(self):
-        self.impressions += 1
-        self.save()
-        self._update_click_through_rate()
-        
-        
-    def increment_view(self,ip_address):
-        if not PostView.objects.filter(post=self.post,ip_address=ip_address).exists():
-            PostView.objects.create(post=self.post,ip_address=ip_address)
-            
-            self.views += 1
-            self.save()
-        
+    post=models.ForeignKey(Post, on_delete=models.CASCADE,related_name='analytics_rollups')
     
+    class Meta:
+        constraints = [
+            # Tambien es el indice de las series (post, periodo, rango de buckets)
+            models.UniqueConstraint(fields=["post", "period", "bucket"], name="blog_postrollup_unique_bucket"),
+        ]
+        indexes = [
+            # Poda de buckets por hora viejos
+            models.Index(fields=["period", "bucket"], name="blog_postrollup_bucket_idx"),
+        ]
+
+
+class CategoryAnalyticsRollup(AnalyticsRollup):
+    
+    category=models.ForeignKey(Category, on_delete=models.CASCADE,related_name='analytics_rollups')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["category", "period", "bucket"], name="blog_catrollup_unique_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["period", "bucket"], name="blog_catrollup_bucket_idx"),
+        ]
+
+
 class Heading(models.Model):
     
     id=models.UUIDField(primary_key=True,default=uuid.uuid4, editable=False)
@@ -189,6 +615,9 @@ class Heading(models.Model):
     
     class Meta:
         ordering=["order"]
+        indexes = [
+            models.Index(fields=["post", "order"], name="blog_heading_post_order_idx"),
+        ]
         
     def save(self,*args,**kwargs):
         if not self.slug:
@@ -206,4 +635,118 @@ def create_post_analytics(sender,instance,created,**kwargs):
 def create_category_analytics(sender,instance,created,**kwargs):
     if created:
         CategoryAnalytics.objects.create(category=instance)
-    
\ No newline at end of file
+
+
+# El search_vector se calcula en SQL con un UPDATE (no dispara signals)
+@receiver(post_save,sender=Post)
+def update_post_search_vector(sender,instance,**kwargs):
+    Post.objects.filter(pk=instance.pk).update(search_vector=post_search_vector())
+
+@receiver(post_save,sender=Category)
+def update_category_search_vector(sender,instance,**kwargs):
+    Category.objects.filter(pk=instance.pk).update(search_vector=category_search_vector())
+
+
+
+@receiver(pre_save,sender=Category)
+def update_category_path(sender,instance,**kwargs):
+    # Calcular el path desde el del padre y recordar el anterior para mover los descendientes
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "parent" not in update_fields:
+        return
+    instance._previous_path = Category.objects.filter(pk=instance.pk).values_list("path", flat=True).first()
+    parent_path = ""
+    if instance.parent_id:
+        parent_path = Category.objects.filter(pk=instance.parent_id).values_list("path", flat=True).first() or ""
+    instance.path = f"{parent_path}{instance.pk.hex}{CATEGORY_PATH_SEPARATOR}"
+
+@receiver(post_save,sender=Category)
+def move_category_descendants(sender,instance,update_fields=None,**kwargs):
+    previous = getattr(instance, "_previous_path", None)
+    if previous == instance.path:
+        return
+    if update_fields is not None and "path" not in update_fields:
+        Category.objects.filter(pk=instance.pk).update(path=instance.path)
+    # Reescribir el prefijo de todo el subarbol en un solo UPDATE
+    if previous:
+        Category.objects.filter(path__startswith=previous).exclude(pk=instance.pk).update(
+            path=Concat(Value(instance.path), Substr("path", len(previous) + 1), output_field=models.TextField())
+        )
+
+
+@receiver(pre_save,sender=Post)
+def add_heading_anchors(sender,instance,update_fields=None,**kwargs):
+    # Completar los ids de los headings del contenido y guardar la tabla de contenidos para post_save
+    if update_fields is not None and "content" not in update_fields:
+        return
+    instance.content, instance._headings = extract_headings(instance.content)
+
+@receiver(post_save,sender=Post)
+def sync_post_headings(sender,instance,update_fields=None,**kwargs):
+    headings = getattr(instance, "_headings", None)
+    if headings is None:
+        return
+    del instance._headings
+    rows = [(heading["title"], heading["slug"], heading["level"], heading["order"]) for heading in headings]
+    if list(Heading.objects.filter(post=instance).values_list("title", "slug", "level", "order")) == rows:
+        return
+    # Reemplazar los headings del post: un DELETE y un solo INSERT
+    Heading.objects.filter(post=instance).delete()
+    Heading.objects.bulk_create([Heading(post=instance, **heading) for heading in headings])
+
+
+def _bump_on_commit(namespaces):
+    # Invalidar despues del commit para que nadie vuelva a cachear datos viejos
+    transaction.on_commit(lambda: bump_namespaces(*namespaces))
+
+
+@receiver(pre_save,sender=Post)
+def remember_post_cache_scope(sender,instance,**kwargs):
+    # Guardar slug y categoria anteriores para invalidar tambien sus caches
+    instance._previous_cache_scope = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list("slug", "category__path")
+        .first()
+    )
+
+
+@receiver(post_save,sender=Post)
+@receiver(post_delete,sender=Post)
+def invalidate_post_caches(sender,instance,**kwargs):
+    scopes = {(instance.slug, Category.objects.filter(pk=instance.category_id).values_list("path", flat=True).first())}
+    previous = getattr(instance, "_previous_cache_scope", None)
+    if previous:
+        scopes.add(previous)
+
+    # Los posts de una categoria incluyen los de sus descendientes: invalidar tambien los ancestros
+    namespaces = [POST_LIST_NAMESPACE]
+    namespaces += [POST_NAMESPACE.format(post_slug) for post_slug, _ in scopes]
+    namespaces += [
+        CATEGORY_POSTS_NAMESPACE.format(slug)
+        for slug in Category.objects.ancestor_slugs(*(path for _, path in scopes))
+    ]
+    _bump_on_commit(namespaces)
+
+
+@receiver(post_save,sender=Category)
+@receiver(post_delete,sender=Category)
+def invalidate_category_caches(sender,instance,**kwargs):
+    # Los detalles de los posts dependen de CATEGORY_LIST_NAMESPACE (post_detail_key):
+    # no hace falta invalidarlos uno por uno. Los listados de los ancestros se
+    # invalidan antes y despues de moverla
+    ancestor_slugs = Category.objects.ancestor_slugs(instance.path, getattr(instance, "_previous_path", None))
+    _bump_on_commit([
+        POST_LIST_NAMESPACE,
+        CATEGORY_LIST_NAMESPACE,
+        CATEGORY_POSTS_NAMESPACE.format(instance.slug),
+        *(CATEGORY_POSTS_NAMESPACE.format(slug) for slug in ancestor_slugs),
+    ])
+
+
+# Sin post_delete: los headings se borran con el post (el inline del admin guarda
+# el post, que invalida su namespace) y asi su delete() es un solo DELETE
+@receiver(post_save,sender=Heading)
+def invalidate_heading_caches(sender,instance,**kwargs):
+    post_slug = Post.objects.filter(pk=instance.post_id).values_list("slug", flat=True).first()
+    if post_slug:
+        _bump_on_commit([POST_NAMESPACE.format(post_slug)])
@@ -0,0 +1,165 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PostPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Con ?count=false se evita el COUNT(*): se pide una fila de mas para
+        saber si hay pagina siguiente y la respuesta devuelve count null
+        """
+        self.skip_count = request.query_params.get(self.count_query_param) == "false"
+        if not self.skip_count:
+            return super().paginate_queryset(queryset, request, view=view)
+        page_size = self._start_without_count(request)
+        return self._rows_without_count(list(self._window(queryset, page_size)), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset con el ORM async (vistas ASGI): mismas validaciones,
+        mensajes y atributos para get_paginated_response
+        """
+        self.skip_count = request.query_params.get(self.count_query_param) == "false"
+        if self.skip_count:
+            page_size = self._start_without_count(request)
+            return self._rows_without_count([row async for row in self._window(queryset, page_size)], page_size)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count es un cached_property: se completa antes con la consulta async
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        return list(self.page)
+
+    def _start_without_count(self, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=self.page_number, message="Invalid page."))
+        return page_size
+
+    def _window(self, queryset, page_size):
+        offset = (self.page_number - 1) * page_size
+        return queryset[offset:offset + page_size + 1]
+
+    def _rows_without_count(self, rows, page_size):
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.skip_count:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self._page_link(self.page_number + 1) if self.has_next else None),
+            ('previous', self._page_link(self.page_number - 1) if self.page_number > 1 else None),
+            ('results', data),
+        ]))
+
+    def _page_link(self, page_number):
+        url = self.request.build_absolute_uri()
+        if page_number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, page_number)
+
+
+class PostCursorPagination(BasePagination):
+    """
+    Paginacion por keyset sobre (campo de orden, id): cada pagina filtra con
+    WHERE (campo, id) < (ultimo valor, ultimo id) en lugar de OFFSET, asi que
+    cualquier pagina cuesta lo mismo que la primera y nunca se hace COUNT(*).
+    Solo avanza hacia adelante mediante el link `next`.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, ordering="-created_at"):
+        queryset, page_size = self._page_queryset(queryset, request, ordering)
+        return self._page_rows(list(queryset), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None, ordering="-created_at"):
+        # Misma pagina con el ORM async (vistas ASGI)
+        queryset, page_size = self._page_queryset(queryset, request, ordering)
+        return self._page_rows([row async for row in queryset], page_size)
+
+    def _page_queryset(self, queryset, request, ordering):
+        self.request = request
+        self.is_first_page = self.cursor_query_param not in request.query_params
+        descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+        lookup = "lt" if descending else "gt"
+
+        if not self.is_first_page:
+            value, pk = self.decode_cursor(queryset.model, request.query_params[self.cursor_query_param])
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{lookup}": value}) | Q(**{self.field: value, f"id__{lookup}": pk})
+            )
+
+        page_size = self.get_page_size(request)
+        order_by = [f"-{self.field}", "-id"] if descending else [self.field, "id"]
+        return queryset.order_by(*order_by)[:page_size + 1], page_size
+
+    def _page_rows(self, rows, page_size):
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode_cursor(getattr(rows[-1], self.field), rows[-1].id)
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, value, pk):
+        raw = json.dumps([value.isoformat() if hasattr(value, "isoformat") else value, str(pk)])
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, model, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return model._meta.get_field(self.field).to_python(value), model._meta.pk.to_python(pk)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .consumers import AnalyticsDashboardConsumer
+
+
+websocket_urlpatterns = [
+    path('ws/blog/analytics/', AnalyticsDashboardConsumer.as_asgi(), name="analytics-dashboard"),
+]
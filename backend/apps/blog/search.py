@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Func, Q, TextField, Value
+
+
+def strip_html(expression):
+    # Quitar las etiquetas del HTML de CKEditor en SQL, sin traer el contenido a Python
+    return Func(
+        expression, Value("<[^>]+>"), Value(" "), Value("g"),
+        function="regexp_replace", output_field=TextField(),
+    )
+
+
+def post_search_vector():
+    config = settings.BLOG_SEARCH_CONFIG
+    return (
+        SearchVector("title", weight="A", config=config)
+        + SearchVector("keywords", weight="B", config=config)
+        + SearchVector("description", weight="B", config=config)
+        + SearchVector(strip_html(F("content")), weight="D", config=config)
+    )
+
+
+def category_search_vector():
+    config = settings.BLOG_SEARCH_CONFIG
+    return (
+        SearchVector("name", weight="A", config=config)
+        + SearchVector("title", weight="A", config=config)
+        + SearchVector("slug", weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+def _search(queryset, text, trigram_field):
+    """
+    Filtrar por el search_vector (indice GIN) y anotar `rank`. Con
+    BLOG_SEARCH_TRIGRAM activo tambien matchean titulos parecidos, para
+    tolerar errores de tipeo (requiere la extension pg_trgm)
+    """
+    query = SearchQuery(text, search_type="websearch", config=settings.BLOG_SEARCH_CONFIG)
+    rank = SearchRank(F("search_vector"), query)
+    condition = Q(search_vector=query)
+    if settings.BLOG_SEARCH_TRIGRAM:
+        condition |= Q(**{f"{trigram_field}__trigram_similar": text})
+        rank = rank + TrigramSimilarity(trigram_field, text)
+    return queryset.filter(condition).annotate(rank=rank)
+
+
+def search_posts(queryset, text):
+    return _search(queryset, text, "title")
+
+
+def search_categories(queryset, text):
+    return _search(queryset, text, "name")
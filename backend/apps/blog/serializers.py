@@ -1,13 +1,25 @@
 from rest_framework import serializers
+from django.core.exceptions import ObjectDoesNotExist
 from .models import Post,Category,Heading,PostView
 
 
+def get_view_count(post):
+    # Preferir el view_count anotado en SQL para no consultar las analiticas por fila
+    view_count = getattr(post, "view_count", None)
+    if view_count is not None:
+        return view_count
+    try:
+        return post.post_analytics.views
+    except ObjectDoesNotExist:
+        return 0
+
+
 
 class CategorySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Category
-        fields = "__all__"
+        exclude = ["search_vector", "path", "created_at", "updated_at"]
 
 class CategoryListSerializer(serializers.ModelSerializer):
     
@@ -48,10 +60,10 @@ class PostSerializer(serializers.ModelSerializer):
     
     class Meta:
         model=Post
-        fields= "__all__"
+        exclude= ["search_vector"]
     
     def get_view_count(self,obj):
-        return obj.post_analytics.views if obj.post_analytics else 0
+        return get_view_count(obj)
  
 class PostListSerializer(serializers.ModelSerializer):
     category=CategorySerializer()
@@ -70,7 +82,7 @@ class PostListSerializer(serializers.ModelSerializer):
             "view_count"
         ]
     def get_view_count(self,obj):
-        return obj.post_analytics.views if obj.post_analytics else 0
+        return get_view_count(obj)
         
 
 
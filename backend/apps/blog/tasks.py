@@ -1,15 +1,60 @@
+from asgiref.sync import async_to_sync, sync_to_async
 from celery  import shared_task
-import redis
+from channels.layers import get_channel_layer
+from redis.exceptions import LockError
 import logging
+import time
 
-from .models import PostAnalytics,Post,CategoryAnalytics,Category
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import (
+    PostAnalytics,
+    PostAnalyticsRollup,
+    Post,
+    PostView,
+    CategoryAnalytics,
+    CategoryAnalyticsRollup,
+    CategoryView,
+    Heading,
+    ROLLUP_HOUR,
+)
+from .buffers import (
+    crossed_flush_threshold,
+    drain_counters,
+    drain_live_deltas,
+    drain_post_views,
+    drain_time_on_page,
+    pending_events,
+    record_pending_keys,
+    record_post_view,
+    restore_counters,
+    restore_post_views,
+    restore_time_on_page,
+    CATEGORY_CLICKS_KEY,
+    CATEGORY_IMPRESSIONS_KEY,
+    PENDING_EVENTS_KEY,
+    POST_CLICKS_KEY,
+    POST_IMPRESSIONS_KEY,
+    SYNC_LOCK_KEY,
+    SYNC_METRICS_KEY,
+)
+from .caching import post_detail_key, post_headings_key, rebuild_lock_key, store
+from .consumers import ANALYTICS_DASHBOARD_GROUP
+from .fast_serializers import heading_serializer
+from .serializers import PostSerializer
+from .utils import valid_ip_address
 from django.conf import settings
+from django.core.cache import cache
+from core.instrumentation import timed
+from core.metrics import BATCH_SIZE_BUCKETS, inc, observe
+from core.redis_client import get_redis
 logger = logging.getLogger(__name__)
 
-redis_client=redis.Redis(host=settings.REDIS_HOST,port=6379,db=0)
 
-
-@shared_task
+@shared_task(ignore_result=True)
 def increment_post_impressions(post_id):
     try:
         analytics,created=PostAnalytics.objects.get_or_create(post__id=post_id)
@@ -18,93 +63,290 @@ def increment_post_impressions(post_id):
         logger.warning(f"error incrementing impressions for post ID {post_id}:{str(e)}")
 
 
-@shared_task
-def increment_post_views_task(slug, ip_address):
+def post_detail_queryset():
+    return (
+        Post.postobjects.select_related("category")
+        .defer("search_vector", "category__search_vector", "category__path", "category__created_at", "category__updated_at")
+        .annotate(view_count=Coalesce(F("post_analytics__views"), 0))
+        .prefetch_related(Prefetch("headings", queryset=Heading.objects.only("post_id", "title", "slug", "level", "order")))
+    )
+
+
+def build_post_detail(slug):
+    post = post_detail_queryset().get(slug=slug)
+    with timed("serialize"):
+        data = PostSerializer(post).data
+    # El detalle ya trae la tabla de contenidos: dejarla cacheada para el endpoint de headings
+    store(post_headings_key(slug), data["headings"])
+    return data
+
+
+def build_post_headings(slug):
+    return heading_serializer.serialize(heading_serializer.values(Heading.objects.filter(post__slug=slug)))
+
+
+@shared_task(ignore_result=True)
+def refresh_post_detail_cache_task(slug):
+    """
+    Recalcular en segundo plano el detalle cacheado de un post vencido
+    """
+    key = post_detail_key(slug)
     try:
-        post = Post.objects.get(slug=slug)
-        post_analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        post_analytics.increment_view(ip_address)
-    except Exception as e:
-        logger.info(f"error incrementing views for post slug {slug}:{str(e)}")
+        store(key, build_post_detail(slug))
+    except Post.DoesNotExist:
+        cache.delete(key)
+    finally:
+        cache.delete(rebuild_lock_key(key))
 
 
-@shared_task
-def sync_impressions_to_db():
+@shared_task(ignore_result=True)
+def increment_post_views_task(slug, ip_address):
+    # Mensajes encolados antes de que las vistas pasaran por el buffer de
+    # redis: se suman al buffer y las vuelca el mismo flush por lotes
+    post_id = Post.objects.filter(slug=slug).values_list("id", flat=True).first()
+    if post_id is None:
+        logger.warning(f"error incrementing views for post slug {slug}: post does not exist")
+        return
+    dispatch_flush(record_post_view(get_redis(), post_id, ip_address))
+
+
+@shared_task(ignore_result=True)
+def flush_post_views_task(batch_size=None):
     """
-    Sincronizar las impresiones almacenadas en redis con la base de datos
+    Volcar las vistas acumuladas en redis a PostView y PostAnalytics por lotes
     """
-    keys = redis_client.keys("post:impressions:*")
-    for key in keys:
+    batch_size = batch_size or settings.BLOG_SYNC_BATCH_SIZE
+    flushed = 0
+    for pending in drain_post_views(get_redis(), batch_size=batch_size):
+        observe("blog_sync_batch_size", len(pending), {"buffer": "post_views"}, BATCH_SIZE_BUCKETS)
         try:
-            post_id = key.decode("utf-8").split(":")[-1]
-
-            # Validar que el post existe
-            try:
-                post = Post.objects.get(id=post_id)
-            except Post.DoesNotExist:
-                logger.info(f"Post with ID {post_id} does not exist. Skipping.")
-                continue
-
-            # Obtener impresiones de redis
-            impressions = int(redis_client.get(key))
-            if impressions == 0:
-                redis_client.delete(key)
-                continue
-            
-            # Obtener y crear instancia de category analytics
-            analytics, created = PostAnalytics.objects.get_or_create(post=post)
-
-            # Incrementar impresiones
-            analytics.impressions += impressions
-            analytics.save()
-
-            # Incrementar la tasa de clics (CTR)
-            analytics._update_click_through_rate()
-
-            # Eliminar la clave de redis despues de sincronizar
-            redis_client.delete(key)
+            flushed += _flush_post_views(pending, batch_size)
         except Exception as e:
-            print(f"Error syncing impressions for {key}: {str(e)}")
+            inc("blog_sync_errors_total", {"buffer": "post_views"})
+            logger.warning(f"error flushing views for {len(pending)} posts:{str(e)}")
+            restore_post_views(get_redis(), pending)
+    return flushed
 
 
-@shared_task
-def sync_category_impressions_to_db():
+def _flush_post_views(pending, batch_size):
+    # Descartar posts que ya no existen
+    post_ids = set(Post.objects.filter(id__in=pending.keys()).values_list("id", flat=True))
+    # Las IPs invalidas encoladas antes de validar en record_post_view se
+    # descartan: devolverlas a redis haria fallar el mismo lote en cada volcado
+    pairs = [
+        (post_id, ip)
+        for post_id, ips in pending.items() if post_id in post_ids
+        for ip in map(valid_ip_address, ips) if ip
+    ]
+    if not pairs:
+        return 0
+
+    # Vistas crudas y agregados en la misma transaccion: toda PostView guardada
+    # ya esta en los rollups y se puede podar
+    with transaction.atomic():
+        # La restriccion unica (post, ip) deduplica contra las vistas ya guardadas
+        new_views = PostView.objects.record("post", pairs, batch_size=batch_size)
+
+        # Sumar las vistas nuevas de cada post con un solo bulk_update
+        PostAnalytics.objects.bulk_increment("post", dict(new_views), field="views")
+        PostAnalyticsRollup.objects.add("post", new_views, field="views", batch_size=batch_size)
+    return sum(new_views.values())
+
+
+@shared_task(ignore_result=True)
+def sync_impressions_to_db(batch_size=None):
     """
     Sincronizar las impresiones almacenadas en redis con la base de datos
     """
-    keys = redis_client.keys("category:impressions:*")
-    for key in keys:
+    return _sync_counters(POST_IMPRESSIONS_KEY, "post", "impressions", PostAnalyticsRollup, PostAnalytics, batch_size)
+
+
+@shared_task(ignore_result=True)
+def sync_category_impressions_to_db(batch_size=None):
+    """
+    Sincronizar las impresiones de categorias almacenadas en redis con la base de datos
+    """
+    return _sync_counters(
+        CATEGORY_IMPRESSIONS_KEY, "category", "impressions", CategoryAnalyticsRollup, CategoryAnalytics, batch_size
+    )
+
+
+@shared_task(ignore_result=True)
+def sync_click_rollups_task(batch_size=None):
+    """
+    Agregar a los rollups los clicks de posts y categorias acumulados en redis
+    """
+    return (
+        _sync_counters(POST_CLICKS_KEY, "post", "clicks", PostAnalyticsRollup, batch_size=batch_size)
+        + _sync_counters(CATEGORY_CLICKS_KEY, "category", "clicks", CategoryAnalyticsRollup, batch_size=batch_size)
+    )
+
+
+def _sync_counters(key_template, related_field, field, rollup_model, model=None, batch_size=None):
+    # Por cada lote: un SCAN, un pipeline de GETDEL, un SELECT, un bulk_update
+    # y un upsert de rollups. Si falla se devuelven los contadores a redis
+    batch_size = batch_size or settings.BLOG_SYNC_BATCH_SIZE
+    synced = 0
+    for counters in drain_counters(get_redis(), key_template.format("*"), batch_size):
+        if not counters:
+            continue
+        buffer = f"{related_field}_{field}"
+        observe("blog_sync_batch_size", len(counters), {"buffer": buffer}, BATCH_SIZE_BUCKETS)
+        try:
+            with transaction.atomic():
+                if model is not None:
+                    model.objects.bulk_increment(related_field, counters, field=field)
+                synced += rollup_model.objects.add(related_field, counters, field=field, batch_size=batch_size)
+        except Exception as e:
+            inc("blog_sync_errors_total", {"buffer": buffer})
+            logger.warning(f"error syncing {len(counters)} {related_field} {field}:{str(e)}")
+            restore_counters(get_redis(), key_template, counters)
+    logger.info(f"synced {field} for {synced} {related_field} rows")
+    return synced
+
+
+@shared_task(ignore_result=True)
+def sync_time_on_page_task():
+    """
+    Incorporar a avg_time_on_page de posts y categorias las mediciones de
+    tiempo en pagina acumuladas en redis por el beacon
+    """
+    models = {"post": PostAnalytics, "category": CategoryAnalytics}
+    synced = 0
+    for kind, samples in drain_time_on_page(get_redis()).items():
+        if not samples:
+            continue
+        observe("blog_sync_batch_size", len(samples), {"buffer": f"{kind}_time_on_page"}, BATCH_SIZE_BUCKETS)
         try:
-            # Decodificar y extraer el ID de la categoría desde la clave Redis
-            category_id = key.decode("utf-8").split(":")[-1]
-
-            # Validar que la categoria existe
-            try:
-                category = Category.objects.get(id=category_id)
-            except Category.DoesNotExist:
-                logger.info(f"Category with ID {category_id} does not exist. Skipping.")
-                continue
-            
-            # Obtener impresiones de redis
-            impressions = int(redis_client.get(key))
-            if impressions == 0:
-                redis_client.delete(key)
-                continue
-
-            # Obtener y crear instancia de category analytics
-            analytics, created = CategoryAnalytics.objects.get_or_create(category=category)
-
-            # Incrementar impresiones
-            analytics.impressions += impressions
-            analytics.save()
-
-            # Actualizar tasa de clics (CTR)
-            analytics._update_click_through_rate()
-
-            # Eliminar la clave de redis despues de sincronizar
-            redis_client.delete(key)
+            synced += models[kind].objects.bulk_add_time_on_page(kind, samples)
         except Exception as e:
-            print(f"Error syncing impressions for {key}: {str(e)}")
+            inc("blog_sync_errors_total", {"buffer": f"{kind}_time_on_page"})
+            logger.warning(f"error syncing time on page for {len(samples)} {kind} rows:{str(e)}")
+            restore_time_on_page(get_redis(), kind, samples)
+    return synced
+
+
+@shared_task(ignore_result=True)
+def prune_analytics_task(batch_size=None):
+    """
+    Borrar por lotes las vistas crudas (PostView, CategoryView) con mas de
+    BLOG_RAW_VIEW_RETENTION_DAYS dias, que ya estan en los rollups, y los
+    buckets por hora con mas de BLOG_HOURLY_ROLLUP_RETENTION_DAYS dias (los
+    diarios se conservan). Pasado ese plazo una IP vuelve a contar como vista nueva
+    """
+    batch_size = batch_size or settings.BLOG_SYNC_BATCH_SIZE
+    now = timezone.now()
+    raw_cutoff = now - timedelta(days=settings.BLOG_RAW_VIEW_RETENTION_DAYS)
+    hourly_cutoff = now - timedelta(days=settings.BLOG_HOURLY_ROLLUP_RETENTION_DAYS)
+    pruned = {
+        "post_views": _delete_in_batches(PostView.objects.filter(timestamp__lt=raw_cutoff), batch_size),
+        "category_views": _delete_in_batches(CategoryView.objects.filter(timestamp__lt=raw_cutoff), batch_size),
+        "post_hourly_rollups": _delete_in_batches(
+            PostAnalyticsRollup.objects.filter(period=ROLLUP_HOUR, bucket__lt=hourly_cutoff), batch_size
+        ),
+        "category_hourly_rollups": _delete_in_batches(
+            CategoryAnalyticsRollup.objects.filter(period=ROLLUP_HOUR, bucket__lt=hourly_cutoff), batch_size
+        ),
+    }
+    logger.info(f"pruned analytics rows: {pruned}")
+    return pruned
+
+
+def _delete_in_batches(queryset, batch_size):
+    # Lotes chicos para no bloquear la tabla ni generar una transaccion enorme
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+
+
+@shared_task(ignore_result=True)
+def flush_analytics_buffers_task(force=False):
+    """
+    Volcar todos los buffers de analiticas de redis (vistas, impresiones,
+    clicks y tiempo en pagina) a los contadores y a los rollups por hora y dia.
+
+    Beat lo ejecuta cada BLOG_SYNC_TICK segundos, pero solo vuelca cuando toca:
+    el intervalo se acorta linealmente con los eventos pendientes, desde
+    BLOG_SYNC_MAX_INTERVAL sin eventos hasta cada tick al llegar a
+    BLOG_SYNC_PENDING_THRESHOLD. Un lock en redis evita solapar volcados.
+    """
+    client = get_redis()
+    now = time.time()
+    pending = pending_events(client)
+    last_flush_at = float(client.hget(SYNC_METRICS_KEY, "last_flush_at") or 0)
+
+    load = min(pending / settings.BLOG_SYNC_PENDING_THRESHOLD, 1)
+    interval = settings.BLOG_SYNC_MAX_INTERVAL * (1 - load)
+    if not force and now - last_flush_at < interval:
+        return None
+
+    lock = client.lock(SYNC_LOCK_KEY, timeout=settings.BLOG_SYNC_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        # El volcado anterior sigue en curso
+        client.hincrby(SYNC_METRICS_KEY, "skipped", 1)
+        logger.info("analytics flush skipped: previous run still in progress")
+        return None
+
+    try:
+        # Descontar solo lo observado: los eventos nuevos cuentan para el proximo volcado
+        client.decrby(PENDING_EVENTS_KEY, pending)
+        # El gauge de claves pendientes se calcula aca, una vez por volcado
+        record_pending_keys(client)
+        rows = (
+            flush_post_views_task()
+            + sync_impressions_to_db()
+            + sync_category_impressions_to_db()
+            + sync_click_rollups_task()
+            + sync_time_on_page_task()
+        )
+        finished = time.time()
+        client.hset(SYNC_METRICS_KEY, mapping={
+            "last_flush_at": finished,
+            "last_duration": finished - now,
+            "last_rows": rows,
+            "last_pending_events": pending,
+            "last_flush_lag": now - last_flush_at if last_flush_at else 0,
+        })
+        client.hincrby(SYNC_METRICS_KEY, "runs", 1)
+        return rows
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning("analytics flush outlived its lock timeout")
 
-        
-        
\ No newline at end of file
+
+def dispatch_flush(pending, added=1):
+    """
+    Encolar un volcado en cuanto los productores acumulan otros
+    BLOG_SYNC_PENDING_THRESHOLD eventos, sin esperar al proximo tick de beat.
+    `pending` es lo que devuelven record_post_view, record_impressions o
+    record_click, asi que no cuesta otro round trip a redis
+    """
+    if crossed_flush_threshold(pending, added):
+        flush_analytics_buffers_task.delay()
+
+
+async def adispatch_flush(pending, added=1):
+    if crossed_flush_threshold(pending, added):
+        await sync_to_async(flush_analytics_buffers_task.delay)()
+
+
+@shared_task(ignore_result=True)
+def push_live_analytics_task():
+    """
+    Mandar al dashboard en vivo los deltas acumulados desde el tick anterior
+    en un solo mensaje al grupo. Se vacian aunque no haya nadie conectado
+    para que el hash no crezca
+    """
+    deltas = drain_live_deltas(get_redis())
+    if not deltas["posts"] and not deltas["categories"]:
+        return 0
+    async_to_sync(get_channel_layer().group_send)(
+        ANALYTICS_DASHBOARD_GROUP,
+        {"type": "analytics.delta", "tick": time.time(), **deltas},
+    )
+    return len(deltas["posts"]) + len(deltas["categories"])
@@ -1,3 +1,1040 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+import fakeredis
+import fakeredis.aioredis
+from kombu import Connection, Queue as KombuQueue
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.forms import modelform_factory
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from core import metrics
+from core.metrics import METRICS_KEY
+from core.renderers import FastJSONRenderer
+from . import benchmarks
+from .buffers import (
+    crossed_flush_threshold,
+    record_post_view,
+    LIVE_DELTAS_KEY,
+    PENDING_EVENTS_KEY,
+    POST_IMPRESSIONS_KEY,
+    TIME_ON_PAGE_KEY,
+    VIEW_DEDUP_APPROXIMATE,
+    VIEW_PENDING_KEY,
+    VIEW_SEEN_KEY,
+)
+from .caching import (
+    aread_through,
+    bump_namespaces,
+    read_through,
+    rebuild_lock_key,
+    version_timeout,
+    NAMESPACE_VERSION_KEY,
+    POST_NAMESPACE,
+)
+from .headings import extract_headings
+from .fast_serializers import category_list_serializer, heading_serializer, post_list_serializer
+from .models import (
+    Category,
+    CategoryAnalytics,
+    CategoryAnalyticsRollup,
+    Heading,
+    Post,
+    PostAnalytics,
+    PostAnalyticsRollup,
+    PostView,
+    RollupQuerySet,
+    ROLLUP_DAY,
+    ROLLUP_HOUR,
+)
+from .serializers import CategoryListSerializer, HeadingSerializer, PostListSerializer
+from .tasks import (
+    dispatch_flush,
+    flush_analytics_buffers_task,
+    flush_post_views_task,
+    increment_post_views_task,
+    prune_analytics_task,
+    sync_impressions_to_db,
+)
+from .utils import get_client_ip
+from .search import search_posts
+from .views import (
+    CategoryDetailView,
+    CategoryListView,
+    CategoryTreeView,
+    PostDetailView,
+    PostHeadingsView,
+    PostListView,
+)
+
+
+class FakeLoopClients(dict):
+    # Clientes de un event loop por URL: siempre uno nuevo contra el mismo servidor
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+
+    def get(self, url, default=None):
+        return fakeredis.aioredis.FakeRedis(server=self.server)
+
+
+class FakeAsyncClients(dict):
+    # Reemplaza el dict de clientes por event loop de core.redis_client
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+
+    def get(self, loop, default=None):
+        return FakeLoopClients(self.server)
+
+
+class FakeRedisMixin:
+    """
+    Redis en memoria (fakeredis) para los buffers, locks y metricas en lugar
+    del servidor de REDIS_HOST: los tests no dependen de un redis compartido
+    ni dejan claves en el
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.redis_server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=self.redis_server)
+        patcher = mock.patch.multiple(
+            "core.redis_client",
+            _client=self.redis,
+            _async_clients=FakeAsyncClients(self.redis_server),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+def create_post(category, slug, **kwargs):
+    fields = {
+        "title": slug,
+        "description": "description",
+        "content": "<p>content</p>",
+        "thumbnail": "blog/test/thumbnail.png",
+        "keywords": "keywords",
+        "slug": slug,
+        "category": category,
+        "status": "published",
+    }
+    fields.update(kwargs)
+    return Post.objects.create(**fields)
+
+
+@skipUnless(connection.vendor == "postgresql", "Los planes de consulta son de PostgreSQL")
+class BlogIndexesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Python", slug="python")
+        for index in range(20):
+            create_post(cls.category, f"post-{index}", status="published" if index % 2 else "draft")
+
+    def plan(self, queryset):
+        # Con tablas chicas el planner prefiere seq scan o ordenar en memoria:
+        # se desactivan para ver que indice elige para filtrar y ordenar
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE blog_post, blog_category")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+        return queryset.explain()
+
+    def test_published_list_uses_partial_created_at_index(self):
+        plan = self.plan(Post.postobjects.order_by("-created_at", "-id")[:10])
+        self.assertIn("blog_post_pub_created_idx", plan)
+
+    def test_published_list_by_title_uses_partial_title_index(self):
+        plan = self.plan(Post.postobjects.order_by("title", "id")[:10])
+        self.assertIn("blog_post_pub_title_idx", plan)
+
+    def test_category_posts_use_category_status_created_at_index(self):
+        plan = self.plan(Post.postobjects.filter(category=self.category).order_by("-created_at")[:10])
+        self.assertIn("blog_post_cat_created_idx", plan)
+
+    def test_slug_lookups_use_unique_indexes(self):
+        self.assertRegex(self.plan(Post.postobjects.filter(slug="post-1").order_by()), r"Index Scan using \w*slug\w*")
+        self.assertRegex(self.plan(Category.objects.filter(slug="python")), r"Index Scan using \w*slug\w*")
+
+
+@skipUnless(connection.vendor == "postgresql", "La busqueda usa full text search de PostgreSQL")
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Python", slug="python")
+        create_post(category, "django-title", title="Django avanzado", content="<p>otro tema</p>")
+        create_post(category, "django-content", title="Notas sueltas", content="<p><b>django</b> en el contenido</p>")
+        create_post(category, "flask", title="Flask rapido", content="<p>microframework</p>")
+
+    def search(self, text):
+        return list(search_posts(Post.objects.all(), text).order_by("-rank", "slug").values_list("slug", flat=True))
+
+    def test_title_matches_rank_above_content_matches(self):
+        self.assertEqual(self.search("django"), ["django-title", "django-content"])
+
+    def test_websearch_syntax(self):
+        self.assertEqual(self.search('"django avanzado"'), ["django-title"])
+        self.assertEqual(self.search("django -avanzado"), ["django-content"])
+        self.assertEqual(sorted(self.search("flask or notas")), ["django-content", "flask"])
+        # Las etiquetas del HTML no se indexan
+        self.assertEqual(self.search("b"), [])
+
+    def test_trigram_fallback_matches_typos(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest("pg_trgm is not installed")
+        self.assertEqual(self.search("Djnago avanzdo"), [])
+        with override_settings(BLOG_SEARCH_TRIGRAM=True):
+            self.assertEqual(self.search("Djnago avanzdo"), ["django-title"])
+
+
+class ViewDedupTest(FakeRedisMixin, TestCase):
+
+    def test_post_view_is_unique_per_ip(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "unique-views")
+        PostView.objects.create(post=post, ip_address="10.0.0.1")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PostView.objects.create(post=post, ip_address="10.0.0.1")
+
+    def test_record_inserts_only_new_views(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "record-views")
+        PostView.objects.create(post=post, ip_address="10.0.0.1")
+
+        inserted = PostView.objects.record("post", [(post.id, "10.0.0.1"), (post.id, "10.0.0.2")])
+
+        self.assertEqual(inserted, {post.id: 1})
+        self.assertEqual(PostView.objects.filter(post=post).count(), 2)
+
+    def test_increment_view_counts_each_ip_once(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "increment-views")
+        analytics = PostAnalytics.objects.get(post=post)
+
+        analytics.increment_view("10.0.0.1")
+        analytics.increment_view("10.0.0.1")
+
+        self.assertEqual(analytics.views, 1)
+
+    def test_client_ip_ignores_forged_forwarded_for(self):
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR="'; DROP TABLE x, 10.0.0.9", REMOTE_ADDR="10.0.0.8")
+        self.assertEqual(get_client_ip(request), "10.0.0.8")
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR=" 2001:DB8::1 , 10.0.0.9")
+        self.assertEqual(get_client_ip(request), "2001:db8::1")
+
+    def test_flush_skips_invalid_ips_and_restores_failed_batches(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "flush-views")
+        self.assertEqual(record_post_view(self.redis, post.id, "not-an-ip"), 0)
+        # IPs encoladas antes de validar en record_post_view
+        self.redis.sadd(VIEW_PENDING_KEY.format(post.id), "not-an-ip", "10.0.0.5")
+
+        with mock.patch.object(PostView.objects, "record", side_effect=DatabaseError("boom")):
+            self.assertEqual(flush_post_views_task(), 0)
+        self.assertEqual(self.redis.smembers(VIEW_PENDING_KEY.format(post.id)), {b"not-an-ip", b"10.0.0.5"})
+
+        self.assertEqual(flush_post_views_task(), 1)
+        self.assertEqual(list(PostView.objects.filter(post=post).values_list("ip_address", flat=True)), ["10.0.0.5"])
+        self.assertFalse(self.redis.exists(VIEW_PENDING_KEY.format(post.id)))
+
+    def test_legacy_task_buffers_the_view_for_the_batch_flush(self):
+        category = Category.objects.create(name="Django", slug="django")
+        post = create_post(category, "legacy-views")
+        PostView.objects.create(post=post, ip_address="10.0.0.1")
+
+        for ip_address in ("10.0.0.1", "10.0.0.2", "10.0.0.2"):
+            increment_post_views_task(post.slug, ip_address)
+        increment_post_views_task("missing-post", "10.0.0.3")
+        self.assertEqual(PostAnalytics.objects.get(post=post).views, 0)
+
+        self.assertEqual(flush_post_views_task(), 1)
+        self.assertEqual(PostAnalytics.objects.get(post=post).views, 1)
+
+
+@override_settings(BLOG_SYNC_PENDING_THRESHOLD=100)
+class FlushDispatchTest(FakeRedisMixin, SimpleTestCase):
+
+    def test_only_the_event_that_crosses_the_threshold_dispatches(self):
+        self.assertFalse(crossed_flush_threshold(99))
+        self.assertTrue(crossed_flush_threshold(100))
+        self.assertFalse(crossed_flush_threshold(101))
+        self.assertTrue(crossed_flush_threshold(205, added=20))
+        self.assertFalse(crossed_flush_threshold(240, added=20))
+        self.assertFalse(crossed_flush_threshold(0, added=0))
+        # Nada encolado (IP repetida o sin IP)
+        self.assertFalse(crossed_flush_threshold(0))
+
+    @override_settings(BLOG_VIEW_DEDUP=VIEW_DEDUP_APPROXIMATE)
+    def test_duplicate_views_do_not_dispatch(self):
+        post_id = uuid.uuid4()
+        self.redis.set(PENDING_EVENTS_KEY, 98)
+        with mock.patch.object(flush_analytics_buffers_task, "delay") as delay:
+            for ip_address in ("10.0.0.1", "10.0.0.1", "10.0.0.2", "10.0.0.2", "10.0.0.1", None):
+                dispatch_flush(record_post_view(self.redis, post_id, ip_address))
+        self.assertEqual(delay.call_count, 1)
+        self.assertEqual(int(self.redis.get(PENDING_EVENTS_KEY)), 100)
+
+    @override_settings(BLOG_VIEW_DEDUP=VIEW_DEDUP_APPROXIMATE, BLOG_RAW_VIEW_RETENTION_DAYS=30)
+    def test_seen_views_expire_with_the_raw_view_retention(self):
+        post_id = uuid.uuid4()
+        seen_key = VIEW_SEEN_KEY.format(post_id)
+        record_post_view(self.redis, post_id, "10.0.0.1")
+        self.assertEqual(self.redis.ttl(seen_key), 30 * 86400)
+
+        # Una vista repetida no extiende la ventana; una clave vieja sin TTL lo recibe
+        self.redis.expire(seen_key, 60)
+        record_post_view(self.redis, post_id, "10.0.0.1")
+        self.assertEqual(self.redis.ttl(seen_key), 60)
+        self.redis.persist(seen_key)
+        record_post_view(self.redis, post_id, "10.0.0.1")
+        self.assertEqual(self.redis.ttl(seen_key), 30 * 86400)
+
+
+@override_settings(VALID_API_KEYS=["test-key"])
+class PendingKeysGaugeTest(FakeRedisMixin, TestCase):
+
+    def test_flush_records_the_gauge_and_the_scrape_does_not_scan(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "gauge")
+        record_post_view(self.redis, post.id, "10.0.0.1")
+        self.redis.hset(LIVE_DELTAS_KEY, f"post:views:{post.id}", 1)
+
+        flush_analytics_buffers_task(force=True)
+
+        with mock.patch.object(fakeredis.FakeRedis, "scan_iter", side_effect=AssertionError("SCAN")), \
+                mock.patch("core.metrics._queue_lengths", return_value={}):
+            response = self.client.get(reverse("analytics-metrics"), HTTP_API_KEY="test-key")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('blog_pending_keys{buffer="post_views"} 1\n', response.content.decode())
+        self.assertIn('blog_pending_keys{buffer="live_deltas"} 1\n', response.content.decode())
+
+
+class QueueLengthTest(SimpleTestCase):
+
+    def test_empty_queues_report_zero_without_hiding_the_others(self):
+        empty, busy = f"empty-{uuid.uuid4().hex}", f"busy-{uuid.uuid4().hex}"
+        with Connection("memory://") as connection:
+            producer = connection.Producer()
+            for _ in range(2):
+                producer.publish({}, routing_key=busy, declare=[KombuQueue(busy, routing_key=busy)])
+
+        with override_settings(METRICS_CELERY_QUEUES=[empty, busy]), \
+                mock.patch.object(metrics.app, "connection_for_read", lambda: Connection("memory://")), \
+                self.assertNoLogs("core.metrics", "WARNING"):
+            self.assertEqual(metrics._queue_lengths(), {empty: 0, busy: 2})
+
+
+class TimeOnPageBeaconTest(FakeRedisMixin, TestCase):
+
+    def test_unknown_ids_never_reach_the_buffer(self):
+        category = Category.objects.create(name="Django", slug="django")
+        post = create_post(category, "beacon")
+        draft = create_post(category, "draft", status="draft")
+        events = [
+            {"kind": "post", "id": str(post.id), "seconds": 10},
+            {"kind": "post", "slug": "beacon", "seconds": 20},
+            {"kind": "category", "id": str(category.id), "seconds": 5},
+            {"kind": "post", "id": str(uuid.uuid4()), "seconds": 10},
+            {"kind": "post", "id": str(draft.id), "seconds": 10},
+            {"kind": "category", "id": str(post.id), "seconds": 10},
+        ]
+
+        response = self.client.post(reverse("analytics-time-on-page"), {"events": events}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["results"], {"accepted": 3, "rejected": 3})
+        self.assertEqual(set(self.redis.hgetall(TIME_ON_PAGE_KEY)), {
+            f"post:sum:{post.id}".encode(), f"post:count:{post.id}".encode(),
+            f"category:sum:{category.id}".encode(), f"category:count:{category.id}".encode(),
+        })
+        self.assertEqual(float(self.redis.hget(TIME_ON_PAGE_KEY, f"post:sum:{post.id}")), 30)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ReadThroughTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Entrada vencida pero todavia servible
+        cache.set("entry", ("stale", time.time() - 1), 60)
+
+    def test_failed_refresh_serves_the_stale_value_and_releases_the_lock(self):
+        refresh = mock.Mock(side_effect=ConnectionError("broker down"))
+        with self.assertLogs("apps.blog.caching", "WARNING"):
+            self.assertEqual(read_through("entry", build=mock.Mock(), refresh=refresh), "stale")
+        refresh.assert_called_once()
+        self.assertIsNone(cache.get(rebuild_lock_key("entry")))
+
+    def test_async_failed_refresh_serves_the_stale_value_and_releases_the_lock(self):
+        refresh = mock.AsyncMock(side_effect=ConnectionError("broker down"))
+        with self.assertLogs("apps.blog.caching", "WARNING"):
+            value = async_to_sync(aread_through)("entry", build=mock.AsyncMock(), refresh=refresh)
+        self.assertEqual(value, "stale")
+        self.assertIsNone(cache.get(rebuild_lock_key("entry")))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SeedBlogTest(TestCase):
+
+    def assertSeeded(self, **options):
+        call_command(
+            "seed_blog", posts=6, categories=3, depth=2, views=5, days=30, chunk_size=4, seed=1,
+            stdout=io.StringIO(), **options,
+        )
+        views = PostView.objects.count()
+        self.assertGreater(views, 0)
+        # Timestamps generados, no el momento del insert
+        self.assertGreater(PostView.objects.values("timestamp").distinct().count(), 1)
+        self.assertLess(PostView.objects.earliest("timestamp").timestamp, timezone.now() - timedelta(hours=1))
+        # Cada vista esta en los rollups por hora y por dia, del post y de su categoria
+        for model in (PostAnalyticsRollup, CategoryAnalyticsRollup):
+            for period in (ROLLUP_HOUR, ROLLUP_DAY):
+                total = model.objects.filter(period=period).aggregate(total=Sum("views"))["total"]
+                self.assertEqual(total, views, (model.__name__, period))
+
+    def test_bulk_create(self):
+        self.assertSeeded()
+
+    def test_copy(self):
+        self.assertSeeded(copy=True)
+
+
+class SlugMigrationTest(TestCase):
+
+    def test_dedupe_skips_suffixes_already_in_use(self):
+        free_slug = import_module("apps.blog.migrations.0011_dedupe_slugs_and_views").free_slug
+        category = Category.objects.create(name="Django", slug="django")
+        create_post(category, "intro-2")
+        create_post(category, "intro-3")
+        self.assertEqual(free_slug(Post, "intro", 2), ("intro-4", 5))
+        # Sin pasarse del max_length del campo
+        slug, _ = free_slug(Post, "x" * 128, 2)
+        self.assertEqual(slug, "x" * 126 + "-2")
+
+
+class CategoryTreeTest(TestCase):
+
+    def setUp(self):
+        self.a = Category.objects.create(name="A", slug="a")
+        self.b = Category.objects.create(name="B", slug="b", parent=self.a)
+        self.c = Category.objects.create(name="C", slug="c", parent=self.b)
+        self.d = Category.objects.create(name="D", slug="d")
+
+    def subtree(self, slug):
+        return list(Category.objects.subtree(slug).values_list("slug", flat=True))
+
+    def test_moving_a_category_moves_its_subtree(self):
+        self.assertEqual(self.subtree("a"), ["a", "b", "c"])
+
+        self.b.parent = self.d
+        self.b.save()
+
+        self.assertEqual(self.subtree("a"), ["a"])
+        self.assertEqual(self.subtree("d"), ["d", "b", "c"])
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.path, f"{self.d.id.hex}/{self.b.id.hex}/{self.c.id.hex}/")
+        self.assertEqual(sorted(Category.objects.ancestor_slugs(self.c.path)), ["b", "c", "d"])
+
+        # A raiz: el subarbol se mueve con ella
+        self.b.parent = None
+        self.b.save(update_fields=["parent"])
+        self.assertEqual(self.subtree("b"), ["b", "c"])
+        self.assertEqual(self.subtree("d"), ["d"])
+        self.assertEqual(Category.objects.get(slug="b").path, f"{self.b.id.hex}/")
+
+    def test_a_category_cannot_move_under_its_descendants(self):
+        CategoryForm = modelform_factory(Category, fields=["parent"])
+        for parent in (self.a, self.c):
+            form = CategoryForm({"parent": parent.pk}, instance=Category.objects.get(pk=self.a.pk))
+            self.assertFalse(form.is_valid())
+            self.assertIn("parent", form.errors)
+        self.assertEqual(self.subtree("a"), ["a", "b", "c"])
+
+        # Moverla bajo otra rama si es valido
+        form = CategoryForm({"parent": self.d.pk}, instance=Category.objects.get(pk=self.b.pk))
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.subtree("d"), ["d", "b", "c"])
+
+
+class RollupTest(TestCase):
+
+    def setUp(self):
+        self.post = create_post(Category.objects.create(name="Django", slug="django"), "rollups")
+        self.at = datetime(2024, 5, 10, 14, 30, tzinfo=dt_timezone.utc)
+
+    def test_add_sums_into_the_hour_and_day_buckets(self):
+        self.assertEqual(PostAnalyticsRollup.objects.add("post", {self.post.id: 2}, at=self.at), 1)
+        # Los objetos que ya no existen se descartan
+        added = PostAnalyticsRollup.objects.add("post", {self.post.id: 3, uuid.uuid4(): 1}, field="clicks", at=self.at)
+        self.assertEqual(added, 1)
+        PostAnalyticsRollup.objects.add("post", {self.post.id: 1}, at=self.at + timedelta(hours=1))
+
+        rows = PostAnalyticsRollup.objects.filter(post=self.post).values_list("period", "bucket", "views", "clicks")
+        self.assertEqual(sorted(rows), [
+            (ROLLUP_DAY, datetime(2024, 5, 10, tzinfo=dt_timezone.utc), 3, 3),
+            (ROLLUP_HOUR, datetime(2024, 5, 10, 14, tzinfo=dt_timezone.utc), 2, 3),
+            (ROLLUP_HOUR, datetime(2024, 5, 10, 15, tzinfo=dt_timezone.utc), 1, 0),
+        ])
+
+    def test_series_fills_empty_buckets_with_zeros(self):
+        PostAnalyticsRollup.objects.add("post", {self.post.id: 2}, at=self.at)
+        series = PostAnalyticsRollup.objects.series(
+            "post", self.post.id, ROLLUP_HOUR, self.at - timedelta(hours=1), self.at + timedelta(hours=1)
+        )
+        self.assertEqual([(point["bucket"].hour, point["views"]) for point in series], [(13, 0), (14, 2), (15, 0)])
+
+    @override_settings(BLOG_RAW_VIEW_RETENTION_DAYS=30, BLOG_HOURLY_ROLLUP_RETENTION_DAYS=90)
+    def test_prune_keeps_recent_rows_and_daily_buckets(self):
+        now = timezone.now()
+        for number, age in enumerate((1, 40, 50)):
+            view = PostView.objects.create(post=self.post, ip_address=f"10.0.0.{number}")
+            PostView.objects.filter(pk=view.pk).update(timestamp=now - timedelta(days=age))
+        PostAnalyticsRollup.objects.add("post", {self.post.id: 1}, at=now - timedelta(days=100))
+        PostAnalyticsRollup.objects.add("post", {self.post.id: 1}, at=now - timedelta(days=1))
+
+        pruned = prune_analytics_task(batch_size=1)
+
+        self.assertEqual(pruned["post_views"], 2)
+        self.assertEqual(pruned["post_hourly_rollups"], 1)
+        self.assertEqual(PostView.objects.get().ip_address, "10.0.0.0")
+        self.assertEqual(PostAnalyticsRollup.objects.filter(period=ROLLUP_HOUR).count(), 1)
+        self.assertEqual(PostAnalyticsRollup.objects.filter(period=ROLLUP_DAY).count(), 2)
+
+
+class CounterSyncTest(FakeRedisMixin, TestCase):
+
+    def test_failed_batch_is_restored_and_synced_on_the_next_flush(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "impressions")
+        key = POST_IMPRESSIONS_KEY.format(post.id)
+        self.redis.set(key, 5)
+
+        with mock.patch.object(RollupQuerySet, "add", side_effect=DatabaseError("rollup failed")), \
+                self.assertLogs("apps.blog.tasks", "WARNING"):
+            self.assertEqual(sync_impressions_to_db(), 0)
+        # El incremento vuelve a redis y el bulk_increment se deshace con la transaccion
+        self.assertEqual(int(self.redis.get(key)), 5)
+        self.assertEqual(PostAnalytics.objects.get(post=post).impressions, 0)
+        self.assertEqual(int(self.redis.hget(METRICS_KEY, 'blog_sync_errors_total{buffer="post_impressions"}')), 1)
+
+        self.redis.incr(key, 2)
+        self.assertEqual(sync_impressions_to_db(), 1)
+        self.assertIsNone(self.redis.get(key))
+        self.assertEqual(PostAnalytics.objects.get(post=post).impressions, 7)
+
+
+class AnalyticsIncrementTest(TestCase):
+
+    def test_increment_returns_counters_and_ctr_from_the_update(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "increment-clicks")
+        analytics = PostAnalytics.objects.get(post=post)
+        # La instancia queda desactualizada: el CTR se calcula con los valores de la fila
+        PostAnalytics.objects.filter(pk=analytics.pk).update(impressions=4, clicks=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            analytics.increment_clicks()
+
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertTrue(sql.startswith("UPDATE"), sql)
+        self.assertIn("CASE WHEN", sql)
+        self.assertIn("RETURNING", sql)
+        self.assertEqual((analytics.clicks, analytics.click_through_rate), (2, 50.0))
+        self.assertEqual(PostAnalytics.objects.get(pk=analytics.pk).click_through_rate, 50.0)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ConcurrentIncrementTest(TransactionTestCase):
+
+    def test_concurrent_increments_do_not_lose_updates(self):
+        post = create_post(Category.objects.create(name="Django", slug="django"), "concurrent-clicks")
+        pk = PostAnalytics.objects.filter(post=post).values_list("pk", flat=True).get()
+        PostAnalytics.objects.filter(pk=pk).update(impressions=80)
+
+        def click():
+            try:
+                # Cada hilo lee su propia copia: un save() de esos valores perderia clicks
+                analytics = PostAnalytics.objects.get(pk=pk)
+                for _ in range(10):
+                    analytics.increment_clicks()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=click) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        analytics = PostAnalytics.objects.get(pk=pk)
+        self.assertEqual((analytics.clicks, analytics.click_through_rate), (40, 50.0))
+
+
+class HeadingExtractionTest(TestCase):
+
+    def test_extract_keeps_ids_and_adds_unique_anchors(self):
+        content = (
+            '<p>intro</p>\n<h2>Primeros pasos</h2>'
+            '<h3 class="x"><strong>Instalación</strong> &amp; uso</h3>\n'
+            '<h2 id="primeros-pasos-2">Otro</h2><h2>Primeros pasos</h2><h4> </h4>'
+        )
+
+        content, toc = extract_headings(content)
+
+        self.assertEqual(toc, [
+            {"title": "Primeros pasos", "slug": "primeros-pasos", "level": 2, "order": 0},
+            {"title": "Instalación & uso", "slug": "instalacion-uso", "level": 3, "order": 1},
+            {"title": "Otro", "slug": "primeros-pasos-2", "level": 2, "order": 2},
+            {"title": "Primeros pasos", "slug": "primeros-pasos-3", "level": 2, "order": 3},
+        ])
+        self.assertIn('<h3 class="x" id="instalacion-uso">', content)
+        self.assertIn('<h2 id="primeros-pasos-3">Primeros pasos</h2>', content)
+        # Con los ids ya escritos el contenido no cambia
+        self.assertEqual(extract_headings(content), (content, toc))
+
+    def test_saving_a_post_rebuilds_its_headings(self):
+        post = create_post(
+            Category.objects.create(name="Django", slug="django"), "toc",
+            content="<h2>Uno</h2><p>texto</p><h3>Dos</h3>",
+        )
+        self.assertIn('<h2 id="uno">', post.content)
+        self.assertEqual(
+            list(post.headings.values_list("title", "slug", "level", "order")),
+            [("Uno", "uno", 2, 0), ("Dos", "dos", 3, 1)],
+        )
+
+        # Sin cambios en los headings no se reescriben
+        with CaptureQueriesContext(connection) as context:
+            post.save()
+        self.assertFalse([query for query in context.captured_queries if query["sql"].startswith("DELETE")])
+
+        post.content = "<h2>Uno</h2><h2>Tres</h2>"
+        # Sin una consulta ni un on_commit por heading borrado: post, search vector,
+        # headings (SELECT, DELETE, INSERT) e invalidacion del post
+        with self.assertNumQueries(8), self.captureOnCommitCallbacks() as callbacks:
+            post.save(update_fields=["content"])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(list(post.headings.values_list("slug", flat=True)), ["uno", "tres"])
+
+        post.title = "otro titulo"
+        with CaptureQueriesContext(connection) as context:
+            post.save(update_fields=["title"])
+        self.assertFalse([query for query in context.captured_queries if "blog_heading" in query["sql"]])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class EndpointQueryCountTest(FakeRedisMixin, TestCase):
+    """
+    Cada endpoint debe hacer las mismas consultas sin importar cuantos posts devuelva
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.category = Category.objects.create(name="Python", slug="python")
+        Category.objects.create(name="Django", slug="django", parent=self.category)
+
+    def create_posts(self, total):
+        for index in range(total):
+            post = create_post(self.category, f"post-{Post.objects.count()}")
+            Heading.objects.create(post=post, title=f"heading {index}", level=2, order=index)
+
+    def assertQueriesConstant(self, num, url):
+        for total in (2, 8):
+            self.create_posts(total)
+            cache.clear()
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_post_list(self):
+        # COUNT(*) + pagina
+        self.assertQueriesConstant(2, reverse("post-list"))
+
+    def test_post_list_cursor(self):
+        self.assertQueriesConstant(1, reverse("post-list") + "?pagination=cursor")
+
+    def test_post_detail(self):
+        # post con categoria y view_count + headings
+        self.assertQueriesConstant(2, reverse("post-detail") + "?slug=post-0")
+
+    def test_category_list(self):
+        # categorias + ids de los hijos
+        self.assertQueriesConstant(2, reverse("category-list"))
+
+    def test_category_posts(self):
+        # categoria + posts
+        self.assertQueriesConstant(2, reverse("category-posts") + "?slug=python")
+
+    def test_cached_responses_skip_the_database(self):
+        self.create_posts(3)
+        for url in (
+            reverse("post-list"),
+            reverse("post-detail") + "?slug=post-0",
+            reverse("post-headings") + "?slug=post-1",
+            reverse("category-list"),
+            reverse("category-posts") + "?slug=python&descendants=true",
+        ):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CacheInvalidationTest(FakeRedisMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.parent = Category.objects.create(name="Python", slug="python")
+        self.category = Category.objects.create(name="Django", slug="django", parent=self.parent)
+        self.post = create_post(self.category, "cached-post")
+        self.urls = [
+            reverse("post-list"),
+            reverse("post-detail") + "?slug=cached-post",
+            reverse("category-posts") + "?slug=django",
+            reverse("category-posts") + "?slug=python&descendants=true",
+        ]
+
+    def assertEndpointsContain(self, text):
+        for url in self.urls:
+            self.assertIn(text, self.client.get(url).content.decode(), url)
+
+    def warm(self):
+        for url in self.urls:
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
+    def test_saving_a_post_invalidates_lists_detail_and_category_posts(self):
+        self.warm()
+        self.post.title = "Nuevo titulo"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+        self.assertEndpointsContain("Nuevo titulo")
+
+    def test_saving_a_category_invalidates_without_touching_each_post(self):
+        self.warm()
+        self.category.name = "Django REST"
+        with mock.patch("apps.blog.models.bump_namespaces", wraps=bump_namespaces) as bump, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        namespaces = [namespace for call in bump.call_args_list for namespace in call.args]
+        self.assertNotIn(POST_NAMESPACE.format("cached-post"), namespaces)
+        self.assertEndpointsContain("Django REST")
+
+    def test_version_keys_expire(self):
+        self.client.get(reverse("post-detail") + "?slug=does-not-exist")
+        version_key = NAMESPACE_VERSION_KEY.format(POST_NAMESPACE.format("does-not-exist"))
+        self.assertIsNotNone(cache.get(version_key))
+        expires_at = cache._expire_info[cache.make_key(version_key)]
+        self.assertLessEqual(expires_at - time.time(), version_timeout())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AsyncListViewTest(FakeRedisMixin, TestCase):
+    """
+    Los listados async se construyen con el ORM async y responden lo mismo
+    que las vistas sync, con la misma entrada de caché
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.category = Category.objects.create(name="Python", slug="python")
+        Category.objects.create(name="Django", slug="django", parent=self.category)
+        for index in range(3):
+            create_post(self.category, f"post-{index}")
+
+    def async_get(self, url):
+        # async_to_sync devuelve las consultas del ORM async a este thread: cuentan en assertNumQueries
+        async def get():
+            return await self.async_client.get(url)
+        return async_to_sync(get)()
+
+    def assertMatchesSyncView(self, sync_url, async_url, num_queries):
+        cache.clear()
+        with self.assertNumQueries(num_queries):
+            async_response = self.async_get(async_url)
+        self.assertEqual(async_response.status_code, 200)
+        # La respuesta quedo en el caché compartido con la vista sync
+        with self.assertNumQueries(0):
+            self.async_get(async_url)
+        cache.clear()
+        sync_response = self.client.get(sync_url)
+        self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+
+    def test_post_list(self):
+        self.assertMatchesSyncView(reverse("post-list"), reverse("async-post-list"), 2)
+        self.assertMatchesSyncView(
+            reverse("post-list") + "?pagination=cursor", reverse("async-post-list") + "?pagination=cursor", 1
+        )
+
+    def test_category_list(self):
+        self.assertMatchesSyncView(reverse("category-list"), reverse("async-category-list"), 2)
+
+    def test_not_found(self):
+        self.assertEqual(self.async_get(reverse("async-post-list") + "?search=missing").status_code, 404)
+        self.assertEqual(self.async_get(reverse("async-category-list") + "?search=missing").status_code, 404)
+
+    def test_post_detail_errors_match_sync_view(self):
+        url = "?slug=post-0"
+        with mock.patch("apps.blog.views.record_post_view", side_effect=RuntimeError("redis down")):
+            sync_response = self.client.get(reverse("post-detail") + url)
+        with mock.patch("apps.blog.async_views.arecord_post_view", side_effect=RuntimeError("redis down")):
+            async_response = self.async_get(reverse("async-post-detail") + url)
+        self.assertEqual(async_response.status_code, 500)
+        self.assertEqual(sync_response.status_code, 500)
+        self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+        self.assertEqual(json.loads(async_response.content), {"detail": "An unexpected error ocurred: redis down"})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CursorPaginationTest(FakeRedisMixin, TestCase):
+
+    def test_pages_over_equal_created_at_have_no_gaps_or_duplicates(self):
+        category = Category.objects.create(name="Python", slug="python")
+        created_at = timezone.now()
+        for index in range(10):
+            # Siete posts con el mismo created_at: solo el id los ordena
+            create_post(category, f"post-{index}", created_at=created_at - timedelta(minutes=index // 7))
+        expected = list(Post.postobjects.order_by("-created_at", "-id").values_list("slug", flat=True))
+
+        slugs, pages = [], 0
+        url = reverse("post-list") + "?pagination=cursor&page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            slugs += [post["slug"] for post in response.json()["results"]]
+            url = response.json()["next"]
+            pages += 1
+
+        self.assertEqual(slugs, expected)
+        self.assertEqual(pages, 4)
+
+
+class FastSerializerTest(TestCase):
+    """
+    Los serializers de values_list() + FastJSONRenderer deben producir los
+    mismos bytes que los serializers de DRF + JSONRenderer
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Python", slug="python", title="Python  ", description="ñandú")
+        Category.objects.create(name="Django", slug="django", parent=cls.category, thumbnail="blog/test/category.png")
+        for index in range(3):
+            post = create_post(cls.category, f"post-{index}", title=f"título {index}", description="emoji 🐍")
+            Heading.objects.create(post=post, title="Intro", slug="intro", level=2, order=1)
+        PostAnalytics.objects.filter(post__slug="post-1").update(views=7)
+
+    def assertSameJSON(self, drf_data, fast_data):
+        self.assertEqual(JSONRenderer().render(drf_data), FastJSONRenderer().render(fast_data))
+
+    def test_post_list(self):
+        posts = Post.postobjects.for_list().order_by("slug")
+        self.assertSameJSON(
+            PostListSerializer(posts, many=True).data,
+            post_list_serializer.serialize(post_list_serializer.values(posts)),
+        )
+
+    def test_category_list(self):
+        categories = Category.objects.order_by("slug")
+        self.assertSameJSON(
+            CategoryListSerializer(categories, many=True).data,
+            category_list_serializer.serialize(list(category_list_serializer.values(categories))),
+        )
+
+    def test_headings(self):
+        headings = Heading.objects.order_by("post__slug")
+        self.assertSameJSON(
+            HeadingSerializer(headings, many=True).data,
+            heading_serializer.serialize(heading_serializer.values(headings)),
+        )
+
+    def test_renderer_matches_json_renderer(self):
+        data = {"date": timezone.now(), "id": uuid.uuid4(), "amount": Decimal("1.50"), "text": "a\u2028b"}
+        self.assertEqual(JSONRenderer().render(data), FastJSONRenderer().render(data))
+
+    def test_renderer_floats(self):
+        # Floats sin notacion cientifica: mismos bytes
+        data = {"values": [0.0, 0.1, 1.5, -2.25, 123.456, 1 / 3, 12345678.9]}
+        self.assertEqual(JSONRenderer().render(data), FastJSONRenderer().render(data))
+        # Diferencias documentadas en FastJSONRenderer
+        self.assertEqual(JSONRenderer().render([1e16]), b"[1e+16]")
+        self.assertEqual(FastJSONRenderer().render([1e16]), b"[1e16]")
+        self.assertEqual(FastJSONRenderer().render([float("nan")]), b"[null]")
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float("nan")])
+
+    def test_only_read_views_use_the_fast_renderer(self):
+        self.assertEqual(api_settings.DEFAULT_RENDERER_CLASSES[0], JSONRenderer)
+        for view in (PostListView, PostDetailView, PostHeadingsView, CategoryListView, CategoryTreeView, CategoryDetailView):
+            self.assertEqual(view.renderer_classes[0], FastJSONRenderer, view.__name__)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CategorySortingTest(FakeRedisMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        # (slug, nombre, creada hace n dias, actualizada hace n dias, vistas)
+        for slug, name, created, updated, views in (
+            ("beta", "Beta", 3, 1, 10),
+            ("alpha", "Alpha", 1, 2, 30),
+            ("gamma", "Gamma", 2, 3, 20),
+        ):
+            category = Category.objects.create(name=name, slug=slug)
+            Category.objects.filter(pk=category.pk).update(
+                created_at=now - timedelta(days=created),
+                updated_at=now - timedelta(days=updated),
+            )
+            CategoryAnalytics.objects.filter(category=category).update(views=views)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def get_slugs(self, **params):
+        response = self.client.get(reverse("category-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return [category["slug"] for category in response.json()["results"]]
+
+    def test_sorting_modes(self):
+        expected = {
+            "newest": ["alpha", "gamma", "beta"],
+            "recently_updated": ["beta", "alpha", "gamma"],
+            "most_viewed": ["alpha", "gamma", "beta"],
+        }
+        for sorting, slugs in expected.items():
+            with self.subTest(sorting=sorting):
+                self.assertEqual(self.get_slugs(sorting=sorting), slugs)
+
+    def test_ordering_modes(self):
+        self.assertEqual(self.get_slugs(ordering="az"), ["alpha", "beta", "gamma"])
+        self.assertEqual(self.get_slugs(ordering="za"), ["gamma", "beta", "alpha"])
+
+    def test_every_combination_is_cached_separately(self):
+        for sorting in ("", "newest", "recently_updated", "most_viewed", "unknown"):
+            for ordering in ("", "az", "za"):
+                with self.subTest(sorting=sorting, ordering=ordering):
+                    slugs = self.get_slugs(sorting=sorting, ordering=ordering)
+                    self.assertEqual(sorted(slugs), ["alpha", "beta", "gamma"])
+                    # La segunda vez sale del cache con el mismo resultado
+                    with self.assertNumQueries(0):
+                        self.assertEqual(self.get_slugs(sorting=sorting, ordering=ordering), slugs)
+
+    def test_sorting_runs_in_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_slugs(sorting="most_viewed", ordering="za")
+        sql = queries[0]["sql"]
+        self.assertIn("ORDER BY", sql)
+        self.assertIn("blog_categoryanalytics", sql)
+
+
+class BenchmarkStatsTest(SimpleTestCase):
+
+    def stats(self, p95_ms=10.0, queries=2, statuses=(200,)):
+        return {"p95_ms": p95_ms, "queries": queries, "statuses": list(statuses)}
+
+    def test_summary_reports_percentiles_in_milliseconds(self):
+        latencies = [index / 1000 for index in range(1, 101)]
+        summary = benchmarks.summarize(latencies, [2] * 100, [0.001] * 100, sum(latencies), [200] * 100)
+        self.assertAlmostEqual(summary["p50_ms"], 50.5)
+        self.assertAlmostEqual(summary["p95_ms"], 95.05)
+        self.assertAlmostEqual(summary["p99_ms"], 99.01)
+        self.assertEqual(summary["queries"], 2)
+        self.assertEqual(summary["db_ms_mean"], 1.0)
+        self.assertEqual(summary["sequential_rps"], round(100 / sum(latencies), 2))
+
+    def test_compare_flags_latency_query_and_status_regressions(self):
+        baseline = {"posts:warm": self.stats(), "post:cold": self.stats(), "categories:cold": self.stats()}
+        current = {
+            "posts:warm": self.stats(p95_ms=13.0),
+            "post:cold": self.stats(queries=3, statuses=(200, 500)),
+        }
+        regressions = benchmarks.compare(baseline, current, tolerance=0.2)
+        self.assertEqual(len(regressions), 4)
+        self.assertTrue(regressions[0].startswith("posts:warm: p95"))
+        self.assertIn("queries per request 2 -> 3", regressions[1])
+        self.assertIn("[500]", regressions[2])
+        self.assertIn("categories:cold: missing", regressions[3])
+
+    def test_compare_ignores_noise_and_improvements(self):
+        baseline = {"posts:warm": self.stats(p95_ms=0.5), "post:cold": self.stats()}
+        current = {"posts:warm": self.stats(p95_ms=1.2), "post:cold": self.stats(p95_ms=5.0, queries=1)}
+        self.assertEqual(benchmarks.compare(baseline, current), [])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class BenchmarkRunTest(FakeRedisMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Python", slug="python")
+        cls.post = create_post(cls.category, "post-0")
+        Heading.objects.create(post=cls.post, title="Intro", slug="intro", level=2, order=0)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_run_measures_every_endpoint_cold_and_warm(self):
+        results = benchmarks.run(Client(), self.post.slug, self.category.slug, requests=3, include_writes=True)
+        self.assertEqual(set(results), {
+            "posts:cold", "posts:warm",
+            "post:cold", "post:warm",
+            "post_headings:cold", "post_headings:warm",
+            "categories:cold", "categories:warm",
+            "category_posts:cold", "category_posts:warm",
+            "increment_post_clicks:none", "increment_category_clicks:none",
+        })
+        for name, stats in results.items():
+            self.assertEqual(stats["statuses"], [200], name)
+            self.assertEqual(stats["requests"], 3, name)
+        # Con el caché caliente los listados y el detalle no consultan la base
+        for name in ("posts", "post", "post_headings", "categories", "category_posts"):
+            self.assertEqual(results[f"{name}:warm"]["queries"], 0, name)
+            self.assertGreater(results[f"{name}:cold"]["queries"], 0, name)
+
+    def test_run_skips_write_endpoints_by_default(self):
+        results = benchmarks.run(Client(), self.post.slug, self.category.slug, requests=2)
+        self.assertNotIn("increment_post_clicks:none", results)
+        self.assertNotIn("increment_category_clicks:none", results)
+        self.assertFalse(PostAnalytics.objects.filter(post=self.post, clicks__gt=0).exists())
+        self.assertFalse(CategoryAnalytics.objects.filter(category=self.category, clicks__gt=0).exists())
+
+    def test_command_writes_json_and_fails_on_regressions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output, baseline = f"{directory}/current.json", f"{directory}/baseline.json"
+            call_command("benchmark_api", requests=2, output=output, stdout=io.StringIO())
+            with open(output) as current:
+                report = json.load(current)
+            self.assertEqual(report["meta"]["post"], self.post.slug)
+            self.assertEqual(report["meta"]["requests"], 2)
+
+            for stats in report["results"].values():
+                stats["queries"] = -1
+            with open(baseline, "w") as file:
+                json.dump(report, file)
+            with self.assertRaisesMessage(CommandError, "queries per request"):
+                call_command("benchmark_api", requests=2, output=output, baseline=baseline, stdout=io.StringIO())
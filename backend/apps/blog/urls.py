@@ -9,8 +9,21 @@ from .views import(
     GenerateFakePostView,
     CategoryListView,
     IncrementCategoryClicksView,
-    CategoryDetailView
+    CategoryDetailView,
+    CategoryTreeView,
+    AnalyticsPrometheusMetricsView,
+    AnalyticsSyncMetricsView,
+    AnalyticsTimeSeriesView,
+    TimeOnPageBeaconView,
     ) 
+from .async_views import (
+    AsyncCategoryDetailView,
+    AsyncCategoryListView,
+    AsyncCategoryTreeView,
+    AsyncPostDetailView,
+    AsyncPostHeadingsView,
+    AsyncPostListView,
+)
 
 urlpatterns = [
     path('posts/', PostListView.as_view(), name="post-list"),
@@ -21,7 +34,20 @@ urlpatterns = [
     path('generate_analytics/', GenerateFakeAnalyticsView.as_view()),
     path('categories/', CategoryListView.as_view(), name="category-list"),
     path('category/increment_clicks/', IncrementCategoryClicksView.as_view(), name="increment-category-click"),
+    path('categories/tree/', CategoryTreeView.as_view(), name="category-tree"),
     path('category/posts/', CategoryDetailView.as_view(), name="category-posts"),
+    path('analytics/sync_metrics/', AnalyticsSyncMetricsView.as_view(), name="analytics-sync-metrics"),
+    path('analytics/metrics/', AnalyticsPrometheusMetricsView.as_view(), name="analytics-metrics"),
+    path('analytics/time_on_page/', TimeOnPageBeaconView.as_view(), name="analytics-time-on-page"),
+    path('analytics/timeseries/', AnalyticsTimeSeriesView.as_view(), name="analytics-timeseries"),
+    
+    # Variantes async de las vistas de lectura (ASGI)
+    path('async/posts/', AsyncPostListView.as_view(), name="async-post-list"),
+    path('async/post/', AsyncPostDetailView.as_view(), name="async-post-detail"),
+    path('async/post/headings/', AsyncPostHeadingsView.as_view(), name="async-post-headings"),
+    path('async/categories/', AsyncCategoryListView.as_view(), name="async-category-list"),
+    path('async/categories/tree/', AsyncCategoryTreeView.as_view(), name="async-category-tree"),
+    path('async/category/posts/', AsyncCategoryDetailView.as_view(), name="async-category-posts"),
     
     
 ]
\ No newline at end of file
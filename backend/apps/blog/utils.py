@@ -1,8 +1,23 @@
+import ipaddress
+
+
+def valid_ip_address(value):
+    """
+    La IP normalizada, o None si `value` no es una IPv4/IPv6 valida (p.ej. un
+    X-Forwarded-For armado a mano)
+    """
+    try:
+        return str(ipaddress.ip_address(str(value).strip()))
+    except ValueError:
+        return None
+
+
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    ip = None
     if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
+        ip = valid_ip_address(x_forwarded_for.split(',')[0])
+    if ip is None:
+        ip = valid_ip_address(request.META.get('REMOTE_ADDR'))
         
-    return ip
\ No newline at end of file
+    return ip
@@ -1,88 +1,176 @@
 from rest_framework_api.views import StandardAPIView
 from rest_framework.exceptions import NotFound,APIException
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Q
-import redis
 from rest_framework.response import Response
+from django.http import Http404,HttpResponse
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from .models import Post,Heading,PostAnalytics,Category,CategoryAnalytics
-from .serializers import PostSerializer,PostListSerializer,HeadingSerializer,CategoryListSerializer
+from .models import (
+    Post,
+    PostAnalytics,
+    PostAnalyticsRollup,
+    Category,
+    CategoryAnalytics,
+    CategoryAnalyticsRollup,
+    ROLLUP_DAY,
+    ROLLUP_HOUR,
+)
+from .serializers import HeadingSerializer
+from .fast_serializers import category_list_serializer,category_tree_serializer,post_list_serializer
 from .utils import get_client_ip
-from .tasks import increment_post_views_task
-from django.db.models import Prefetch
+from .tasks import build_post_detail,build_post_headings,dispatch_flush,refresh_post_detail_cache_task
+from .caching import (
+    post_detail_key,
+    post_headings_key,
+    read_through,
+    versioned_key,
+    CATEGORY_LIST_NAMESPACE,
+    CATEGORY_POSTS_NAMESPACE,
+    POST_LIST_NAMESPACE,
+)
+from core import metrics
+from core.parsers import BeaconJSONParser
+from core.permissions import HasValidAPIKey
+from core.redis_client import connection_metrics,get_redis
+from core.renderers import FastJSONRenderer
+from .buffers import (
+    get_sync_metrics,
+    last_pending_keys,
+    pending_events,
+    record_click,
+    record_impressions,
+    record_post_view,
+    record_time_on_page,
+    CATEGORY_IMPRESSIONS_KEY,
+    POST_IMPRESSIONS_KEY,
+)
+from datetime import timedelta, timezone as dt_timezone
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from faker import Faker
 import random
 import uuid
 from django.utils.text import slugify
-from rest_framework.pagination import PageNumberPagination
-
-redis_client=redis.Redis(host=settings.REDIS_HOST,port=6379,db=0)
-
-class PostPagination(PageNumberPagination):
-    page_size = 10  
-    page_size_query_param = 'page_size'
-    max_page_size = 50  
+from .pagination import PostCursorPagination,PostPagination
+from .search import search_categories,search_posts
+
+def json_response(body):
+    # Respuesta con JSON ya renderizado (bytes), p.ej. leido del caché
+    return HttpResponse(body, content_type="application/json")
+
+
+def post_list_params(query_params):
+    """
+    Parametros de PostListView ya validados y las partes de su clave de
+    caché (compartida con la vista async). ValueError si la pagina no es un numero
+    """
+    search = query_params.get("search", "").strip()
+    # Con busqueda se ordena por relevancia salvo que se pida otro orden
+    sort = query_params.get("sort", "relevance" if search else "created_at")
+    sort_order = query_params.get("order", "desc")
+    categories = query_params.getlist("category", [])
+    # "cursor" activa la paginacion por keyset, sin OFFSET ni COUNT(*)
+    pagination = query_params.get("pagination", "page")
+    cursor = query_params.get("cursor", "")
+    count = query_params.get("count", "")
+    page = int(query_params.get('page', '1'))
+
+    # El keyset necesita una columna: la relevancia solo aplica con paginas numeradas
+    by_rank = bool(search) and sort == "relevance" and pagination != "cursor"
+
+    valid_sort_fields = {"title", "created_at"}
+    if sort not in valid_sort_fields:
+        sort = "created_at"
+
+    sort = f"-{sort}" if sort_order == "desc" else sort
+    ordering = ("-rank", sort) if by_rank else (sort,)
+
+    page_size = query_params.get("page_size", "")
+    if pagination == "cursor":
+        page_key = f"cursor_{cursor}"
+    else:
+        page_key = f"page_{page}:{count}"
+    return {
+        "search": search,
+        "sort": sort,
+        "ordering": ordering,
+        "categories": categories,
+        "pagination": pagination,
+        "page": page,
+        "cache_parts": (search, ",".join(ordering), ",".join(categories), page_key, page_size),
+    }
+
+
+# Vistas de lectura: JSON con orjson (ver FastJSONRenderer), el resto usa el renderer por defecto
+READ_RENDERER_CLASSES = [FastJSONRenderer, BrowsableAPIRenderer]
+
+
+def post_list_queryset(params):
+    # Filas de values_list() de los posts del listado, sin ordenar ni paginar (compartido con la vista async)
+    posts = Post.postobjects.for_list()
+
+    if params["search"]:
+        posts = search_posts(posts, params["search"])
+
+    # Cada post tiene una sola categoria, el join no duplica filas: no hace falta distinct()
+    if params["categories"]:
+        posts = posts.filter(category__name__in=params["categories"])
+
+    # Tuplas de values_list() en lugar de instancias del modelo
+    return post_list_serializer.values(posts)
 
 
 class PostListView(APIView):
+    renderer_classes = READ_RENDERER_CLASSES
 
     def get(self, request, *args, **kwargs):
         try:
-            search = request.query_params.get("search", "").strip()
-            sort = request.query_params.get("sort", "created_at")
-            sort_order = request.query_params.get("order", "desc")
-            categories = request.query_params.getlist("category", [])
-            page = request.query_params.get('page', '1')
-
             # Validar que la página es un número válido
             try:
-                page = int(page)
+                params = post_list_params(request.query_params)
             except ValueError:
                 return Response({"detail": "Invalid page number"}, status=400)
 
-            valid_sort_fields = {"title", "created_at"}
-            if sort not in valid_sort_fields:
-                sort = "created_at"
-
-            sort = f"-{sort}" if sort_order == "desc" else sort
+            sort, ordering = params["sort"], params["ordering"]
+            pagination, page = params["pagination"], params["page"]
 
-            cache_key = f"post_list:{search}:{sort}:{','.join(categories)}:page_{page}"
+            cache_key = versioned_key(POST_LIST_NAMESPACE, *params["cache_parts"])
             cached_data = cache.get(cache_key)
 
             # Si hay datos en caché, devolver toda la respuesta (incluyendo paginación)
             if cached_data:
                 return Response(cached_data, status=200)
 
-            posts = Post.postobjects.all()
-
-            if search:
-                posts = posts.filter(Q(title__icontains=search) | Q(description__icontains=search))
-
-            if categories:
-                posts = posts.filter(category__name__in=categories).distinct()
-
-            posts = posts.order_by(sort)
-
-            if not posts.exists():
-                raise NotFound(detail="No posts found")
+            posts = post_list_queryset(params)
 
             # Aplicar paginación
-            paginator = PostPagination()
-            paginated_posts = paginator.paginate_queryset(posts, request, view=self)
+            if pagination == "cursor":
+                paginator = PostCursorPagination()
+                paginated_posts = paginator.paginate_queryset(posts, request, view=self, ordering=sort)
+                first_page = paginator.is_first_page
+            else:
+                paginator = PostPagination()
+                paginated_posts = paginator.paginate_queryset(posts.order_by(*ordering), request, view=self)
+                first_page = page == 1
 
             if paginated_posts is None:
                 raise NotFound(detail="Pagination error")
 
+            if not paginated_posts and first_page:
+                raise NotFound(detail="No posts found")
+
             # Serializar los datos
-            serializer_posts = PostListSerializer(paginated_posts, many=True).data
+            serializer_posts = post_list_serializer.serialize(paginated_posts)
 
             # Obtener la respuesta paginada
             paginated_response = paginator.get_paginated_response(serializer_posts)
 
             # Guardar la respuesta completa en caché
-            cache.set(cache_key, paginated_response.data, timeout=60 * 5)
+            cache.set(cache_key, paginated_response.data, timeout=settings.BLOG_CACHE_TIMEOUT)
 
             return paginated_response
 
@@ -91,6 +179,7 @@ class PostListView(APIView):
         except Exception as e:
             return Response({"detail": f"Internal server error: {str(e)}"}, status=500)
 class PostDetailView(APIView):
+    renderer_classes = READ_RENDERER_CLASSES
     
     def get(self,request):
         
@@ -99,18 +188,13 @@ class PostDetailView(APIView):
         slug=request.query_params.get("slug")
         
         try:
-            cached_post = cache.get(f"post:{slug}")
-            if cached_post:
-                increment_post_views_task.delay(cached_post['slug'],ip_address)
-                return Response(cached_post)
-            
-            
-            post = Post.postobjects.get(slug=slug)
-            serializer_post = PostSerializer(post).data
-            
-            cache.set(f"post_detail:{slug}",serializer_post, timeout=60 * 5)
+            serializer_post = read_through(
+                post_detail_key(slug),
+                lambda: build_post_detail(slug),
+                refresh=lambda: refresh_post_detail_cache_task.delay(slug),
+            )
             
-            increment_post_views_task.delay(post.slug, ip_address)
+            dispatch_flush(record_post_view(get_redis(), serializer_post['id'], ip_address))
             
         except Post.DoesNotExist:
             raise NotFound(detail="the requested post does not exist")
@@ -121,13 +205,13 @@ class PostDetailView(APIView):
 
 
 class PostHeadingsView(APIView):
+    renderer_classes = READ_RENDERER_CLASSES
     serializer_class=HeadingSerializer
     
     
     def get(self,request):
         post_slug=request.query_params.get("slug")
-        heading_objects=Heading.objects.filter(post__slug=post_slug)
-        serializer_data=HeadingSerializer(heading_objects,many=True).data
+        serializer_data=read_through(post_headings_key(post_slug), lambda: build_post_headings(post_slug))
         return Response(serializer_data)
     # def get_queryset(self):
     #     post_slug=self.kwargs['slug']
@@ -135,7 +219,7 @@ class PostHeadingsView(APIView):
 
 
 
-class IncrementPostView(APIView):
+class IncrementPostView(StandardAPIView):
     
     def post(self,request):
         
@@ -149,6 +233,7 @@ class IncrementPostView(APIView):
         try:
             post_analytics, created = PostAnalytics.objects.get_or_create(post=post)
             post_analytics.increment_clicks()  # Correcto: sin argumentos adicionales
+            dispatch_flush(record_click(get_redis(), "post", post.id))
         except Exception as e:
             raise APIException(detail=f"An error ocurred while updating post analytics : {str(e)}")
         return self.response({
@@ -156,82 +241,115 @@ class IncrementPostView(APIView):
             "clicks":post_analytics.clicks             
         })
 
+# Modos de ?sorting= y ?ordering= de CategoryListView, cada uno con su indice
+CATEGORY_SORTING = {
+    "newest": ("-created_at",),
+    "recently_updated": ("-updated_at",),
+    "most_viewed": (F("category_analytics__views").desc(nulls_last=True),),
+}
+CATEGORY_ORDERING = {
+    "az": ("name",),
+    "za": ("-name",),
+}
+
+
+def category_list_params(query_params):
+    # Valores desconocidos de sorting/ordering se ignoran, asi no generan claves de cache distintas
+    sorting = query_params.get("sorting", None)
+    ordering = query_params.get("ordering", None)
+    return (
+        query_params.get("p", "1"),
+        query_params.get("page_size", ""),
+        ordering if ordering in CATEGORY_ORDERING else None,
+        sorting if sorting in CATEGORY_SORTING else None,
+        query_params.get("search", "").strip(),
+        query_params.get("parent_slug", None),
+    )
+
+
+def category_list_queryset(ordering, sorting, search, parent_slug):
+    # Consulta de CategoryListView (compartida con la vista async): solo las
+    # columnas serializadas, los ids de los hijos van en otra consulta
+    if parent_slug:
+        categories = Category.objects.filter(parent__slug=parent_slug)
+    else:
+        # Si no especificamos un parent_slug buscamos las categorias padre
+        categories = Category.objects.filter(parent__isnull=True)
+
+    # Filtrar por busqueda (full text, ordenado por relevancia)
+    order_by = [*CATEGORY_SORTING.get(sorting, ())]
+    if search != "":
+        categories = search_categories(categories, search)
+        if not sorting:
+            order_by.append("-rank")
+
+    # Ordenamiento en SQL: sorting primero, luego az/za y el id para que la paginacion sea estable
+    order_by += [*CATEGORY_ORDERING.get(ordering, ()), "id"]
+    return category_list_serializer.values(categories.order_by(*order_by))
+
+
 class CategoryListView(StandardAPIView):
+    renderer_classes = READ_RENDERER_CLASSES
+
     def get(self, request):
 
         try:
             # Parametros de solicitud
-            parent_slug = request.query_params.get("parent_slug", None)
-            ordering = request.query_params.get("ordering", None)
-            sorting = request.query_params.get("sorting", None)
-            search = request.query_params.get("search", "").strip()
-            page = request.query_params.get("p", "1")
+            page, page_size, ordering, sorting, search, parent_slug = category_list_params(request.query_params)
 
             # Construir clave de cache para resultados paginados
-            cache_key = f"category_list:{page}:{ordering}:{sorting}:{search}:{parent_slug}"
-            cached_categories = cache.get(cache_key)
-            if cached_categories:
-                # Serializar los datos del caché
-                serialized_categories = CategoryListSerializer(cached_categories, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for category in cached_categories:
-                    redis_client.incr(f"category:impressions:{category.id}")  # Usar `post.id`
-                return self.paginate(request, serialized_categories)
-
-            # Consulta inicial optimizada
-            if parent_slug:
-                categories = Category.objects.filter(parent__slug=parent_slug).prefetch_related(
-                    Prefetch("category_analytics", to_attr="analytics_cache")
-                )
-            else:
-                # Si no especificamos un parent_slug buscamos las categorias padre
-                categories = Category.objects.filter(parent__isnull=True).prefetch_related(
-                    Prefetch("category_analytics", to_attr="analytics_cache")
-                )
+            cache_key = versioned_key(CATEGORY_LIST_NAMESPACE, page, page_size, ordering, sorting, search, parent_slug)
+            cached_response = cache.get(cache_key)
+            if cached_response:
+                # El caché guarda el JSON ya renderizado y los ids: sin ORM ni serializers
+                body, category_ids = cached_response
+                dispatch_flush(record_impressions(get_redis(), CATEGORY_IMPRESSIONS_KEY, category_ids), len(category_ids))
+                return json_response(body)
 
-            if not categories.exists():
+            # Serializacion
+            categories = list(category_list_queryset(ordering, sorting, search, parent_slug))
+            if not categories:
                 raise NotFound(detail="No categories found.")
-            
-            # Filtrar por busqueda
-            if search != "":
-                categories = categories.filter(
-                    Q(name__icontains=search) |
-                    Q(slug__icontains=search) |
-                    Q(title__icontains=search) |
-                    Q(description__icontains=search)
-                )
-            
-            # Ordenamiento
-            if sorting:
-                if sorting == 'newest':
-                    categories = categories.order_by("-created_at")
-                elif sorting == 'recently_updated':
-                    categories = categories.order_by("-updated_at")
-                elif sorting == 'most_viewed':
-                    categories = categories.annotate(popularity=F("analytics_cache__views")).order_by("-popularity")
-
-            if ordering:
-                if ordering == 'az':
-                    posts = posts.order_by("name")
-                if ordering == 'za':
-                    posts = posts.order_by("-name")
-
-            # Guardar los objetos en el caché
-            cache.set(cache_key, categories, timeout=60 * 5)
+            serialized_categories = category_list_serializer.serialize(categories)
+            category_ids = [str(category.id) for category in categories]
 
-            # Serializacion
-            serialized_categories = CategoryListSerializer(categories, many=True).data
+            response = self.paginate(request, serialized_categories)
+            if response.status_code != 200:
+                return response
+
+            # Guardar la respuesta renderizada en el caché
+            body = FastJSONRenderer().render(response.data)
+            cache.set(cache_key, (body, category_ids), timeout=settings.BLOG_CACHE_TIMEOUT)
 
             # Incrementar impresiones en Redis
-            for category in categories:
-                redis_client.incr(f"category:impressions:{category.id}")
+            dispatch_flush(record_impressions(get_redis(), CATEGORY_IMPRESSIONS_KEY, category_ids), len(category_ids))
 
-            return self.paginate(request, serialized_categories)
+            return json_response(body)
+        except NotFound:
+            raise
         except Exception as e:
                 raise APIException(detail=f"An unexpected error occurred: {str(e)}")
            
            
-class CategoryDetailView(APIView):
+class CategoryTreeView(StandardAPIView):
+    renderer_classes = READ_RENDERER_CLASSES
+    
+    def get(self, request):
+        # Todo el arbol de categorias, o el subarbol de ?slug=, en una consulta y cacheado ya armado
+        slug = request.query_params.get("slug", None)
+
+        def build():
+            rows = category_tree_serializer.values(Category.objects.subtree(slug))
+            return category_tree_serializer.serialize(rows)
+
+        tree = read_through(versioned_key(CATEGORY_LIST_NAMESPACE, "tree", slug), build)
+        if not tree:
+            raise NotFound(detail="No categories found.")
+        return self.response(tree)
+
+
+class CategoryDetailView(StandardAPIView):
+    renderer_classes = READ_RENDERER_CLASSES
     
     def get(self, request):
 
@@ -239,49 +357,55 @@ class CategoryDetailView(APIView):
             # Obtener parametros
             slug = request.query_params.get("slug", None)
             page = request.query_params.get("p", "1")
+            # Con ?descendants=true se incluyen los posts de las subcategorias
+            descendants = request.query_params.get("descendants") == "true"
 
             if not slug:
                 return self.error("Missing slug parameter")
             
             # Construir cache
-            cache_key = f"category_posts:{slug}:{page}"
-            cached_posts = cache.get(cache_key)
-            if cached_posts:
-                # Serializar los datos del caché
-                serialized_posts = PostListSerializer(cached_posts, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for post in cached_posts:
-                    redis_client.incr(f"post:impressions:{post.id}")  # Usar `post.id`
-                return Response(serialized_posts)
+            cache_key = versioned_key(CATEGORY_POSTS_NAMESPACE.format(slug), page, descendants)
+            cached_response = cache.get(cache_key)
+            if cached_response:
+                # El caché guarda el JSON ya renderizado y los ids: sin ORM ni serializers
+                body, post_ids = cached_response
+                dispatch_flush(record_impressions(get_redis(), POST_IMPRESSIONS_KEY, post_ids), len(post_ids))
+                return json_response(body)
 
             # Obtener la categoria por slug
             category = get_object_or_404(Category, slug=slug)
 
             # Obtener los posts que pertenecen a esta categoria
-            posts = Post.postobjects.filter(category=category).select_related("category").prefetch_related(
-                Prefetch("post_analytics", to_attr="analytics_cache")
-            )
+            if descendants:
+                # Prefijo del path materializado: una sola consulta sobre blog_category_path_idx
+                posts = Post.postobjects.for_list().filter(category__path__startswith=category.path)
+            else:
+                posts = Post.postobjects.for_list().filter(category=category)
+            posts = list(post_list_serializer.values(posts))
             
-            if not posts.exists():
+            if not posts:
                 raise NotFound(detail=f"No posts found for category '{category.name}'")
             
-            # Guardar los objetos en el caché
-            cache.set(cache_key, posts, timeout=60 * 5)
-
             # Serializar los posts
-            serialized_posts = PostListSerializer(posts, many=True).data
+            serialized_posts = post_list_serializer.serialize(posts)
+            post_ids = [str(post.id) for post in posts]
+
+            # Guardar la respuesta renderizada en el caché
+            body = FastJSONRenderer().render(serialized_posts)
+            cache.set(cache_key, (body, post_ids), timeout=settings.BLOG_CACHE_TIMEOUT)
 
             # Incrementar impresiones en Redis
-            for post in posts:
-                redis_client.incr(f"post:impressions:{post.id}")
+            dispatch_flush(record_impressions(get_redis(), POST_IMPRESSIONS_KEY, post_ids), len(post_ids))
 
-            return Response( serialized_posts)
+            return json_response(body)
+        except (NotFound, Http404):
+            raise
         except Exception as e:
             raise APIException(detail=f"An unexpected error occurred: {str(e)}")         
            
            
                      
-class IncrementCategoryClicksView(APIView):
+class IncrementCategoryClicksView(StandardAPIView):
     
     def post(self,request):
         
@@ -295,6 +419,7 @@ class IncrementCategoryClicksView(APIView):
         try:
             category_analytics, created = CategoryAnalytics.objects.get_or_create(category  =category)
             category_analytics.increment_clicks()  # Correcto: sin argumentos adicionales
+            dispatch_flush(record_click(get_redis(), "category", category.id))
         except Exception as e:
             raise APIException(detail=f"An error ocurred while updating post analytics : {str(e)}")
         return self.response({
@@ -304,6 +429,154 @@ class IncrementCategoryClicksView(APIView):
            
            
            
+class AnalyticsSyncMetricsView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+    
+    def get(self,request):
+        return self.response({**get_sync_metrics(get_redis()), "redis": connection_metrics()})
+           
+           
+def parse_time_on_page_event(event):
+    # (tipo, id o slug, segundos) de un evento valido, None si hay que descartarlo
+    if not isinstance(event, dict):
+        return None
+    kind = event.get("kind", "post")
+    seconds = event.get("seconds")
+    if kind not in ("post", "category") or isinstance(seconds, bool) or not isinstance(seconds, (int, float)):
+        return None
+    # Pestañas olvidadas abiertas o relojes rotos: se descartan en lugar de recortarse
+    if not 0 < seconds <= settings.BLOG_TIME_ON_PAGE_MAX_SECONDS:
+        return None
+    if event.get("id"):
+        try:
+            return kind, uuid.UUID(str(event["id"])), float(seconds)
+        except ValueError:
+            return None
+    if isinstance(event.get("slug"), str):
+        return kind, event["slug"], float(seconds)
+    return None
+
+
+class AnalyticsPrometheusMetricsView(APIView):
+    """
+    Metricas de las tareas de analiticas en formato de Prometheus: tareas por
+    estado, latencias, tamaño de los lotes de sync, colas de Celery y lo que
+    espera en los buffers de redis
+    """
+    permission_classes = [HasValidAPIKey]
+    
+    def get(self,request):
+        client = get_redis()
+        gauges = [("blog_pending_events", {}, pending_events(client))]
+        gauges += [
+            ("blog_pending_keys", {"buffer": buffer}, count)
+            for buffer, count in last_pending_keys(client).items()
+        ]
+        return HttpResponse(metrics.render(gauges), content_type="text/plain; version=0.0.4; charset=utf-8")
+           
+           
+class TimeOnPageBeaconView(StandardAPIView):
+    """
+    Beacon de tiempo en pagina: recibe muchas mediciones en un request,
+    {"events": [{"kind": "post", "id": ..., "seconds": 42.5}, ...]} (o "slug"
+    en lugar de "id"), y solo las acumula en redis; el volcado periodico
+    actualiza avg_time_on_page
+    """
+    parser_classes = [JSONParser, BeaconJSONParser]
+    
+    def post(self,request):
+        events = request.data.get("events") if isinstance(request.data, dict) else request.data
+        if not isinstance(events, list):
+            return self.error("events must be a list")
+        if len(events) > settings.BLOG_TIME_ON_PAGE_MAX_EVENTS:
+            return self.error(f"at most {settings.BLOG_TIME_ON_PAGE_MAX_EVENTS} events per request")
+        
+        parsed = [event for event in map(parse_time_on_page_event, events) if event]
+        # Slugs e ids se resuelven con una consulta por tipo: los ids que no son de
+        # un post publicado o una categoria se descartan antes de llegar al buffer
+        known = {}
+        for kind, model in (("post", Post.postobjects), ("category", Category.objects)):
+            keys = {key for event_kind, key, _ in parsed if event_kind == kind}
+            if keys:
+                slugs = {key for key in keys if isinstance(key, str)}
+                object_ids = keys - slugs
+                rows = model.filter(Q(slug__in=slugs) | Q(id__in=object_ids)).values_list("slug", "id")
+                known[kind] = {key: object_id for slug, object_id in rows for key in (slug, object_id)}
+        accepted = []
+        for kind, key, seconds in parsed:
+            object_id = known.get(kind, {}).get(key)
+            if object_id:
+                accepted.append((kind, object_id, seconds))
+        
+        record_time_on_page(get_redis(), accepted)
+        return self.response({"accepted": len(accepted), "rejected": len(events) - len(accepted)}, 202)
+           
+           
+# ?kind= de AnalyticsTimeSeriesView: (modelo, rollup, campo relacionado)
+TIMESERIES_KINDS = {
+    "post": (Post, PostAnalyticsRollup, "post"),
+    "category": (Category, CategoryAnalyticsRollup, "category"),
+}
+TIMESERIES_STEPS = {ROLLUP_HOUR: timedelta(hours=1), ROLLUP_DAY: timedelta(days=1)}
+# Rango por defecto si no se pasa ?since=
+TIMESERIES_DEFAULT_RANGE = {ROLLUP_HOUR: timedelta(hours=48), ROLLUP_DAY: timedelta(days=30)}
+
+
+class AnalyticsTimeSeriesView(StandardAPIView):
+    """
+    Serie de vistas, impresiones y clicks de un post o categoria por hora o
+    dia, leida de los rollups: ?kind=post|category&slug=&period=hour|day
+    y ?since= / ?until= en ISO 8601 (UTC si no tienen zona)
+    """
+    permission_classes = [HasValidAPIKey]
+    
+    def get(self,request):
+        kind = request.query_params.get("kind", "post")
+        slug = request.query_params.get("slug", None)
+        period = request.query_params.get("period", ROLLUP_HOUR)
+        if kind not in TIMESERIES_KINDS:
+            return self.error("kind must be 'post' or 'category'")
+        if period not in TIMESERIES_STEPS:
+            return self.error("period must be 'hour' or 'day'")
+        if not slug:
+            return self.error("Missing slug parameter")
+        
+        try:
+            until = self.parse_datetime("until") or timezone.now()
+            since = self.parse_datetime("since") or until - TIMESERIES_DEFAULT_RANGE[period]
+        except ValueError:
+            return self.error("since and until must be ISO 8601 datetimes")
+        if since > until:
+            return self.error("since must be before until")
+        if (until - since) / TIMESERIES_STEPS[period] >= settings.BLOG_TIMESERIES_MAX_BUCKETS:
+            return self.error(f"the range exceeds {settings.BLOG_TIMESERIES_MAX_BUCKETS} buckets")
+        
+        model, rollup_model, related_field = TIMESERIES_KINDS[kind]
+        object_id = model.objects.filter(slug=slug).values_list("id", flat=True).first()
+        if object_id is None:
+            raise NotFound(detail=f"No {kind} matches the given query.")
+        
+        return self.response({
+            "kind": kind,
+            "slug": slug,
+            "period": period,
+            "since": since,
+            "until": until,
+            "series": rollup_model.objects.series(related_field, object_id, period, since, until),
+        })
+    
+    def parse_datetime(self, name):
+        value = self.request.query_params.get(name, None)
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(value)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+           
+           
 class GenerateFakePostView(StandardAPIView):
     
     def get(self,request):
@@ -359,7 +632,7 @@ class GenerateFakeAnalyticsView(StandardAPIView):
             analytics.impressions = impressions
             analytics.clicks = clicks
             analytics.avg_time_on_page = avg_time_on_page
-            analytics._update_click_through_rate()
-            analytics.save()
+            analytics._update_click_through_rate(save=False)
+            analytics.save(update_fields=["views","impressions","clicks","avg_time_on_page","click_through_rate"])
             
         return self.response({"message":f"analiticas generadas para {analytics_to_generate} posts"}) 
\ No newline at end of file
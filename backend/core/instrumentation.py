@@ -0,0 +1,170 @@
+"""
+Perfil de cada request: consultas y tiempo de base de datos, hits y misses
+de caché por prefijo de clave, comandos de redis y tiempo de serializacion.
+
+El perfil activo vive en un ContextVar, asi que lo ven tanto el codigo sync
+como el async (sync_to_async copia el contexto al thread). Los puntos de
+medicion (execute_wrapper de la base, el backend de caché, el cliente de
+redis y timed()) no hacen nada fuera de un request perfilado. El
+middleware de core.middleware crea el perfil y lo emite.
+"""
+
+import contextvars
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django_redis.cache import RedisCache
+
+
+_profile = contextvars.ContextVar("request_profile", default=None)
+_MISSING = object()
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        # {prefijo de la clave: [hits, misses]}
+        self.cache = defaultdict(lambda: [0, 0])
+        self.cache_time = 0.0
+        self.redis_commands = 0
+        self.redis_time = 0.0
+        self.timings = defaultdict(float)
+        self.active = set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def as_dict(self):
+        return {
+            "duration_ms": round(self.elapsed() * 1000, 3),
+            "db_queries": self.db_queries,
+            "db_ms": round(self.db_time * 1000, 3),
+            "cache": {prefix: {"hits": hits, "misses": misses} for prefix, (hits, misses) in self.cache.items()},
+            "cache_ms": round(self.cache_time * 1000, 3),
+            "redis_commands": self.redis_commands,
+            "redis_ms": round(self.redis_time * 1000, 3),
+            **{f"{name}_ms": round(duration * 1000, 3) for name, duration in self.timings.items()},
+        }
+
+    def server_timing(self):
+        # Formato del header Server-Timing, duraciones en milisegundos
+        hits = sum(hits for hits, _ in self.cache.values())
+        misses = sum(misses for _, misses in self.cache.values())
+        metrics = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+            f'cache;dur={self.cache_time * 1000:.2f};desc="{hits} hits {misses} misses"',
+            f'redis;dur={self.redis_time * 1000:.2f};desc="{self.redis_commands} commands"',
+            *(f"{name};dur={duration * 1000:.2f}" for name, duration in self.timings.items()),
+            f"total;dur={self.elapsed() * 1000:.2f}",
+        ]
+        return ", ".join(metrics)
+
+
+def start_profile():
+    """
+    Activar un perfil nuevo en el contexto actual. Devuelve (perfil, token
+    para stop_profile)
+    """
+    profile = RequestProfile()
+    return profile, _profile.set(profile)
+
+
+def stop_profile(token):
+    _profile.reset(token)
+
+
+def current_profile():
+    return _profile.get()
+
+
+def key_prefix(key):
+    return str(key).split(":", 1)[0]
+
+
+def record_cache(keys, hits, duration):
+    profile = _profile.get()
+    if profile is None:
+        return
+    for key in keys:
+        profile.cache[key_prefix(key)][0 if key in hits else 1] += 1
+    profile.cache_time += duration
+
+
+def record_redis(commands, duration):
+    profile = _profile.get()
+    if profile is not None:
+        profile.redis_commands += commands
+        profile.redis_time += duration
+
+
+@contextmanager
+def timed(name):
+    """
+    Sumar al perfil el tiempo propio de un bloque o funcion (p.ej.
+    serializar), sin las consultas que haga adentro: esas ya cuentan como
+    tiempo de base. Los bloques anidados con el mismo nombre cuentan una vez
+    """
+    profile = _profile.get()
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    db_time = profile.db_time
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += time.perf_counter() - start - (profile.db_time - db_time)
+        profile.active.discard(name)
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - start
+        profile.db_queries += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    # Las conexiones son por thread: se instala en cada una al conectarse. Va
+    # primero porque connection.execute_wrapper() quita el ultimo al salir
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def install_query_recorders():
+    connection_created.connect(install_query_recorder, dispatch_uid="core.instrumentation")
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+class InstrumentedRedisCache(RedisCache):
+    """
+    Backend de caché de django_redis que registra hits y misses por prefijo
+    de clave (las versiones async de BaseCache llaman a estos metodos)
+    """
+
+    def get(self, key, default=None, version=None, client=None):
+        start = time.perf_counter()
+        value = super().get(key, _MISSING, version=version, client=client)
+        hit = value is not _MISSING
+        record_cache([key], {key} if hit else set(), time.perf_counter() - start)
+        return value if hit else default
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        start = time.perf_counter()
+        values = super().get_many(keys, version=version, client=client)
+        record_cache(keys, values.keys(), time.perf_counter() - start)
+        return values
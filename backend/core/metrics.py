@@ -0,0 +1,184 @@
+"""
+Metricas de las tareas de Celery en formato de exposicion de Prometheus.
+
+Los workers son procesos separados, asi que los contadores e histogramas se
+acumulan en un hash de redis (un campo por serie, con el nombre y los labels
+ya en formato Prometheus) y la vista de metricas solo los lee. Los gauges
+de profundidad de las colas y eventos pendientes se calculan al momento del
+scrape; las claves pendientes por buffer las cuenta el volcado. Registrar una metrica nunca hace fallar a la
+tarea que la registra.
+"""
+
+import logging
+import threading
+import time
+
+from celery.signals import task_failure, task_postrun, task_prerun
+from django.conf import settings
+from kombu.exceptions import ChannelError
+from redis.exceptions import RedisError
+
+from core.celery import app
+from core.redis_client import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "metrics:celery"
+
+# Segundos
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Filas o claves por lote
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Nombre: (tipo, ayuda)
+METRICS = {
+    "celery_tasks_total": ("counter", "Finished Celery tasks by task name and final state"),
+    "celery_task_failures_total": ("counter", "Celery task failures by task name and exception type"),
+    "celery_task_duration_seconds": ("histogram", "Celery task run time"),
+    "blog_sync_batch_size": ("histogram", "Rows or keys per analytics sync batch"),
+    "blog_sync_errors_total": ("counter", "Analytics sync batches that failed and were put back in redis"),
+    "celery_queue_length": ("gauge", "Messages waiting in each Celery queue"),
+    "blog_pending_events": ("gauge", "Analytics events buffered in redis and not yet flushed"),
+    "blog_pending_keys": ("gauge", "Redis buffer keys (or hash fields) waiting when the last flush started"),
+}
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    # Labels en orden alfabetico con le al final, como los escribe prometheus_client
+    items = sorted(labels.items(), key=lambda item: (item[0] == "le", item[0]))
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def _write(queue):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        queue(pipe)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"error recording metrics:{str(e)}")
+
+
+def inc(name, labels=None, amount=1):
+    _write(lambda pipe: pipe.hincrby(METRICS_KEY, _series(name, labels), amount))
+
+
+def observe(name, value, labels=None, buckets=DURATION_BUCKETS):
+    """
+    Sumar una observacion a un histograma. Los buckets se guardan ya
+    acumulados (cada uno cuenta las observaciones <= le), como los expone Prometheus
+    """
+    labels = labels or {}
+
+    def queue(pipe):
+        for bound in (*buckets, "+Inf"):
+            if bound == "+Inf" or value <= bound:
+                pipe.hincrby(METRICS_KEY, _series(f"{name}_bucket", {**labels, "le": bound}), 1)
+        pipe.hincrbyfloat(METRICS_KEY, _series(f"{name}_sum", labels), value)
+        pipe.hincrby(METRICS_KEY, _series(f"{name}_count", labels), 1)
+    _write(queue)
+
+
+# Inicio de cada tarea en curso en este proceso, por task_id
+_started = {}
+_started_lock = threading.Lock()
+
+
+@task_prerun.connect
+def _task_started(task_id=None, **kwargs):
+    with _started_lock:
+        _started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    with _started_lock:
+        started = _started.pop(task_id, None)
+    inc("celery_tasks_total", {"task": task.name, "state": state or "UNKNOWN"})
+    if started is not None:
+        observe("celery_task_duration_seconds", time.perf_counter() - started, {"task": task.name})
+
+
+@task_failure.connect
+def _task_failed(sender=None, exception=None, **kwargs):
+    inc("celery_task_failures_total", {"task": sender.name, "exception": type(exception).__name__})
+
+
+def _queue_length(connection, queue):
+    # Un channel por cola: en AMQP un NOT_FOUND cierra el channel
+    channel = connection.channel()
+    try:
+        return channel.queue_declare(queue=queue, passive=True).message_count
+    except ChannelError as e:
+        # En el broker de redis una cola vacia no existe (su lista se borra): NOT_FOUND es 0
+        # reply_code es 404 (int) en AMQP y "404" en los transportes virtuales de kombu
+        if str(getattr(e, "reply_code", "")) == "404":
+            return 0
+        raise
+    finally:
+        try:
+            channel.close()
+        except Exception:
+            pass
+
+
+def _queue_lengths():
+    lengths = {}
+    try:
+        with app.connection_for_read() as connection:
+            for queue in settings.METRICS_CELERY_QUEUES:
+                try:
+                    lengths[queue] = _queue_length(connection, queue)
+                except Exception as e:
+                    logger.warning(f"error reading Celery queue length of {queue}:{str(e)}")
+    except Exception as e:
+        logger.warning(f"error reading Celery queue lengths:{str(e)}")
+    return lengths
+
+
+def _base_name(series):
+    name = series.split("{", 1)[0]
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and METRICS.get(name[:-len(suffix)], ("",))[0] == "histogram":
+            return name[:-len(suffix)]
+    return name
+
+
+def _sort_key(series):
+    # Buckets de un histograma en orden numerico de le, con +Inf al final
+    name, _, labels = series.partition("{")
+    labels, _, bound = labels.partition('le="')
+    if not bound:
+        return (name, labels, 0)
+    bound = bound.split('"', 1)[0]
+    return (name, labels, float("inf") if bound == "+Inf" else float(bound))
+
+
+def render(gauges=()):
+    """
+    Texto de exposicion de Prometheus con las series guardadas en redis y
+    los gauges [(nombre, labels, valor)] calculados por quien llama
+    """
+    samples = {}
+    for field, value in get_redis().hgetall(METRICS_KEY).items():
+        samples[field.decode("utf-8")] = float(value)
+    for name, labels, value in gauges:
+        samples[_series(name, labels)] = value
+    for queue, length in _queue_lengths().items():
+        samples[_series("celery_queue_length", {"queue": queue})] = length
+
+    by_metric = {}
+    for series in sorted(samples, key=_sort_key):
+        by_metric.setdefault(_base_name(series), []).append(series)
+
+    lines = []
+    for name, series_names in by_metric.items():
+        kind, description = METRICS.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for series in series_names:
+            value = samples[series]
+            lines.append(f"{series} {int(value) if value == int(value) else value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.instrumentation import install_query_recorders, start_profile, stop_profile
+
+
+logger = logging.getLogger("core.profiling")
+
+
+class RequestProfilingMiddleware:
+    """
+    Perfilar cada request (ver core.instrumentation) y, para una muestra de
+    REQUEST_PROFILING_SAMPLE_RATE o si tardo mas de REQUEST_PROFILING_SLOW_MS,
+    emitirlo como log JSON y, con REQUEST_PROFILING_SERVER_TIMING, en el
+    header Server-Timing. Va primero en MIDDLEWARE para medir todo el request
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_query_recorders()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token = start_profile()
+        try:
+            response = self.get_response(request)
+            self.emit(request, response, profile)
+        finally:
+            stop_profile(token)
+        return response
+
+    async def __acall__(self, request):
+        profile, token = start_profile()
+        try:
+            response = await self.get_response(request)
+            self.emit(request, response, profile)
+        finally:
+            stop_profile(token)
+        return response
+
+    def emit(self, request, response, profile):
+        duration_ms = profile.elapsed() * 1000
+        slow = duration_ms >= settings.REQUEST_PROFILING_SLOW_MS
+        if not slow and random.random() >= settings.REQUEST_PROFILING_SAMPLE_RATE:
+            return
+
+        if settings.REQUEST_PROFILING_SERVER_TIMING:
+            response["Server-Timing"] = profile.server_timing()
+        payload = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "slow": slow,
+            **profile.as_dict(),
+        }
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(payload))
@@ -0,0 +1,9 @@
+from rest_framework.parsers import JSONParser
+
+
+class BeaconJSONParser(JSONParser):
+    """
+    JSON enviado como text/plain, el tipo que usa navigator.sendBeacon con
+    un string (application/json exigiria un preflight de CORS)
+    """
+    media_type = "text/plain"
@@ -0,0 +1,194 @@
+"""
+Acceso compartido a redis para la app (buffers de analiticas, locks, metricas).
+
+Hay un solo pool por proceso, creado la primera vez que se pide un cliente,
+con limite de conexiones, timeouts y health checks configurables desde los
+settings REDIS_*. redis-py descarta las conexiones heredadas al hacer fork,
+asi que cada worker de Celery o de uvicorn arma su propio pool sin
+compartir sockets. Con REDIS_REUSE_CACHE_POOL se usa el pool de django_redis
+del cache "default" en lugar de abrir otro (las claves van a la base de
+REDIS_URL). Los clientes cuentan comandos y tiempo en el perfil del request
+(core.instrumentation).
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+from core.instrumentation import record_redis
+
+
+_lock = threading.Lock()
+_client = None
+# Las conexiones de redis.asyncio quedan atadas a su event loop: un pool por
+# loop y por URL ({loop: {url o None: cliente}})
+_async_clients = weakref.WeakKeyDictionary()
+_pools_created = 0
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+
+    def execute(self, raise_on_error=True):
+        commands = len(self.command_stack)
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            record_redis(commands, time.perf_counter() - start)
+
+
+class InstrumentedRedis(redis.Redis):
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis(1, time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class AsyncInstrumentedPipeline(redis.asyncio.client.Pipeline):
+
+    async def execute(self, raise_on_error=True):
+        commands = len(self.command_stack)
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            record_redis(commands, time.perf_counter() - start)
+
+
+class AsyncInstrumentedRedis(redis.asyncio.Redis):
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_redis(1, time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return AsyncInstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _pool_kwargs(url=None):
+    location = {} if url else {
+        "host": settings.REDIS_HOST,
+        "port": settings.REDIS_PORT,
+        "db": settings.REDIS_DB,
+    }
+    return {
+        **location,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        # Segundos que se espera una conexion libre cuando el pool esta lleno
+        "timeout": settings.REDIS_POOL_TIMEOUT,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+def get_redis():
+    """
+    Cliente de redis del proceso
+    """
+    global _client, _pools_created
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if settings.REDIS_REUSE_CACHE_POOL:
+                    from django_redis import get_redis_connection
+                    _client = InstrumentedRedis(connection_pool=get_redis_connection("default").connection_pool)
+                else:
+                    _client = InstrumentedRedis(connection_pool=redis.BlockingConnectionPool(**_pool_kwargs()))
+                    _pools_created += 1
+    return _client
+
+
+def get_async_redis(url=None):
+    """
+    Cliente de redis.asyncio del event loop actual, con la misma
+    configuracion. Con `url` (p.ej. la LOCATION del caché) el pool apunta a
+    ese servidor y base en lugar de REDIS_HOST/REDIS_DB
+    """
+    global _pools_created
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        clients = _async_clients[loop] = {}
+    client = clients.get(url)
+    if client is None:
+        if url:
+            pool = redis.asyncio.BlockingConnectionPool.from_url(url, **_pool_kwargs(url))
+        else:
+            pool = redis.asyncio.BlockingConnectionPool(**_pool_kwargs())
+        client = clients[url] = AsyncInstrumentedRedis(connection_pool=pool)
+        _pools_created += 1
+    return client
+
+
+def pipeline_execute(queue, items, client=None, chunk_size=1000, transaction=False):
+    """
+    Llamar queue(pipe, item) para cada item y ejecutar en pipelines de hasta
+    `chunk_size` items: un round trip por lote sin armar un pipeline enorme.
+    Devuelve los resultados de todos los comandos en orden
+    """
+    client = client or get_redis()
+    results = []
+    pipe = client.pipeline(transaction=transaction)
+    pending = 0
+    for item in items:
+        queue(pipe, item)
+        pending += 1
+        if pending >= chunk_size:
+            results.extend(pipe.execute())
+            pending = 0
+    if pending:
+        results.extend(pipe.execute())
+    return results
+
+
+def _pool_metrics(pool):
+    if hasattr(pool, "_available_connections"):
+        # ConnectionPool (django_redis) y los pools de redis.asyncio
+        idle = len(pool._available_connections)
+        in_use = len(pool._in_use_connections)
+    else:
+        # BlockingConnectionPool: la cola tiene las conexiones libres y None por cada lugar sin crear
+        idle = sum(1 for connection in list(pool.pool.queue) if connection)
+        in_use = len(pool._connections) - idle
+    return {
+        "max_connections": pool.max_connections,
+        "created_connections": idle + in_use,
+        "in_use_connections": in_use,
+        "idle_connections": idle,
+    }
+
+
+def connection_metrics():
+    """
+    Estado de los pools de este proceso. `pools_created` deberia ser uno mas
+    uno por event loop (dos si las vistas async leen el caché): un numero
+    mayor indica pools duplicados
+    """
+    pools = {}
+    if _client is not None:
+        pools["sync"] = _pool_metrics(_client.connection_pool)
+    clients = [client for loop_clients in list(_async_clients.values()) for client in loop_clients.values()]
+    for index, client in enumerate(clients):
+        pools[f"async_{index}"] = _pool_metrics(client.connection_pool)
+    return {
+        "pid": os.getpid(),
+        "reuses_cache_pool": settings.REDIS_REUSE_CACHE_POOL,
+        "pools_created": _pools_created,
+        "pools": pools,
+    }
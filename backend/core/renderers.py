@@ -0,0 +1,42 @@
+from rest_framework.renderers import JSONRenderer
+
+from core.instrumentation import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer con orjson cuando esta instalado: salida compacta en UTF-8,
+    fechas con el formato del encoder de DRF y \\u2028/\\u2029 escapados.
+    Con indentacion, ensure_ascii o tipos que orjson no soporta usa el
+    JSONRenderer de DRF.
+
+    No es identico a JSONRenderer con floats: los exponentes salen sin signo
+    ni ceros (1e16 en lugar de 1e+16), la notacion cientifica empieza en
+    otros umbrales (2.5e-05 sale como 0.000025) y NaN/Infinity se escriben
+    como null en lugar de fallar. Por eso no es el renderer por
+    defecto: solo lo usan las vistas de lectura del blog, cuyas respuestas no
+    tienen floats.
+    """
+
+    @timed("render")
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                # Las fechas pasan por el encoder de DRF (milisegundos y sufijo Z)
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
@@ -30,6 +30,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 PROJECT_APPS = [
@@ -60,6 +61,7 @@ CKEDITOR_CONFIGS = {
 CKEDITOR_UPLOAD_PATH = "media/"
 
 MIDDLEWARE = [
+    'core.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -156,10 +158,15 @@ REST_FRAMEWORK = {
     # or allow read-only access for unauthenticated users.
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny'
-    ]
+    ],
+    # Las vistas de lectura del blog usan core.renderers.FastJSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
-CHANNELS_LAYERS = {
+CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
@@ -168,18 +175,94 @@ CHANNELS_LAYERS = {
     }
 }   
 REDIS_HOST=env("REDIS_HOST")
+# Pool compartido de core.redis_client (buffers de analiticas, locks y metricas)
+REDIS_PORT = env.int("REDIS_PORT", default=6379)
+REDIS_DB = env.int("REDIS_DB", default=0)
+REDIS_MAX_CONNECTIONS = env.int("REDIS_MAX_CONNECTIONS", default=50)
+REDIS_POOL_TIMEOUT = env.float("REDIS_POOL_TIMEOUT", default=5)
+REDIS_SOCKET_TIMEOUT = env.float("REDIS_SOCKET_TIMEOUT", default=2)
+REDIS_SOCKET_CONNECT_TIMEOUT = env.float("REDIS_SOCKET_CONNECT_TIMEOUT", default=2)
+REDIS_HEALTH_CHECK_INTERVAL = env.int("REDIS_HEALTH_CHECK_INTERVAL", default=30)
+# Usar el pool de django_redis del cache "default" en lugar de abrir otro
+REDIS_REUSE_CACHE_POOL = env.bool("REDIS_REUSE_CACHE_POOL", default=False)
+
+# Deduplicacion de vistas por IP: "exact" encola todas las IPs y deduplica al volcar
+# con la restriccion unica de PostView, "approximate" filtra antes en redis con un
+# HyperLogLog por post y asi encola y escribe menos
+BLOG_VIEW_DEDUP = env.str("BLOG_VIEW_DEDUP", default="exact")
+
+# Claves de redis por lote al volcar contadores (SCAN + GETDEL + un bulk_update por lote)
+BLOG_SYNC_BATCH_SIZE = env.int("BLOG_SYNC_BATCH_SIZE", default=1000)
+
+# Volcado adaptativo: beat revisa cada BLOG_SYNC_TICK segundos y vuelca antes
+# cuantos mas eventos pendientes haya (cada tick al llegar al umbral). Ademas
+# las vistas encolan un volcado cada BLOG_SYNC_PENDING_THRESHOLD eventos
+BLOG_SYNC_TICK = env.int("BLOG_SYNC_TICK", default=10)
+BLOG_SYNC_MAX_INTERVAL = env.int("BLOG_SYNC_MAX_INTERVAL", default=300)
+BLOG_SYNC_PENDING_THRESHOLD = env.int("BLOG_SYNC_PENDING_THRESHOLD", default=5000)
+BLOG_SYNC_LOCK_TIMEOUT = env.int("BLOG_SYNC_LOCK_TIMEOUT", default=600)
+
+# Cada cuantos segundos se manda al dashboard en vivo un mensaje con los deltas acumulados
+BLOG_LIVE_TICK = env.int("BLOG_LIVE_TICK", default=2)
+
+# Retencion de analiticas: las vistas crudas (que tambien deduplican por IP) y los
+# buckets por hora se podan una vez al dia; los buckets diarios se conservan
+BLOG_RAW_VIEW_RETENTION_DAYS = env.int("BLOG_RAW_VIEW_RETENTION_DAYS", default=30)
+BLOG_HOURLY_ROLLUP_RETENTION_DAYS = env.int("BLOG_HOURLY_ROLLUP_RETENTION_DAYS", default=90)
+# Beacon de tiempo en pagina: mediciones por request y segundos maximos por medicion
+BLOG_TIME_ON_PAGE_MAX_EVENTS = env.int("BLOG_TIME_ON_PAGE_MAX_EVENTS", default=100)
+BLOG_TIME_ON_PAGE_MAX_SECONDS = env.int("BLOG_TIME_ON_PAGE_MAX_SECONDS", default=60 * 30)
+# Maximo de buckets por respuesta de la API de series
+BLOG_TIMESERIES_MAX_BUCKETS = env.int("BLOG_TIMESERIES_MAX_BUCKETS", default=24 * 31)
+
+# Perfil por request (core.middleware): se mide siempre y se emite como log JSON
+# para una muestra de requests y para los que superan el umbral de lentitud
+REQUEST_PROFILING_ENABLED = env.bool("REQUEST_PROFILING_ENABLED", default=True)
+REQUEST_PROFILING_SAMPLE_RATE = env.float("REQUEST_PROFILING_SAMPLE_RATE", default=0.01)
+REQUEST_PROFILING_SLOW_MS = env.int("REQUEST_PROFILING_SLOW_MS", default=500)
+# El header Server-Timing expone detalles internos: por defecto solo con DEBUG
+REQUEST_PROFILING_SERVER_TIMING = env.bool("REQUEST_PROFILING_SERVER_TIMING", default=DEBUG)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.profiling": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
 
 CACHES={
     
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        # RedisCache de django_redis que registra hits y misses en el perfil del request
+        "BACKEND": "core.instrumentation.InstrumentedRedisCache",
         "LOCATION": env("REDIS_URL"),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "SOCKET_CONNECT_TIMEOUT": REDIS_SOCKET_CONNECT_TIMEOUT,
+            "SOCKET_TIMEOUT": REDIS_SOCKET_TIMEOUT,
+            "CONNECTION_POOL_KWARGS": {
+                "max_connections": REDIS_MAX_CONNECTIONS,
+                "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+            },
         }
     }
 }
 
+# Busqueda full text: configuracion de PostgreSQL para stemming y, opcionalmente,
+# coincidencias por trigramas en titulos para tolerar typos (requiere pg_trgm)
+BLOG_SEARCH_CONFIG = env.str("BLOG_SEARCH_CONFIG", default="spanish")
+BLOG_SEARCH_TRIGRAM = env.bool("BLOG_SEARCH_TRIGRAM", default=False)
+
+# Los caches del blog se invalidan por signals (namespaces versionados), asi que
+# el TTL solo acota la memoria usada por entradas huerfanas
+BLOG_CACHE_TIMEOUT = env.int("BLOG_CACHE_TIMEOUT", default=60 * 60 * 6)
+# Tiempo extra en que una entrada vencida se sirve mientras se recalcula en segundo plano
+BLOG_CACHE_STALE_TIMEOUT = env.int("BLOG_CACHE_STALE_TIMEOUT", default=60 * 10)
+
 CHANNELS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
@@ -201,12 +284,26 @@ CELERY_BROKER_TRANSPORT_OPTIONS = {
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_CACHE_BACKEND = 'default'
 
+# Colas de Celery cuya profundidad se expone en las metricas
+METRICS_CELERY_QUEUES = env.list("METRICS_CELERY_QUEUES", default=["celery"])
+
 CELERY_IMPORTS = (
     'core.tasks',
     'apps.blog.tasks',
 )
 
-CELERY_BEAT_SCHEDULE = "django_celery_beat.schedulers:DatabaseScheduler"
+CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 CELERY_BEAT_SCHEDULE = {
-    
+    "flush-analytics-buffers": {
+        "task": "apps.blog.tasks.flush_analytics_buffers_task",
+        "schedule": BLOG_SYNC_TICK,
+    },
+    "push-live-analytics": {
+        "task": "apps.blog.tasks.push_live_analytics_task",
+        "schedule": BLOG_LIVE_TICK,
+    },
+    "prune-analytics": {
+        "task": "apps.blog.tasks.prune_analytics_task",
+        "schedule": 60 * 60 * 24,
+    },
 }
@@ -10,3 +10,5 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
+# Registrar los handlers de las signals de Celery que alimentan las metricas
+from core import metrics  # noqa: E402,F401